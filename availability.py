@@ -0,0 +1,81 @@
+import threading
+
+import numpy as np
+
+import catalog
+import db_logic
+
+
+class RecipeMatrix:
+    """The recipes of one catalog version as a dense (products x ingredients) NumPy matrix."""
+
+    def __init__(self, catalog_data):
+        self.version = catalog_data.version
+        self.product_ids = [pid for pid, _, _ in catalog_data.products]
+        self.ingredient_ids = [ing_id for ing_id, _, _ in catalog_data.ingredients]
+        column = {ing_id: i for i, ing_id in enumerate(self.ingredient_ids)}
+        self.quantities = np.zeros((len(self.product_ids), len(self.ingredient_ids)), dtype=np.float64)
+        for row, pid in enumerate(self.product_ids):
+            ids, quantities = catalog_data.recipe_for(pid)
+            for ing_id, quantity in zip(ids, quantities):
+                if ing_id in column:
+                    self.quantities[row, column[ing_id]] += quantity
+        # A product without a recipe cannot be sold at all.
+        self.has_recipe = (self.quantities > 0).any(axis=1)
+
+    def stock_vector(self, stock_levels):
+        """Orders [(ingredient_id, stock), ...] into a vector aligned with the matrix columns."""
+        stock = dict(stock_levels)
+        return np.array([stock.get(ing_id, 0.0) for ing_id in self.ingredient_ids], dtype=np.float64)
+
+    def max_makeable(self, stock):
+        """How many units of every product the stock vector allows, as an int array aligned with product_ids.
+
+        Uses the same test as process_order (stock >= units * quantity), so a
+        count reported here always sells.
+        """
+        needed = self.quantities > 0
+        per_unit = np.where(needed, self.quantities, 1.0)
+        available = np.maximum(stock, 0.0)
+        units = np.floor(available / per_unit)
+        # Division can land one off either way of an exact multiple.
+        units += (units + 1) * per_unit <= available
+        units -= units * per_unit > available
+        units = np.where(needed, units, np.inf).min(axis=1, initial=np.inf)
+        units[~self.has_recipe] = 0
+        return units.astype(np.int64)
+
+
+_lock = threading.Lock()
+_matrix = None
+
+
+def get_recipe_matrix():
+    """Returns the RecipeMatrix for the current catalog, rebuilt only after a catalog change."""
+    global _matrix
+    catalog_data = catalog.get_catalog()
+    with _lock:
+        if _matrix is None or _matrix.version != catalog_data.version or catalog_data.version is None:
+            _matrix = RecipeMatrix(catalog_data)
+        return _matrix
+
+
+def max_makeable():
+    """{product_id: units current stock allows} for every product, from one stock read.
+
+    Returns None when stock levels could not be read.
+    """
+    stock_levels = db_logic.get_stock_levels()
+    if stock_levels is None:
+        return None
+    matrix = get_recipe_matrix()
+    units = matrix.max_makeable(matrix.stock_vector(stock_levels))
+    return dict(zip(matrix.product_ids, units.tolist()))
+
+
+def unavailable_product_ids():
+    """Ids of the products that cannot be made even once right now (empty if stock is unknown)."""
+    units = max_makeable()
+    if units is None:
+        return frozenset()
+    return frozenset(pid for pid, count in units.items() if count <= 0)
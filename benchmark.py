@@ -0,0 +1,674 @@
+import argparse
+import datetime
+import itertools
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import database
+import db_logic
+import db_pool
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+SOURCE_DB = 'nainai_tea.db'
+
+
+def scratch_db(workdir):
+    """Copies the shop database into workdir and points db_logic at the copy."""
+    path = os.path.join(workdir, 'bench.db')
+    shutil.copyfile(SOURCE_DB, path)
+    db_logic.DB_FILE = path
+    return path
+
+
+def timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+# --- Benchmarks ---
+
+def bench_pool(args):
+    """Per-call latency of a catalog lookup: fresh connection vs pooled connection."""
+    repeat = args.repeat
+    with tempfile.TemporaryDirectory() as workdir:
+        path = scratch_db(workdir)
+
+        def unpooled():
+            conn = sqlite3.connect(path)
+            try:
+                conn.execute("SELECT id, name, price FROM products ORDER BY name").fetchall()
+            finally:
+                conn.close()
+
+        fresh_ms = timeit(unpooled, repeat)
+        db_pool.reset_call_stats()
+        pooled_ms = timeit(db_logic.get_all_products, repeat)
+        stats = db_logic.get_connection_stats()
+        db_logic.get_pool().close_all()
+
+    print(f"get_all_products x{repeat}")
+    print(f"  fresh connection per call: {fresh_ms:.3f} ms/call")
+    print(f"  pooled connection:         {pooled_ms:.3f} ms/call")
+    pool = stats["pool"]
+    print(f"  pool: {pool['connections_opened']} connection(s) opened in {pool['connect_seconds'] * 1000:.2f} ms, "
+          f"{pool['borrows']} borrows, avg wait {pool['avg_wait_ms']:.4f} ms, avg hold {pool['avg_hold_ms']:.4f} ms")
+    for name, entry in stats["calls"].items():
+        print(f"  {name}: {entry['calls']} calls, avg {entry['avg_ms']:.3f} ms, max {entry['max_ms']:.3f} ms")
+
+
+def add_synthetic_sales(path, count, per_day=300):
+    """Appends count sales spread evenly over the days leading up to now."""
+    conn = sqlite3.connect(path)
+    try:
+        product_ids = [row[0] for row in conn.execute("SELECT id FROM products")]
+        now = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        seconds_per_sale = 86400 / per_day
+        rows = ((product_ids[i % len(product_ids)], 1,
+                 (now - datetime.timedelta(seconds=i * seconds_per_sale)).strftime("%Y-%m-%d %H:%M:%S"), 10.0)
+                for i in range(count))
+        conn.executemany("INSERT INTO sales (product_id, quantity_sold, sale_time, total_price) VALUES (?, ?, ?, ?)", rows)
+        database.rebuild_sales_rollup(conn)
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+
+def bench_reports(args):
+    """Today's sales: DATE(sale_time) = ? scan vs half-open sale_time range, as sales grow.
+
+    The range starts at 00:30, so it is answered from the sale_time index
+    rather than the daily rollup (bench_rollup times that path).
+    """
+    import shop_time
+
+    print(f"{'sales rows':>12} {'DATE() scan':>14} {'range query':>14}")
+    for size in args.sizes or [10_000, 100_000, 1_000_000]:
+        with tempfile.TemporaryDirectory() as workdir:
+            path = scratch_db(workdir)
+            db_logic.get_all_products()  # apply migrations on the copy
+            add_synthetic_sales(path, size)
+            today_str = datetime.date.today().strftime("%Y-%m-%d")
+
+            def legacy():
+                with db_logic.get_db_connection() as conn:
+                    conn.execute("SELECT COUNT(id), SUM(total_price) FROM sales WHERE DATE(sale_time) = ?",
+                                 (today_str,)).fetchone()
+
+            start = shop_time.local_midnight(shop_time.now().date()) + datetime.timedelta(minutes=30)
+            legacy_ms = timeit(legacy, args.repeat)
+            range_ms = timeit(lambda: db_logic.get_sales_summary(start, shop_time.now()), args.repeat)
+            db_logic.get_pool().close_all()
+        print(f"{size:>12} {legacy_ms:>11.3f} ms {range_ms:>11.3f} ms")
+
+
+def bench_rollup(args):
+    """Product ranking: GROUP BY over raw sales vs the daily rollup, plus rebuild time."""
+    print(f"{'sales rows':>12} {'raw GROUP BY':>14} {'rollup':>14} {'rebuild':>14}")
+    for size in args.sizes or [10_000, 100_000, 1_000_000]:
+        with tempfile.TemporaryDirectory() as workdir:
+            path = scratch_db(workdir)
+            db_logic.get_all_products()  # apply migrations on the copy
+            add_synthetic_sales(path, size)
+
+            def legacy():
+                with db_logic.get_db_connection() as conn:
+                    conn.execute("""
+                        SELECT p.name, SUM(s.quantity_sold), SUM(s.total_price)
+                        FROM sales s JOIN products p ON s.product_id = p.id
+                        GROUP BY p.name ORDER BY SUM(s.quantity_sold) DESC
+                    """).fetchall()
+
+            repeat = max(1, args.repeat // 100)
+            legacy_ms = timeit(legacy, repeat)
+            rollup_ms = timeit(db_logic.get_product_sales_ranking, repeat)
+            rebuild_ms = timeit(db_logic.rebuild_sales_rollup, 1)
+            db_logic.get_pool().close_all()
+        print(f"{size:>12} {legacy_ms:>11.3f} ms {rollup_ms:>11.3f} ms {rebuild_ms:>11.1f} ms")
+
+
+ATTRIBUTE_NAMES = ['口味', '茶底', '小料', '口感', '咖啡因', '甜度', '适用场景/心情']
+
+
+def add_synthetic_products(path, count, with_recipes=False):
+    """Appends count products, each with a full set of attributes and, optionally, a copy of an existing recipe."""
+    conn = sqlite3.connect(path)
+    try:
+        start = conn.execute("SELECT COALESCE(MAX(id), 0) FROM products").fetchone()[0] + 1
+        conn.executemany("INSERT INTO products (id, name, price) VALUES (?, ?, ?)",
+                         ((start + i, f"测试饮品{start + i:05d}", 10 + i % 10) for i in range(count)))
+        conn.executemany("INSERT INTO product_attributes (product_id, attribute_name, attribute_value) VALUES (?, ?, ?)",
+                         ((start + i, attr, f"{attr}描述{i % 37}") for i in range(count) for attr in ATTRIBUTE_NAMES))
+        if with_recipes:
+            recipes = {}
+            for product_id, ingredient_id, quantity in conn.execute(
+                    "SELECT product_id, ingredient_id, quantity_needed FROM recipes WHERE product_id < ?", (start,)):
+                recipes.setdefault(product_id, []).append((ingredient_id, quantity))
+            templates = list(recipes.values())
+            conn.executemany("INSERT INTO recipes (product_id, ingredient_id, quantity_needed) VALUES (?, ?, ?)",
+                             ((start + i, ingredient_id, quantity) for i in range(count)
+                              for ingredient_id, quantity in templates[i % len(templates)]))
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+
+
+def bench_attributes(args):
+    """Loading every product with its attributes: one query per product vs one bulk query."""
+    print(f"{'products':>10} {'N+1 queries':>14} {'bulk query':>14}")
+    for size in args.sizes or [100, 1_000, 10_000]:
+        with tempfile.TemporaryDirectory() as workdir:
+            path = scratch_db(workdir)
+            db_logic.get_all_products()  # apply migrations on the copy
+            add_synthetic_products(path, size - len(db_logic.get_all_products()))
+
+            def per_product():
+                for pid, _, _ in db_logic.get_all_products():
+                    db_logic.get_product_attributes(pid)
+
+            repeat = max(1, args.repeat // size)
+            loop_ms = timeit(per_product, repeat)
+            bulk_ms = timeit(db_logic.get_all_products_with_attributes, repeat)
+            db_logic.get_pool().close_all()
+        print(f"{size:>10} {loop_ms:>11.2f} ms {bulk_ms:>11.2f} ms")
+
+
+def bench_retrieval(args):
+    """Local candidate retrieval: recall@K against the full-catalog LLM pick, latency and prompt size."""
+    import catalog
+    import load_test
+    import recommend_prompt
+    import recommenders
+    import retrieval
+
+    k = recommend_prompt.RETRIEVAL_TOP_K or 20
+    preferences = load_test.PREFERENCES
+    with tempfile.TemporaryDirectory() as workdir:
+        scratch_db(workdir)
+        catalog_data = catalog.get_catalog()
+        index = retrieval.get_index()
+        prompt = recommend_prompt.get_catalog_prompt()
+        query_ms = timeit(lambda: [index.top_k(preference, k) for preference in preferences], 10) / len(preferences)
+        full_tokens = recommend_prompt.estimate_tokens("".join(m["content"] for m in prompt.messages("清爽")))
+        candidate_tokens = recommend_prompt.estimate_tokens(
+            "".join(m["content"] for m in prompt.messages("清爽", index.top_k("清爽", k))))
+        print(f"real catalog: {len(catalog_data.products)} products, K={k}, pre-filtering "
+              f"{'on' if recommend_prompt.prefilters(prompt) else 'off'} "
+              f"(RETRIEVAL_MIN_PRODUCTS={recommend_prompt.RETRIEVAL_MIN_PRODUCTS})")
+        # Recall here means: does the top-K still contain the drink the model
+        # picks when it sees the whole menu? Only a real model can answer that.
+        if recommenders.DEEPSEEK_API_KEY:
+            llm = recommenders.LLMRecommender()
+            hits = answered = 0
+            for preference in preferences:
+                completion = llm.complete(preference, prompt, prompt.messages(preference))
+                pick = llm._validate(prompt, completion.choices[0].message.content)
+                if pick is None:
+                    continue
+                answered += 1
+                if pick.product_id in index.top_k(preference, k):
+                    hits += 1
+                else:
+                    print(f"  miss: {preference!r} -> {pick.name}")
+            print(f"  recall@{k} vs full-catalog LLM pick: {hits}/{answered} preferences")
+        else:
+            print(f"  recall@{k} vs full-catalog LLM pick: skipped (set DEEPSEEK_API_KEY)")
+        print(f"  retrieval latency: {query_ms:.3f} ms/query over {len(preferences)} load_test preferences")
+        print(f"  prompt tokens (est.): full catalog {full_tokens}, top-{k} candidates {candidate_tokens}")
+
+        print(f"{'products':>10} {'index build':>14} {'query':>12} {'1-product update':>18}")
+        for size in args.sizes or [1_000, 10_000]:
+            add_synthetic_products(db_logic.DB_FILE, size - len(catalog.get_catalog().products))
+            catalog.invalidate()
+            catalog_data = catalog.get_catalog()
+            fresh = retrieval.RetrievalIndex()
+            start = time.perf_counter()
+            fresh.update(catalog_data.version, catalog_data.products_with_attributes)
+            build_ms = (time.perf_counter() - start) * 1000
+            query_ms = timeit(lambda: fresh.top_k("奶香浓郁 寒天晶球 Q弹", k), 100)
+            changed = list(catalog_data.products_with_attributes)
+            pid, name, price, attributes = changed[0]
+            changed[0] = (pid, name, price, attributes + [('口味', '新口味')])
+            start = time.perf_counter()
+            fresh.update(None, changed)
+            update_ms = (time.perf_counter() - start) * 1000
+            print(f"{size:>10} {build_ms:>11.1f} ms {query_ms:>9.3f} ms {update_ms:>15.2f} ms")
+        db_logic.get_pool().close_all()
+
+
+def bench_batch(args):
+    """Local recommendations for many preferences: one recommend() per preference vs recommend_batch()."""
+    import catalog
+    import recommenders
+
+    preferences = ["清爽 不要咖啡因", "想喝水果茶", "奶香浓郁", "来点Q弹的小料", "芒果",
+                   "椰奶", "不要太甜", "提神", "草莓", "热量低一点"] * 10
+    with tempfile.TemporaryDirectory() as workdir:
+        scratch_db(workdir)
+        print(f"{len(preferences)} preferences per batch")
+        print(f"{'products':>10} {'one by one':>14} {'batch':>12} {'speedup':>9}")
+        for size in args.sizes or [1_000, 10_000]:
+            add_synthetic_products(db_logic.DB_FILE, size - len(catalog.get_catalog().products))
+            catalog.invalidate()
+            recommender = recommenders.LocalRecommender()
+            assert recommender.recommend_batch(preferences) == [recommender.recommend(p) for p in preferences]
+            single_ms = timeit(lambda: [recommender.recommend(p) for p in preferences], args.repeat)
+            batch_ms = timeit(lambda: recommender.recommend_batch(preferences), args.repeat)
+            print(f"{size:>10} {single_ms:>11.1f} ms {batch_ms:>9.1f} ms {single_ms / batch_ms:>8.1f}x")
+        db_logic.get_pool().close_all()
+
+
+def bench_names(args):
+    """Product name resolution: exact, normalized and fuzzy lookups against catalogs of growing size."""
+    import random
+    import name_index
+
+    rng = random.Random(7)
+    syllables = "红绿乌龙茉莉奶茶芒果草莓椰珍珠布丁柠檬葡萄桃荔枝厚乳芋泥"
+    print(f"{'names':>10} {'build':>11} {'exact':>11} {'normalized':>11} {'fuzzy':>11} {'fuzzy hit':>10}")
+    for size in args.sizes or [1_000, 10_000, 50_000]:
+        names = [(i, "".join(rng.choice(syllables) for _ in range(rng.randint(4, 9))) + str(i))
+                 for i in range(size)]
+        start = time.perf_counter()
+        index = name_index.NameIndex(names)
+        build_ms = (time.perf_counter() - start) * 1000
+        sample = names[:500]
+        # A typo: one extra character inserted before the last one.
+        typos = [name[:-1] + "了" + name[-1] for _, name in sample]
+        exact_ms = timeit(lambda: [index.resolve(name) for _, name in sample], args.repeat) / len(sample)
+        normalized_ms = timeit(lambda: [index.resolve(f" {name}！") for _, name in sample], args.repeat) / len(sample)
+        fuzzy_ms = timeit(lambda: [index.resolve(name) for name in typos], args.repeat) / len(sample)
+        hits = sum(1 for (item_id, _), typo in zip(sample, typos) if (index.resolve(typo) or (None,))[0] == item_id)
+        print(f"{size:>10} {build_ms:>8.0f} ms {exact_ms:>8.4f} ms {normalized_ms:>8.4f} ms "
+              f"{fuzzy_ms:>8.4f} ms {hits / len(sample):>9.1%}")
+
+
+def bench_availability(args):
+    """Units makeable from current stock: one recipe query per product vs availability.max_makeable()."""
+    import catalog
+    import availability
+
+    def per_product():
+        units = {}
+        with db_logic.get_db_connection() as conn:
+            for (product_id,) in conn.execute("SELECT id FROM products").fetchall():
+                rows = conn.execute("""
+                    SELECT i.stock_quantity, r.quantity_needed FROM recipes r
+                    JOIN ingredients i ON i.id = r.ingredient_id WHERE r.product_id = ?
+                """, (product_id,)).fetchall()
+                units[product_id] = min((int(stock // qty) for stock, qty in rows if qty > 0), default=0)
+        return units
+
+    with tempfile.TemporaryDirectory() as workdir:
+        scratch_db(workdir)
+        print(f"{'products':>10} {'per product':>14} {'vectorized':>12} {'speedup':>9}")
+        for size in args.sizes or [100, 1_000, 10_000]:
+            add_synthetic_products(db_logic.DB_FILE, size - len(catalog.get_catalog().products), with_recipes=True)
+            catalog.invalidate()
+            availability.max_makeable()  # builds the recipe matrix once per catalog version
+            legacy_ms = timeit(per_product, args.repeat)
+            vector_ms = timeit(availability.max_makeable, args.repeat)
+            print(f"{size:>10} {legacy_ms:>11.2f} ms {vector_ms:>9.2f} ms {legacy_ms / vector_ms:>8.1f}x")
+        db_logic.get_pool().close_all()
+
+
+def add_synthetic_movements(path, days, per_day=1000):
+    """Appends `days` days of sale_deduction movements ending now, spread over opening hours."""
+    conn = sqlite3.connect(path)
+    try:
+        ingredient_ids = [row[0] for row in conn.execute("SELECT id FROM ingredients")]
+        end = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0)
+        step = 86400 / per_day
+
+        def rows():
+            for i in range(days * per_day):
+                t = end - datetime.timedelta(seconds=i * step)
+                yield (ingredient_ids[i % len(ingredient_ids)], -0.01 - (i % 7) * 0.005,
+                       'sale_deduction', t.strftime("%Y-%m-%d %H:%M:%S"))
+
+        conn.executemany("INSERT INTO inventory_movements (ingredient_id, quantity_change, movement_type, movement_time) "
+                         "VALUES (?, ?, ?, ?)", rows())
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def bench_forecast(args):
+    """Depletion forecast over growing movement history: full forecast time at a 28-day and a whole-history window."""
+    import forecast
+
+    with tempfile.TemporaryDirectory() as workdir:
+        scratch_db(workdir)
+        print(f"{'history':>10} {'movements':>10} {'28-day window':>14} {'full history':>14}")
+        added = 0
+        for days in args.sizes or [365, 1095]:
+            add_synthetic_movements(db_logic.DB_FILE, days - added)
+            added = days
+            with db_logic.get_db_connection() as conn:
+                movements = conn.execute("SELECT COUNT(*) FROM inventory_movements").fetchone()[0]
+            window_ms = timeit(forecast.forecast_depletion, args.repeat)
+            full_ms = timeit(lambda: forecast.forecast_depletion(window_days=days), args.repeat)
+            print(f"{days:>6} days {movements:>10} {window_ms:>11.0f} ms {full_ms:>11.0f} ms")
+        db_logic.get_pool().close_all()
+
+
+def bench_widgets(args):
+    """Refreshing a Treeview after a few rows changed: delete-and-reinsert everything vs KeyedTreeview.sync()."""
+    import tkinter
+    from tkinter import ttk
+    import widget_sync
+
+    try:
+        root = tkinter.Tk()
+    except tkinter.TclError as e:
+        print(f"Tk is not available ({e}); this benchmark needs a display.")
+        return
+    root.withdraw()
+    tree = ttk.Treeview(root, columns=("id", "name", "price"), show="headings")
+    tree.pack()
+    repeat = min(args.repeat, 50)
+    print(f"{'rows':>8} {'rebuild':>10} {'sync':>10} {'items touched':>14}")
+    for size in args.sizes or [500, 5000]:
+        rows = [(pid, f"产品{pid}", f"{10 + pid % 20:.2f}") for pid in range(size)]
+        versions = []
+        for i in range(repeat):
+            # Each refresh sees three re-priced rows, one new row and one removed row.
+            changed = list(rows)
+            for j in (i, i + size // 3, i + 2 * size // 3):
+                pid, name, _ = changed[j % size]
+                changed[j % size] = (pid, name, f"{i % 7 + 30:.2f}")
+            del changed[(i * 7) % size]
+            changed.append((size + i, f"产品{size + i}", "18.00"))
+            versions.append(changed)
+
+        rebuild_versions = iter(versions)
+
+        def rebuild():
+            tree.delete(*tree.get_children())
+            for row in next(rebuild_versions):
+                tree.insert("", "end", values=row)
+            root.update_idletasks()
+
+        rebuild_ms = timeit(rebuild, repeat)
+        tree.delete(*tree.get_children())
+        view = widget_sync.KeyedTreeview(tree)
+        view.sync(widget_sync.keyed(rows, key=lambda row: row[0]))
+        touched = []
+
+        sync_versions = iter(versions)
+
+        def sync():
+            touched.append(view.sync(widget_sync.keyed(next(sync_versions), key=lambda row: row[0])))
+            root.update_idletasks()
+
+        sync_ms = timeit(sync, repeat)
+        view.clear()
+        print(f"{size:>8} {rebuild_ms:>7.1f} ms {sync_ms:>7.1f} ms {sum(touched) / len(touched):>14.1f}")
+    root.destroy()
+
+
+def bench_search(args):
+    """POS product search: cost of one keystroke (name filter plus category filter) as the catalog grows."""
+    import catalog
+
+    print(f"{'products':>10} {'first call':>12} {'name':>10} {'name+category':>14} {'matches':>8}")
+    for size in args.sizes or [1_000, 10_000]:
+        with tempfile.TemporaryDirectory() as workdir:
+            path = scratch_db(workdir)
+            db_logic.get_all_products()  # apply migrations on the copy
+            add_synthetic_products(path, size - len(db_logic.get_all_products()))
+            catalog.invalidate()
+            snapshot = catalog.get_catalog()
+            category = snapshot.attribute_values('茶底')[0]
+            first_ms = timeit(lambda: snapshot.filter_products("饮品"), 1)
+            name_ms = timeit(lambda: snapshot.filter_products("饮品01"), args.repeat)
+            both_ms = timeit(lambda: snapshot.filter_products("饮品0", '茶底', category), args.repeat)
+            matches = len(snapshot.filter_products("饮品01"))
+            db_logic.get_pool().close_all()
+        print(f"{size:>10} {first_ms:>9.2f} ms {name_ms:>7.3f} ms {both_ms:>11.3f} ms {matches:>8}")
+
+
+def bench_sales(args):
+    """Concurrent order throughput: one commit per process_order() call vs the group-committing sale queue."""
+    from concurrent.futures import ThreadPoolExecutor
+    import sale_queue
+
+    def run(process_order, clients, orders):
+        with db_logic.get_db_connection() as conn:
+            conn.execute("UPDATE ingredients SET stock_quantity = 1e12")
+            conn.commit()
+            product_ids = [row[0] for row in conn.execute("SELECT DISTINCT product_id FROM recipes")]
+
+        def client(n):
+            return [process_order([(product_ids[(n + i) % len(product_ids)], 1)])[0] for i in range(orders // clients)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            results = [ok for batch in pool.map(client, range(clients)) for ok in batch]
+        elapsed = time.perf_counter() - start
+        return len(results) / elapsed, results.count(False)
+
+    print(f"{'clients':>8} {'per-call commit':>16} {'failed':>7} {'sale queue':>12} {'failed':>7} {'orders/batch':>13}")
+    for clients in args.sizes or [1, 8, 32]:
+        with tempfile.TemporaryDirectory() as workdir:
+            scratch_db(workdir)
+            direct_rate, direct_failed = run(db_logic.process_order, clients, args.repeat)
+            writer = sale_queue.SaleQueue()
+            queue_rate, queue_failed = run(writer.process_order, clients, args.repeat)
+            writer.close()
+            db_logic.get_pool().close_all()
+        print(f"{clients:>8} {direct_rate:>11.0f} o/s {direct_failed:>7} {queue_rate:>8.0f} o/s {queue_failed:>7} "
+              f"{writer.orders / max(writer.batches, 1):>13.1f}")
+
+
+def _stress_seller(path, product_id, attempts, results):
+    db_logic.DB_FILE = path
+    sold = failed = 0
+    for _ in range(attempts):
+        success, message = db_logic.process_order([(product_id, 1)])
+        if success:
+            sold += 1
+        elif not message.startswith("库存不足"):
+            failed += 1
+    results.put((sold, failed))
+
+
+def bench_stress(args):
+    """Processes racing to sell one product from scarce stock: stock must never go negative."""
+    import multiprocessing
+
+    processes = (args.sizes or [8])[0]
+    with tempfile.TemporaryDirectory() as workdir:
+        path = scratch_db(workdir)
+        db_logic.get_all_products()  # apply migrations before the sellers start
+        with db_logic.get_db_connection() as conn:
+            product_id = conn.execute("SELECT product_id FROM recipes GROUP BY product_id ORDER BY COUNT(*) DESC").fetchone()[0]
+            recipe = conn.execute("SELECT ingredient_id, quantity_needed FROM recipes WHERE product_id = ?", (product_id,)).fetchall()
+            # Stock for exactly `units` drinks, with every ingredient the bottleneck.
+            units = max(1, args.repeat // 2)
+            conn.executemany("UPDATE ingredients SET stock_quantity = ? WHERE id = ?",
+                             [(quantity * units + quantity / 2, ingredient_id) for ingredient_id, quantity in recipe])
+            conn.commit()
+        db_logic.get_pool().close_all()
+
+        results = multiprocessing.Queue()
+        sellers = [multiprocessing.Process(target=_stress_seller, args=(path, product_id, args.repeat, results))
+                   for _ in range(processes)]
+        start = time.perf_counter()
+        for seller in sellers:
+            seller.start()
+        totals = [results.get() for _ in sellers]
+        for seller in sellers:
+            seller.join()
+        elapsed = time.perf_counter() - start
+
+        with db_logic.get_db_connection() as conn:
+            lowest = min(conn.execute(f"SELECT stock_quantity FROM ingredients WHERE id IN ({', '.join('?' * len(recipe))})",
+                                      [ingredient_id for ingredient_id, _ in recipe]).fetchall())[0]
+        db_logic.get_pool().close_all()
+    sold = sum(s for s, _ in totals)
+    errors = sum(f for _, f in totals)
+    print(f"{processes} processes x {args.repeat} attempts on stock for {units} drinks in {elapsed:.1f} s")
+    print(f"  sold {sold}, other failures {errors}, lowest remaining stock {lowest:.3f}")
+    print("  OK" if sold <= units and lowest >= 0 else "  OVERSOLD: stock went negative")
+
+
+class CountingCursor:
+    """Wraps a cursor, counting execute()/executemany() calls and the statement executions they cause."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.calls = 0
+        self.executions = 0
+
+    def execute(self, sql, params=()):
+        self.calls += 1
+        self.executions += 1
+        return self.cursor.execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        self.calls += 1
+        self.executions += len(seq_of_params)
+        return self.cursor.executemany(sql, seq_of_params)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+def bench_deduction(args):
+    """One sale of the largest recipe: statements per sale and sales per second, per-ingredient loop vs batched."""
+    import shop_time
+
+    def per_ingredient(c, product_id):
+        name, price = c.execute("SELECT name, price FROM products WHERE id = ?", (product_id,)).fetchone()
+        recipe = c.execute("""
+            SELECT i.id, r.quantity_needed, i.stock_quantity, i.name FROM recipes r
+            JOIN ingredients i ON r.ingredient_id = i.id WHERE r.product_id = ?
+        """, (product_id,)).fetchall()
+        if any(stock < qty for _, qty, stock, _ in recipe):
+            return False
+        for ing_id, qty, _, _ in recipe:
+            c.execute("UPDATE ingredients SET stock_quantity = stock_quantity - ? WHERE id = ?", (qty, ing_id))
+            c.execute("INSERT INTO inventory_movements (ingredient_id, quantity_change, movement_type) VALUES (?, ?, ?)",
+                      (ing_id, -qty, 'sale_deduction'))
+        sale_time = shop_time.now_db_timestamp()
+        c.execute("INSERT INTO sales (product_id, quantity_sold, sale_time, total_price) VALUES (?, 1, ?, ?)",
+                  (product_id, sale_time, price))
+        c.execute("""
+            INSERT INTO sales_daily_rollup (day, product_id, sale_count, quantity, revenue) VALUES (?, ?, 1, 1, ?)
+            ON CONFLICT (day, product_id) DO UPDATE SET sale_count = sale_count + 1, quantity = quantity + 1,
+                revenue = revenue + excluded.revenue
+        """, (shop_time.local_day(sale_time), product_id, price))
+        return True
+
+    def batched(c, product_id):
+        return db_logic.apply_order(c, [(product_id, 1)])[0]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        scratch_db(workdir)
+        with db_logic.get_db_connection() as conn:
+            product_id, ingredients = conn.execute(
+                "SELECT product_id, COUNT(*) FROM recipes GROUP BY product_id ORDER BY COUNT(*) DESC").fetchone()
+            conn.execute("UPDATE ingredients SET stock_quantity = 1e12")
+            conn.commit()
+            print(f"product {product_id}: {ingredients} ingredients, {args.repeat} sales each")
+            variants = (("per-ingredient", per_ingredient), ("batched", batched))
+            counts = {}
+            for label, sell in variants:
+                cursor = CountingCursor(conn.cursor())
+                sell(cursor, product_id)
+                conn.commit()
+                counts[label] = (cursor.calls, cursor.executions)
+            # Alternate the variants in rounds so WAL growth and checkpoints hit both alike.
+            elapsed = dict.fromkeys(counts, 0.0)
+            rounds = 10
+            for _ in range(rounds):
+                for label, sell in variants:
+                    start = time.perf_counter()
+                    for _ in range(args.repeat // rounds):
+                        sell(conn.cursor(), product_id)
+                        conn.commit()
+                    elapsed[label] += time.perf_counter() - start
+            print(f"{'':>14} {'calls/sale':>11} {'statements/sale':>16} {'sales/s':>9}")
+            for label, (calls, executions) in counts.items():
+                print(f"{label:>14} {calls:>11} {executions:>16} {args.repeat // rounds * rounds / elapsed[label]:>9.0f}")
+        db_logic.get_pool().close_all()
+
+
+def bench_import(args):
+    """Importing attribute rows from a CSV file: one add_product_attribute() per row vs bulk_import."""
+    import csv
+    import bulk_import
+
+    sample = min(args.repeat, 2_000)
+    print(f"{'rows':>10} {'per-row (est.)':>15} {'bulk import':>13} {'rows/s':>10}")
+    for size in args.sizes or [10_000, 100_000]:
+        with tempfile.TemporaryDirectory() as workdir:
+            path = scratch_db(workdir)
+            db_logic.get_all_products()  # apply migrations on the copy
+            products = -(-size // len(ATTRIBUTE_NAMES))
+            add_synthetic_products(path, products)
+            names = [name for _, name, _ in db_logic.get_all_products()][-products:]
+            csv_path = os.path.join(workdir, 'attributes.csv')
+            with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(['产品名称', '属性名称', '属性值'])
+                writer.writerows((names[i // len(ATTRIBUTE_NAMES)], ATTRIBUTE_NAMES[i % len(ATTRIBUTE_NAMES)], f"导入值{i}")
+                                 for i in range(size))
+
+            ids = {name: pid for pid, name, _ in db_logic.get_all_products()}
+            start = time.perf_counter()
+            with open(csv_path, newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                next(reader)
+                for name, attribute, value in itertools.islice(reader, sample):
+                    db_logic.add_product_attribute(ids[name], attribute, value)
+            per_row_s = (time.perf_counter() - start) / sample * size
+
+            start = time.perf_counter()
+            written, _ = bulk_import.import_file(csv_path, 'attributes', quiet=True)
+            bulk_s = time.perf_counter() - start
+            db_logic.get_pool().close_all()
+        print(f"{written:>10} {per_row_s:>13.1f} s {bulk_s:>11.2f} s {written / bulk_s:>10.0f}")
+
+
+BENCHMARKS = {
+    'pool': bench_pool,
+    'reports': bench_reports,
+    'rollup': bench_rollup,
+    'attributes': bench_attributes,
+    'retrieval': bench_retrieval,
+    'batch': bench_batch,
+    'names': bench_names,
+    'availability': bench_availability,
+    'forecast': bench_forecast,
+    'widgets': bench_widgets,
+    'search': bench_search,
+    'sales': bench_sales,
+    'stress': bench_stress,
+    'deduction': bench_deduction,
+    'import': bench_import,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="奶茶店系统性能基准测试 (runs against a scratch copy of the database)")
+    parser.add_argument('name', choices=sorted(BENCHMARKS), help="benchmark to run")
+    parser.add_argument('--repeat', type=int, default=1000)
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        help="table sizes for benchmarks that scale with data volume")
+    args = parser.parse_args()
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == '__main__':
+    main()
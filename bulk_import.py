@@ -0,0 +1,327 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import sqlite3
+import sys
+from collections import namedtuple
+
+import db_logic
+import name_index
+
+# Rows written per transaction.
+CHUNK_SIZE = 5000
+
+# Column names accepted for each field; the Chinese headers match
+# export_recipes_to_csv.py, so its output can be imported back.
+FIELDS = {
+    "product": ("产品名称", "product", "product_name", "name"),
+    "price": ("产品价格", "价格", "price"),
+    "ingredient": ("配料名称", "原料名称", "ingredient", "ingredient_name"),
+    "quantity": ("所需数量", "数量", "quantity", "quantity_needed"),
+    "attribute": ("属性名称", "attribute", "attribute_name"),
+    "value": ("属性值", "value", "attribute_value"),
+}
+# Columns never read as attributes in the one-column-per-attribute layout.
+NON_ATTRIBUTE_COLUMNS = set(FIELDS["product"]) | {"产品ID", "product_id", "id"}
+
+
+# --- Readers: each yields (line number, {column: value} or BadRecord) ---
+
+# A line a reader could not turn into a record; the row builders skip and report it.
+BadRecord = namedtuple("BadRecord", ["reason"])
+
+
+def read_csv(f):
+    reader = csv.DictReader(f)
+    for row in reader:
+        if None in row:
+            # DictReader files surplus fields under the key None.
+            yield reader.line_num, BadRecord("字段数多于表头")
+        else:
+            yield reader.line_num, row
+
+
+def read_jsonl(f):
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, BadRecord(f"JSON 格式错误 ({e.msg})")
+            continue
+        if isinstance(record, dict):
+            yield line_number, record
+        else:
+            yield line_number, BadRecord("不是 JSON 对象")
+
+
+def read_blocks(f):
+    """Reads 'key: value' lines, as in aipei.csv, one record per block.
+
+    A record ends when its first key comes round again after other keys;
+    blank lines are ignored and a repeated first line is read once.
+    """
+    record, start = {}, None
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        key, sep, value = line.replace("：", ":", 1).partition(":")
+        if not sep:
+            continue
+        key, value = key.strip(), value.strip()
+        first_key = next(iter(record), None)
+        if key == first_key and len(record) > 1:
+            yield start, record
+            record = {}
+        if not record:
+            start = line_number
+        record[key] = value
+    if record:
+        yield start, record
+
+
+READERS = {"csv": read_csv, "jsonl": read_jsonl, "blocks": read_blocks}
+
+
+def detect_format(path, f):
+    """jsonl by extension; otherwise blocks if the first line is 'key: value' with no commas, else csv."""
+    if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson"):
+        return "jsonl"
+    first = next((line for line in itertools.islice(f, 50) if line.strip()), "")
+    f.seek(0)
+    if ("," not in first) and (":" in first or "：" in first):
+        return "blocks"
+    return "csv"
+
+
+def field(record, name):
+    for key in FIELDS[name]:
+        value = record.get(key)
+        if value is not None and str(value).strip() != "":
+            return str(value).strip()
+    return None
+
+
+class NameMap:
+    """Names to ids from one prefetched query: exact first, then after name_index.normalize()."""
+
+    def __init__(self, rows):
+        self.exact = {}
+        self.normalized = {}
+        for item_id, name in rows:
+            self.exact[name] = item_id
+            key = name_index.normalize(name)
+            # Names that normalize alike are only reachable by their exact spelling.
+            self.normalized[key] = None if key in self.normalized else item_id
+
+    def get(self, name):
+        if name is None:
+            return None
+        item_id = self.exact.get(name)
+        return item_id if item_id is not None else self.normalized.get(name_index.normalize(name))
+
+
+class ImportStats:
+    """Written/skipped counters, printed as a progress line after every chunk."""
+
+    MAX_REPORTED = 10
+
+    def __init__(self, kind, quiet=False):
+        self.kind = kind
+        self.quiet = quiet
+        self.written = 0
+        self.skipped = 0
+        self._line_open = False  # the progress line has been drawn and not ended yet
+
+    def skip(self, line_number, reason):
+        self.skipped += 1
+        if not self.quiet and self.skipped <= self.MAX_REPORTED:
+            self.end_line()
+            print(f"  第 {line_number} 行: {reason}，跳过。")
+
+    def progress(self, written):
+        self.written += written
+        if not self.quiet:
+            print(f"\r{self.kind}: 已写入 {self.written} 行，跳过 {self.skipped} 行", end="", flush=True)
+            self._line_open = True
+
+    def end_line(self):
+        if self._line_open:
+            print()
+            self._line_open = False
+
+
+# --- Row builders: turn records into parameter tuples, skipping bad rows ---
+
+def _number(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def _valid(records, stats):
+    for line_number, record in records:
+        if isinstance(record, BadRecord):
+            stats.skip(line_number, record.reason)
+        else:
+            yield line_number, record
+
+
+def product_rows(records, stats):
+    for line_number, record in _valid(records, stats):
+        name, price = field(record, "product"), _number(field(record, "price"))
+        if name is None or price is None or price < 0:
+            stats.skip(line_number, "缺少产品名称或价格无效")
+            continue
+        yield name, price
+
+
+def recipe_rows(records, stats, products, ingredients):
+    for line_number, record in _valid(records, stats):
+        product_id = products.get(field(record, "product"))
+        if product_id is None:
+            stats.skip(line_number, f"未找到产品 '{field(record, 'product')}'")
+            continue
+        ingredient = field(record, "ingredient")
+        if ingredient is None:
+            continue  # export_recipes_to_csv.py lists products without a recipe this way
+        ingredient_id, quantity = ingredients.get(ingredient), _number(field(record, "quantity"))
+        if ingredient_id is None:
+            stats.skip(line_number, f"未找到原料 '{ingredient}'")
+        elif quantity is None or quantity <= 0:
+            stats.skip(line_number, "用量必须是正数")
+        else:
+            yield product_id, ingredient_id, quantity
+
+
+def attribute_rows(records, stats, products):
+    for line_number, record in _valid(records, stats):
+        product_id = products.get(field(record, "product"))
+        if product_id is None:
+            stats.skip(line_number, f"未找到产品 '{field(record, 'product')}'")
+            continue
+        attribute = field(record, "attribute")
+        if attribute is not None:
+            pairs = [(attribute, field(record, "value"))]
+        else:
+            # One column per attribute, as in aipei.csv.
+            pairs = [(str(key).strip(), str(value).strip()) for key, value in record.items()
+                     if key not in NON_ATTRIBUTE_COLUMNS and value is not None and str(value).strip() != ""]
+        for name, value in pairs:
+            if value is None:
+                stats.skip(line_number, f"属性 '{name}' 没有值")
+            else:
+                yield product_id, name, value
+
+
+def stock_rows(records, stats, ingredients):
+    for line_number, record in _valid(records, stats):
+        ingredient_id, quantity = ingredients.get(field(record, "ingredient")), _number(field(record, "quantity"))
+        if ingredient_id is None:
+            stats.skip(line_number, f"未找到原料 '{field(record, 'ingredient')}'")
+        elif quantity is None or quantity <= 0:
+            stats.skip(line_number, "入库数量必须是正数")
+        else:
+            yield quantity, ingredient_id
+
+
+# --- Writer ---
+
+def _write_chunks(conn, rows, chunk_size, stats, write):
+    """Writes rows chunk by chunk with write(cursor, chunk), committing each chunk."""
+    c = conn.cursor()
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        write(c, chunk)
+        conn.commit()
+        stats.progress(len(chunk))
+
+
+def _replace_per_product(table, cleared):
+    """A write() that empties each product's rows in table the first time the product shows up."""
+    def delete_new_products(c, chunk):
+        new = {row[0] for row in chunk} - cleared
+        if new:
+            c.executemany(f"DELETE FROM {table} WHERE product_id = ?", [(product_id,) for product_id in new])
+            cleared.update(new)
+    return delete_new_products
+
+
+def import_file(path, kind, fmt=None, chunk_size=CHUNK_SIZE, replace=False, quiet=False):
+    """Streams path into the database; returns (rows written, rows skipped).
+
+    kind is 'products' (upserted by name), 'recipes' (each product's recipe
+    replaced by the rows for it), 'attributes' (appended, or replacing each
+    product's attributes with replace=True) or 'stock' (added to current
+    stock and logged as 'import' movements). Names are resolved through one
+    prefetched map per table.
+    """
+    stats = ImportStats(kind, quiet)
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        records = READERS[fmt or detect_format(path, f)](f)
+        with db_logic.get_db_connection() as conn:
+            products = NameMap(conn.execute("SELECT id, name FROM products"))
+            ingredients = NameMap(conn.execute("SELECT id, name FROM ingredients"))
+            if kind == "products":
+                def write(c, chunk):
+                    c.executemany("""
+                        INSERT INTO products (name, price) VALUES (?, ?)
+                        ON CONFLICT (name) DO UPDATE SET price = excluded.price
+                    """, chunk)
+                rows = product_rows(records, stats)
+            elif kind == "recipes":
+                delete_old = _replace_per_product("recipes", set())
+
+                def write(c, chunk):
+                    delete_old(c, chunk)
+                    c.executemany("INSERT INTO recipes (product_id, ingredient_id, quantity_needed) VALUES (?, ?, ?)", chunk)
+                rows = recipe_rows(records, stats, products, ingredients)
+            elif kind == "attributes":
+                delete_old = _replace_per_product("product_attributes", set()) if replace else None
+
+                def write(c, chunk):
+                    if delete_old:
+                        delete_old(c, chunk)
+                    c.executemany("INSERT INTO product_attributes (product_id, attribute_name, attribute_value) VALUES (?, ?, ?)", chunk)
+                rows = attribute_rows(records, stats, products)
+            elif kind == "stock":
+                def write(c, chunk):
+                    c.executemany("UPDATE ingredients SET stock_quantity = stock_quantity + ? WHERE id = ?", chunk)
+                    c.executemany("INSERT INTO inventory_movements (ingredient_id, quantity_change, movement_type) VALUES (?, ?, 'import')",
+                                  [(ingredient_id, quantity) for quantity, ingredient_id in chunk])
+                rows = stock_rows(records, stats, ingredients)
+            else:
+                raise ValueError(f"unknown import kind: {kind}")
+            _write_chunks(conn, rows, chunk_size, stats, write)
+    if kind != "stock":
+        db_logic.catalog_changed()
+    stats.end_line()
+    return stats.written, stats.skipped
+
+
+def main():
+    sys.stdout.reconfigure(encoding='utf-8')
+    parser = argparse.ArgumentParser(description="从 CSV / JSONL / 'key: value' 文件批量导入数据")
+    parser.add_argument('kind', choices=["products", "recipes", "attributes", "stock"])
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=sorted(READERS), help="默认按扩展名和首行内容自动识别")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--replace', action='store_true', help="attributes: 先删除文件中出现的产品的原有属性")
+    args = parser.parse_args()
+    try:
+        written, skipped = import_file(args.path, args.kind, args.format, args.chunk_size, args.replace)
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"\n导入失败: {e}")
+        sys.exit(1)
+    print(f"导入完成: 写入 {written} 行，跳过 {skipped} 行。")
+
+
+if __name__ == "__main__":
+    main()
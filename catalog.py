@@ -0,0 +1,160 @@
+import threading
+import time
+import db_logic
+import name_index
+
+# How long a loaded catalog is trusted before the catalog_version row is read
+# again to pick up changes made by other processes. Writes made through
+# db_logic in this process are seen immediately.
+CHECK_INTERVAL = 1.0
+
+
+class Catalog:
+    """An immutable in-memory snapshot of products, recipes, attributes and ingredient names."""
+
+    def __init__(self, snapshot):
+        self.version = snapshot["version"]
+        # [(id, name, price, [(attribute_name, attribute_value), ...]), ...] ordered by name
+        self.products_with_attributes = snapshot["products"]
+        self.products = [(pid, name, price) for pid, name, price, _ in self.products_with_attributes]
+        self.products_by_id = {row[0]: row for row in self.products}
+        self.product_ids_by_name = {name: pid for pid, name, _ in self.products}
+
+        self.ingredients = snapshot["ingredients"]
+        self.ingredients_by_id = {row[0]: row for row in self.ingredients}
+        self.ingredient_ids_by_name = {name: ing_id for ing_id, name, _ in self.ingredients}
+
+        # product_id -> (ingredient_ids, quantities), two parallel tuples
+        recipes = {}
+        for product_id, ingredient_id, quantity in snapshot["recipes"]:
+            ids, quantities = recipes.setdefault(product_id, ([], []))
+            ids.append(ingredient_id)
+            quantities.append(quantity)
+        self.recipes = {pid: (tuple(ids), tuple(qtys)) for pid, (ids, qtys) in recipes.items()}
+
+        # product_id -> [(attribute_name, attribute_value), ...]
+        self.attributes = {pid: attrs for pid, _, _, attrs in self.products_with_attributes}
+        self._name_indexes = {}
+        # Built on first filter_products(): normalized product names, and
+        # (attribute_name, attribute_value) -> product ids.
+        self._search_keys = None
+        self._products_by_attribute = None
+        self._index_lock = threading.Lock()
+
+    def _name_index(self, kind, rows):
+        # Built on first lookup; most catalog reloads never resolve a typed name.
+        index = self._name_indexes.get(kind)
+        if index is None:
+            with self._index_lock:
+                index = self._name_indexes.get(kind)
+                if index is None:
+                    index = name_index.NameIndex((row[0], row[1]) for row in rows)
+                    self._name_indexes[kind] = index
+        return index
+
+    def product_by_name(self, name):
+        """Returns (id, name, price) or None."""
+        product_id = self.product_ids_by_name.get(name)
+        return None if product_id is None else self.products_by_id[product_id]
+
+    def ingredient_by_name(self, name):
+        """Returns (id, name, unit) or None."""
+        ingredient_id = self.ingredient_ids_by_name.get(name)
+        return None if ingredient_id is None else self.ingredients_by_id[ingredient_id]
+
+    def resolve_product(self, name, fuzzy=False):
+        """Like product_by_name, but tolerant of width, case, punctuation and spacing.
+
+        fuzzy=True also accepts near misses and names embedded in longer text;
+        use it only to read LLM answers, never to pick what gets sold.
+        """
+        product = self.product_by_name(name)
+        if product is not None:
+            return product
+        match = self._name_index("products", self.products).resolve(name, fuzzy)
+        return None if match is None else self.products_by_id[match[0]]
+
+    def resolve_ingredient(self, name, fuzzy=False):
+        """Like ingredient_by_name, but tolerant of width, case, punctuation and spacing; see resolve_product."""
+        ingredient = self.ingredient_by_name(name)
+        if ingredient is not None:
+            return ingredient
+        match = self._name_index("ingredients", self.ingredients).resolve(name, fuzzy)
+        return None if match is None else self.ingredients_by_id[match[0]]
+
+    def attributes_for(self, product_id):
+        return self.attributes.get(product_id, [])
+
+    def attribute_values(self, attribute_name):
+        """Distinct values of one attribute across all products, sorted."""
+        return sorted({value for attrs in self.attributes.values() for name, value in attrs if name == attribute_name})
+
+    def filter_products(self, text="", attribute_name=None, attribute_value=None):
+        """Products (id, name, price) whose normalized name contains text, in catalog order.
+
+        With attribute_name and attribute_value set, only products carrying
+        that attribute value are kept.
+        """
+        if self._search_keys is None:
+            with self._index_lock:
+                if self._search_keys is None:
+                    by_attribute = {}
+                    for pid, attrs in self.attributes.items():
+                        for attr in attrs:
+                            by_attribute.setdefault(tuple(attr), set()).add(pid)
+                    self._products_by_attribute = by_attribute
+                    self._search_keys = [name_index.normalize(name) for _, name, _ in self.products]
+        text = name_index.normalize(text or "")
+        products = self.products
+        if attribute_name is not None and attribute_value is not None:
+            ids = self._products_by_attribute.get((attribute_name, attribute_value), set())
+            if text:
+                return [product for product, key in zip(products, self._search_keys) if text in key and product[0] in ids]
+            return [product for product in products if product[0] in ids]
+        if text:
+            return [product for product, key in zip(products, self._search_keys) if text in key]
+        return products
+
+    def recipe_for(self, product_id):
+        return self.recipes.get(product_id, ((), ()))
+
+
+_lock = threading.Lock()
+_catalog = None
+_loaded_for = None  # (db_file, local generation) the cached catalog belongs to
+_checked_at = 0.0
+
+
+def get_catalog():
+    """Returns the current Catalog, reloading it only when the catalog has changed."""
+    global _catalog, _loaded_for, _checked_at
+    key = (db_logic.DB_FILE, db_logic.get_catalog_generation())
+    now = time.monotonic()
+    catalog = _catalog
+    if catalog is not None and _loaded_for == key and now - _checked_at < CHECK_INTERVAL:
+        return catalog
+    with _lock:
+        if _catalog is not None and _loaded_for == key:
+            if now - _checked_at < CHECK_INTERVAL:
+                return _catalog
+            if db_logic.get_catalog_version() == _catalog.version:
+                _checked_at = now
+                return _catalog
+        snapshot = db_logic.load_catalog_snapshot()
+        if snapshot is None:
+            # Keep serving the last good catalog if the database is unavailable.
+            return _catalog or Catalog({"version": None, "products": [], "ingredients": [], "recipes": []})
+        _catalog = Catalog(snapshot)
+        _loaded_for = key
+        _checked_at = now
+        return _catalog
+
+
+def invalidate():
+    """Forces the next get_catalog() call to reload from the database.
+
+    Takes no lock: it is called from the Tk thread while a worker may hold
+    _lock for a whole reload. Bumping the generation makes the cached
+    catalog's key stale instead.
+    """
+    db_logic.catalog_changed()
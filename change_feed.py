@@ -0,0 +1,51 @@
+import sqlite3
+
+import database
+
+# Tables whose row changes are written to change_log by triggers (migration 6).
+TRACKED_TABLES = ("ingredients", "products", "recipes", "product_attributes", "sales")
+
+
+class ChangeFeed:
+    """Reports which tracked tables, and which of their rows, changed since the last poll.
+
+    It keeps one connection of its own: PRAGMA data_version on it changes
+    whenever any other connection or process commits, so an idle poll costs a
+    single pragma. Only then is change_log read past the last seen seq.
+    """
+
+    def __init__(self, db_file):
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        database.migrate(self.conn)
+        self.data_version = self._data_version()
+        self.last_seq = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+    def _data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def poll(self):
+        """Returns {table: set of row ids} for changes since the last poll, or {} if none.
+
+        A table maps to None when its changed rows are unknown because the
+        log was pruned past what this feed had seen; reload it completely.
+        """
+        version = self._data_version()
+        if version == self.data_version:
+            return {}
+        self.data_version = version
+        rows = self.conn.execute(
+            "SELECT seq, table_name, row_id FROM change_log WHERE seq > ? ORDER BY seq", (self.last_seq,)).fetchall()
+        if not rows:
+            # Something untracked changed (inventory movements, rollups).
+            return {}
+        gap = rows[0][0] > self.last_seq + 1
+        self.last_seq = rows[-1][0]
+        if gap:
+            return {table: None for table in TRACKED_TABLES}
+        changes = {}
+        for _, table, row_id in rows:
+            changes.setdefault(table, set()).add(row_id)
+        return changes
+
+    def close(self):
+        self.conn.close()
@@ -1,5 +1,6 @@
 
 import sqlite3
+import shop_time
 
 def create_connection(db_file):
     """ create a database connection to a SQLite database """
@@ -84,9 +85,159 @@ def create_tables(conn):
             );
         """)
         print("Tables created successfully.")
+        migrate(conn)
     except sqlite3.Error as e:
         print(e)
 
+# Schema migrations, applied in order on top of the tables above. PRAGMA
+# user_version records the last version applied. Each step is either a SQL
+# statement or a callable taking the connection.
+MIGRATIONS = [
+    (1, "secondary indexes", [
+        "CREATE INDEX IF NOT EXISTS idx_recipes_product ON recipes (product_id, ingredient_id, quantity_needed)",
+        "CREATE INDEX IF NOT EXISTS idx_product_attributes_product ON product_attributes (product_id, attribute_name, attribute_value)",
+        "CREATE INDEX IF NOT EXISTS idx_sales_sale_time ON sales (sale_time)",
+        "CREATE INDEX IF NOT EXISTS idx_sales_product ON sales (product_id)",
+        "CREATE INDEX IF NOT EXISTS idx_inventory_movements_ingredient_time ON inventory_movements (ingredient_id, movement_time)",
+    ]),
+    (2, "covering sale_time index for range reports", [
+        "DROP INDEX IF EXISTS idx_sales_sale_time",
+        "CREATE INDEX IF NOT EXISTS idx_sales_sale_time_covering ON sales (sale_time, product_id, quantity_sold, total_price)",
+    ]),
+    (3, "sales_daily_rollup", [
+        """
+        CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+            day TEXT NOT NULL, -- shop-local date, YYYY-MM-DD
+            product_id INTEGER NOT NULL,
+            sale_count INTEGER NOT NULL,
+            quantity INTEGER NOT NULL,
+            revenue REAL NOT NULL,
+            PRIMARY KEY (day, product_id)
+        ) WITHOUT ROWID
+        """,
+        lambda conn: rebuild_sales_rollup(conn),  # backfill existing sales
+    ]),
+    (4, "catalog version counter", [
+        """
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+        """,
+        "INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)",
+    ] + [
+        # Any process that changes the catalog bumps the counter, so in-memory
+        # caches can tell whether they are stale with a single-row read.
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.split()[0].lower()}_catalog_version
+        AFTER {event} ON {table}
+        BEGIN
+            UPDATE catalog_version SET version = version + 1 WHERE id = 1;
+        END
+        """
+        for table, events in (
+            ("products", ("INSERT", "UPDATE", "DELETE")),
+            ("recipes", ("INSERT", "UPDATE", "DELETE")),
+            ("product_attributes", ("INSERT", "UPDATE", "DELETE")),
+            # Stock levels change with every sale and are not part of the catalog.
+            ("ingredients", ("INSERT", "UPDATE OF name, unit", "DELETE")),
+        )
+        for event in events
+    ]),
+    (5, "covering movement index for consumption forecasts", [
+        "CREATE INDEX IF NOT EXISTS idx_inventory_movements_type_time_covering "
+        "ON inventory_movements (movement_type, movement_time, ingredient_id, quantity_change)",
+    ]),
+    (6, "change log for UI refresh", [
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER -- id of the changed ingredient / product (product_id for recipes, attributes, sales)
+        )
+        """,
+        # Keep roughly the last 10000 entries; readers that fall further
+        # behind see a gap in seq and reload everything.
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_change_log_prune
+        AFTER INSERT ON change_log
+        WHEN NEW.seq % 1000 = 0
+        BEGIN
+            DELETE FROM change_log WHERE seq <= NEW.seq - 10000;
+        END
+        """,
+    ] + [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_change_log
+        AFTER {event} ON {table}
+        BEGIN
+            INSERT INTO change_log (table_name, row_id) VALUES ('{table}', {"OLD" if event == "DELETE" else "NEW"}.{key});
+        END
+        """
+        for table, key, events in (
+            ("ingredients", "id", ("INSERT", "UPDATE", "DELETE")),
+            ("products", "id", ("INSERT", "UPDATE", "DELETE")),
+            ("recipes", "product_id", ("INSERT", "UPDATE", "DELETE")),
+            ("product_attributes", "product_id", ("INSERT", "UPDATE", "DELETE")),
+            ("sales", "product_id", ("INSERT", "DELETE")),
+        )
+        for event in events
+    ]),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def rebuild_sales_rollup(conn):
+    """ regenerate sales_daily_rollup from the raw sales table (caller commits) """
+    conn.create_function("shop_day", 1, shop_time.local_day, deterministic=True)
+    conn.execute("DELETE FROM sales_daily_rollup")
+    # UTC offsets are multiples of 15 minutes, so sales are pre-aggregated into
+    # 15-minute buckets in SQL and shop_day() only runs once per bucket.
+    conn.execute("""
+        INSERT INTO sales_daily_rollup (day, product_id, sale_count, quantity, revenue)
+        SELECT shop_day(bucket), product_id, SUM(n), SUM(qty), SUM(rev)
+        FROM (
+            SELECT substr(sale_time, 1, 14) || printf('%02d', CAST(substr(sale_time, 15, 2) AS INTEGER) / 15 * 15) AS bucket,
+                   product_id, COUNT(*) AS n, SUM(quantity_sold) AS qty, SUM(total_price) AS rev
+            FROM sales
+            GROUP BY 1, 2
+        )
+        GROUP BY 1, 2
+    """)
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """ apply pending migrations, then refresh the query planner statistics """
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return False
+    applied = False
+    for version, description, steps in MIGRATIONS:
+        # Take the write lock first and re-check, so two processes starting at
+        # the same time cannot both apply the same migration.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        applied = True
+        print(f"Applied migration {version}: {description}")
+    if applied:
+        conn.execute("ANALYZE")
+        conn.commit()
+    return applied
+
 if __name__ == '__main__':
     db_file = 'nainai_tea.db'
     connection = create_connection(db_file)
@@ -1,269 +1,524 @@
-
 import sqlite3
+import json
 import datetime
+import threading
+import db_pool
+import database
+import shop_time
 
 DB_FILE = 'nainai_tea.db'
+POOL_SIZE = 8
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Returns the process-wide connection pool for DB_FILE."""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.db_file == DB_FILE:
+        return pool
+    with _pool_lock:
+        # Threads racing here at startup must all end up with the same pool.
+        if _pool is None or _pool.db_file != DB_FILE:
+            if _pool is not None:
+                _pool.close_all()
+            _pool = db_pool.ConnectionPool(DB_FILE, max_size=POOL_SIZE, on_connect=database.migrate)
+        return _pool
 
 def get_db_connection():
-    """Establishes a connection to the SQLite database."""
-    return sqlite3.connect(DB_FILE)
+    """Borrows a pooled connection to the SQLite database for a with-block."""
+    return get_pool().borrow()
+
+_catalog_generation = 0
+
+def catalog_changed():
+    """Marks the in-process catalog cache stale after a write through db_logic."""
+    global _catalog_generation
+    _catalog_generation += 1
+
+def get_catalog_generation():
+    return _catalog_generation
+
+def get_connection_stats():
+    """Returns pool counters and per-function timings for db_logic calls."""
+    return {"pool": get_pool().stats(), "calls": db_pool.get_call_stats()}
 
 # --- Ingredient Logic ---
 
+@db_pool.timed
 def add_ingredient(name, stock_quantity, unit, low_stock_threshold):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("INSERT INTO ingredients (name, stock_quantity, unit, low_stock_threshold) VALUES (?, ?, ?, ?)",
-                  (name, stock_quantity, unit, low_stock_threshold))
-        conn.commit()
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute("INSERT INTO ingredients (name, stock_quantity, unit, low_stock_threshold) VALUES (?, ?, ?, ?)",
+                      (name, stock_quantity, unit, low_stock_threshold))
+            conn.commit()
+        catalog_changed()
         return True, f"原料 '{name}' 添加成功！"
     except sqlite3.IntegrityError:
         return False, f"错误: 原料 '{name}' 已存在."
     except sqlite3.Error as e:
         return False, f"数据库错误: {e}"
-    finally:
-        if conn:
-            conn.close()
 
+@db_pool.timed
 def get_all_ingredients():
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("SELECT id, name, stock_quantity, unit, low_stock_threshold FROM ingredients ORDER BY name")
-        return c.fetchall()
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id, name, stock_quantity, unit, low_stock_threshold FROM ingredients ORDER BY name")
+            return c.fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return []
+
+@db_pool.timed
+def get_ingredients_by_ids(ingredient_ids):
+    """Like get_all_ingredients, for the given ids only (missing ids are skipped)."""
+    ingredient_ids = list(ingredient_ids)
+    if not ingredient_ids:
+        return []
+    try:
+        with get_db_connection() as conn:
+            placeholders = ",".join("?" * len(ingredient_ids))
+            return conn.execute(f"SELECT id, name, stock_quantity, unit, low_stock_threshold FROM ingredients "
+                                f"WHERE id IN ({placeholders}) ORDER BY name", ingredient_ids).fetchall()
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
+@db_pool.timed
+def get_stock_levels():
+    """Returns [(ingredient_id, stock_quantity), ...] for every ingredient, or None if the read failed."""
+    try:
+        with get_db_connection() as conn:
+            return conn.execute("SELECT id, stock_quantity FROM ingredients").fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+
+@db_pool.timed
 def update_ingredient_stock(ingredient_id, quantity_change):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("UPDATE ingredients SET stock_quantity = stock_quantity + ? WHERE id = ?", (quantity_change, ingredient_id))
-        c.execute("INSERT INTO inventory_movements (ingredient_id, quantity_change, movement_type) VALUES (?, ?, ?)",
-                  (ingredient_id, quantity_change, 'manual_update'))
-        conn.commit()
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute("UPDATE ingredients SET stock_quantity = stock_quantity + ? WHERE id = ?", (quantity_change, ingredient_id))
+            c.execute("INSERT INTO inventory_movements (ingredient_id, quantity_change, movement_type) VALUES (?, ?, ?)",
+                      (ingredient_id, quantity_change, 'manual_update'))
+            conn.commit()
         return True, "库存更新成功！"
     except sqlite3.Error as e:
-        conn.rollback()
         return False, f"数据库错误: {e}"
-    finally:
-        if conn:
-            conn.close()
 
 # --- Product Logic ---
 
+@db_pool.timed
 def add_product(name, price):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("INSERT INTO products (name, price) VALUES (?, ?)", (name, price))
-        conn.commit()
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute("INSERT INTO products (name, price) VALUES (?, ?)", (name, price))
+            conn.commit()
+        catalog_changed()
         return True, f"产品 '{name}' 添加成功！"
     except sqlite3.IntegrityError:
         return False, f"错误: 产品 '{name}' 已存在."
     except sqlite3.Error as e:
         return False, f"数据库错误: {e}"
-    finally:
-        if conn:
-            conn.close()
 
+@db_pool.timed
 def get_all_products():
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("SELECT id, name, price FROM products ORDER BY name")
-        return c.fetchall()
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id, name, price FROM products ORDER BY name")
+            return c.fetchall()
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
+@db_pool.timed
 def get_product_by_name(name):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("SELECT id, name, price FROM products WHERE name = ?", (name,))
-        return c.fetchone()
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT id, name, price FROM products WHERE name = ?", (name,))
+            return c.fetchone()
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return None
-    finally:
-        if conn:
-            conn.close()
 
 # --- Product Attributes Logic ---
 
+@db_pool.timed
 def add_product_attribute(product_id, attribute_name, attribute_value):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("INSERT INTO product_attributes (product_id, attribute_name, attribute_value) VALUES (?, ?, ?)",
-                  (product_id, attribute_name, attribute_value))
-        conn.commit()
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute("INSERT INTO product_attributes (product_id, attribute_name, attribute_value) VALUES (?, ?, ?)",
+                      (product_id, attribute_name, attribute_value))
+            conn.commit()
+        catalog_changed()
         return True, f"产品属性 '{attribute_name}: {attribute_value}' 添加成功！"
     except sqlite3.Error as e:
-        conn.rollback()
         return False, f"数据库错误: {e}"
-    finally:
-        if conn:
-            conn.close()
 
+@db_pool.timed
 def get_product_attributes(product_id):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("SELECT attribute_name, attribute_value FROM product_attributes WHERE product_id = ?", (product_id,))
-        return c.fetchall()
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT attribute_name, attribute_value FROM product_attributes WHERE product_id = ?", (product_id,))
+            return c.fetchall()
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
+
+# --- Catalog Logic ---
+
+def _fetch_products_with_attributes(c):
+    # One row per product; its attributes come back as a JSON array of
+    # [name, value] pairs built by an index-driven correlated subquery.
+    c.execute("""
+        SELECT p.id, p.name, p.price,
+               (SELECT json_group_array(json_array(a.attribute_name, a.attribute_value))
+                FROM product_attributes a WHERE a.product_id = p.id)
+        FROM products p
+        ORDER BY p.name
+    """)
+    return [(pid, name, price, [tuple(pair) for pair in json.loads(attrs)])
+            for pid, name, price, attrs in c.fetchall()]
+
+@db_pool.timed
+def get_all_products_with_attributes():
+    """Returns [(id, name, price, [(attribute_name, attribute_value), ...]), ...] in one query."""
+    try:
+        with get_db_connection() as conn:
+            return _fetch_products_with_attributes(conn.cursor())
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return []
+
+@db_pool.timed
+def get_catalog_version():
+    """Counter bumped by triggers whenever products, recipes, attributes or ingredient names change."""
+    try:
+        with get_db_connection() as conn:
+            return conn.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()[0]
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
+
+@db_pool.timed
+def load_catalog_snapshot():
+    """Reads the catalog tables and their version from one consistent snapshot.
+
+    Returns a dict with 'version', 'products' as returned by
+    get_all_products_with_attributes, 'ingredients' (id, name, unit) and
+    'recipes' (product_id, ingredient_id, quantity_needed), or None.
+    """
+    try:
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute("BEGIN")
+            snapshot = {
+                "version": c.execute("SELECT version FROM catalog_version WHERE id = 1").fetchone()[0],
+                "products": _fetch_products_with_attributes(c),
+                "ingredients": c.execute("SELECT id, name, unit FROM ingredients ORDER BY name").fetchall(),
+                "recipes": c.execute("SELECT product_id, ingredient_id, quantity_needed FROM recipes ORDER BY product_id, id").fetchall(),
+            }
+            conn.rollback()
+        return snapshot
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return None
 
 # --- Recipe Logic ---
 
+@db_pool.timed
 def save_recipe(product_id, ingredients_list):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("DELETE FROM recipes WHERE product_id = ?", (product_id,))
-        if ingredients_list:
-            c.executemany("INSERT INTO recipes (product_id, ingredient_id, quantity_needed) VALUES (?, ?, ?)", 
-                          [(product_id, ing_id, qty) for ing_id, qty in ingredients_list])
-        conn.commit()
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM recipes WHERE product_id = ?", (product_id,))
+            if ingredients_list:
+                c.executemany("INSERT INTO recipes (product_id, ingredient_id, quantity_needed) VALUES (?, ?, ?)", 
+                              [(product_id, ing_id, qty) for ing_id, qty in ingredients_list])
+            conn.commit()
+        catalog_changed()
         return True, "配方保存成功！"
     except sqlite3.Error as e:
-        conn.rollback()
         return False, f"数据库错误: {e}"
-    finally:
-        if conn:
-            conn.close()
 
+@db_pool.timed
 def get_recipe_for_product(product_id):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("""
-            SELECT i.id, i.name, r.quantity_needed, i.unit
-            FROM recipes r
-            JOIN ingredients i ON r.ingredient_id = i.id
-            WHERE r.product_id = ?
-        """, (product_id,))
-        return c.fetchall()
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT i.id, i.name, r.quantity_needed, i.unit
+                FROM recipes r
+                JOIN ingredients i ON r.ingredient_id = i.id
+                WHERE r.product_id = ?
+            """, (product_id,))
+            return c.fetchall()
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
 # --- Sales Logic ---
 
 def process_sale(product_id, quantity):
-    conn = get_db_connection()
-    c = conn.cursor()
+    return process_order([(product_id, quantity)])
+
+def check_order_lines(lines):
+    """Checks (product_id, quantity) lines; returns (lines, None) or (None, error message).
+
+    Quantities must be positive ints; 1.7 or "2" is rejected, not coerced.
+    """
+    lines = list(lines)
+    if not lines:
+        return None, "订单中没有任何商品。"
+    if any(not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0 for _, quantity in lines):
+        return None, "错误: 销售数量必须为正整数。"
+    return lines, None
+
+
+def apply_order(c, lines):
+    """Checks stock for checked order lines and writes the sale on cursor c, without committing.
+
+    Returns (success, message). The stock read here may already be stale
+    when the deductions run, since other connections can sell in between,
+    so each deduction only applies if the stock still covers it. On failure
+    some deductions may have been written; the caller must roll back.
+
+    Whatever the number of ingredients or lines, this is one query and four
+    executemany batches: stock, movements, sales and the daily rollup.
+    """
+    product_ids = sorted({product_id for product_id, _ in lines})
+    placeholders = ", ".join("?" * len(product_ids))
+    # Product, price and recipe in one query; products without a recipe come back with NULLs.
+    c.execute(f"""
+        SELECT p.id, p.name, p.price, i.id, r.quantity_needed, i.stock_quantity, i.name
+        FROM products p
+        LEFT JOIN recipes r ON r.product_id = p.id
+        LEFT JOIN ingredients i ON r.ingredient_id = i.id
+        WHERE p.id IN ({placeholders})
+    """, product_ids)
+    products = {}
+    recipes = {}
+    for pid, name, price, ing_id, qty_needed, stock, ing_name in c.fetchall():
+        products[pid] = (name, price)
+        if ing_id is not None:
+            recipes.setdefault(pid, []).append((ing_id, qty_needed, stock, ing_name))
+
+    # Sum what the whole order needs from each ingredient.
+    needed = {}
+    for product_id, quantity in lines:
+        if product_id not in products:
+            return False, f"错误: 未找到ID为 {product_id} 的产品。"
+        if product_id not in recipes:
+            return False, f"产品 '{products[product_id][0]}' 没有配方，无法销售。"
+        for ing_id, qty_needed, stock, ing_name in recipes[product_id]:
+            total_needed = needed.get(ing_id, (0, stock, ing_name))[0] + qty_needed * quantity
+            needed[ing_id] = (total_needed, stock, ing_name)
+
+    # Check every ingredient before making any changes.
+    for total_needed, stock, ing_name in needed.values():
+        if stock < total_needed:
+            return False, f"库存不足: {ing_name}"
+
+    # The check above can race with other writers; this one cannot. The
+    # executemany rowcount is summed over all rows, so one short ingredient
+    # shows up as a missing row.
+    deductions = [(total_needed, ing_id, total_needed) for ing_id, (total_needed, _, _) in needed.items()]
+    c.executemany("UPDATE ingredients SET stock_quantity = stock_quantity - ? WHERE id = ? AND stock_quantity >= ?",
+                  deductions)
+    if c.rowcount != len(needed):
+        c.execute(f"SELECT id, stock_quantity FROM ingredients WHERE id IN ({', '.join('?' * len(needed))})", list(needed))
+        short = [needed[ing_id][2] for ing_id, stock in c.fetchall() if stock < needed[ing_id][0]]
+        return False, f"库存不足: {', '.join(short) or '未知原料'}"
+    c.executemany("INSERT INTO inventory_movements (ingredient_id, quantity_change, movement_type) VALUES (?, ?, ?)",
+                  [(ing_id, -total_needed, 'sale_deduction') for ing_id, (total_needed, _, _) in needed.items()])
+
+    # Stamp the sales ourselves so the rollup day matches sale_time exactly.
+    sale_time = shop_time.now_db_timestamp()
+    sale_day = shop_time.local_day(sale_time)
+    sales_rows = [(product_id, quantity, sale_time, products[product_id][1] * quantity) for product_id, quantity in lines]
+    c.executemany("INSERT INTO sales (product_id, quantity_sold, sale_time, total_price) VALUES (?, ?, ?, ?)", sales_rows)
+    c.executemany("""
+        INSERT INTO sales_daily_rollup (day, product_id, sale_count, quantity, revenue)
+        VALUES (?, ?, 1, ?, ?)
+        ON CONFLICT (day, product_id) DO UPDATE SET
+            sale_count = sale_count + excluded.sale_count,
+            quantity = quantity + excluded.quantity,
+            revenue = revenue + excluded.revenue
+    """, [(sale_day, product_id, quantity, total) for product_id, quantity, _, total in sales_rows])
+
+    total_price = sum(row[3] for row in sales_rows)
+    return True, f"销售成功！总价: {total_price:.2f}"
+
+
+@db_pool.timed
+def process_order(lines):
+    """Sells every (product_id, quantity) line of an order in one transaction.
+
+    Stock is checked for the whole order before anything is written, and the
+    deductions are summed per ingredient, so either all lines are recorded or
+    none are.
+    """
+    lines, error = check_order_lines(lines)
+    if error:
+        return False, error
     try:
-        # Check stock. Fetch ID, needed quantity, current stock, and name.
-        c.execute("""
-            SELECT 
-                i.id, 
-                r.quantity_needed * ?, 
-                i.stock_quantity, 
-                i.name 
-            FROM recipes r 
-            JOIN ingredients i ON r.ingredient_id = i.id 
-            WHERE r.product_id = ?
-        """, (quantity, product_id))
-        ingredients_needed = c.fetchall()
-        
-        if not ingredients_needed:
-            return False, "该产品没有配方，无法销售。"
-
-        # First, check if all ingredients are in stock before making any changes.
-        for _, needed, stock, name in ingredients_needed:
-            if stock < needed:
-                return False, f"库存不足: {name}"
-
-        # If all checks pass, then deduct stock.
-        for ing_id, needed, _, _ in ingredients_needed:
-            c.execute("UPDATE ingredients SET stock_quantity = stock_quantity - ? WHERE id = ?", (needed, ing_id))
-            c.execute("INSERT INTO inventory_movements (ingredient_id, quantity_change, movement_type) VALUES (?, ?, ?)",
-                      (ing_id, -needed, 'sale_deduction'))
-
-        # Record sale
-        c.execute("SELECT price FROM products WHERE id = ?", (product_id,))
-        price = c.fetchone()[0]
-        total_price = price * quantity
-        c.execute("INSERT INTO sales (product_id, quantity_sold, total_price) VALUES (?, ?, ?)", (product_id, quantity, total_price))
-        
-        conn.commit()
-        return True, f"销售成功！总价: {total_price:.2f}"
+        with get_db_connection() as conn:
+            success, message = apply_order(conn.cursor(), lines)
+            if success:
+                conn.commit()
+            else:
+                conn.rollback()
+        return success, message
     except sqlite3.Error as e:
-        conn.rollback()
         return False, f"数据库错误: {e}"
-    finally:
-        if conn:
-            conn.close()
 
 # --- Reporting Logic ---
 
-def get_today_summary():
-    today_str = datetime.date.today().strftime("%Y-%m-%d")
+def _range_filter(start, end, raw_column, day_column):
+    """Builds the WHERE clause for [start, end); either bound may be None for an open end.
+
+    Ranges whose bounds all fall on shop-local midnight are answered from
+    sales_daily_rollup; anything finer falls back to the raw sales rows.
+    Returns (use_rollup, sql, params).
+    """
+    bounds = [(">=", shop_time.to_db_timestamp(start)) if start is not None else None,
+              ("<", shop_time.to_db_timestamp(end)) if end is not None else None]
+    bounds = [bound for bound in bounds if bound is not None]
+    if not bounds:
+        return True, "", ()
+    days = [shop_time.whole_day(stamp) for _, stamp in bounds]
+    if all(days):
+        column, params = day_column, tuple(days)
+    else:
+        column, params = raw_column, tuple(stamp for _, stamp in bounds)
+    where = " AND ".join(f"{column} {op} ?" for op, _ in bounds)
+    return all(days), f"WHERE {where}", params
+
+@db_pool.timed
+def get_sales_summary(start, end):
+    """Order count and revenue for sales in [start, end); either bound may be None for an open end.
+
+    start and end are datetimes, dates or stored UTC timestamp text (see
+    shop_time). Whole-day ranges read the daily rollup; other ranges use a
+    half-open predicate served by the sale_time index.
+    """
+    use_rollup, where, params = _range_filter(start, end, "sale_time", "day")
+    if use_rollup:
+        query = f"SELECT SUM(sale_count), SUM(revenue) FROM sales_daily_rollup {where}"
+    else:
+        query = f"SELECT COUNT(id), SUM(total_price) FROM sales {where}"
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("SELECT COUNT(id), SUM(total_price) FROM sales WHERE DATE(sale_time) = ?", (today_str,))
-        result = c.fetchone()
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute(query, params)
+            result = c.fetchone()
         return result[0] or 0, result[1] or 0.0
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return 0, 0.0
-    finally:
-        if conn:
-            conn.close()
 
-def get_product_sales_ranking():
+def get_period_summary(period):
+    """Order count and revenue for 'today', 'week' or 'month' in shop-local time."""
+    return get_sales_summary(*shop_time.PERIODS[period]())
+
+def get_today_summary():
+    return get_period_summary("today")
+
+@db_pool.timed
+def get_product_sales_ranking(start=None, end=None):
+    """Products by quantity sold, optionally limited to sales in [start, end) (either bound may be None)."""
+    use_rollup, where, params = _range_filter(start, end, "s.sale_time", "s.day")
+    if use_rollup:
+        source, quantity, revenue = "sales_daily_rollup s", "s.quantity", "s.revenue"
+    else:
+        source, quantity, revenue = "sales s", "s.quantity_sold", "s.total_price"
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("""
-            SELECT p.name, SUM(s.quantity_sold), SUM(s.total_price)
-            FROM sales s
-            JOIN products p ON s.product_id = p.id
-            GROUP BY p.name
-            ORDER BY SUM(s.quantity_sold) DESC
-        """)
-        return c.fetchall()
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute(f"""
+                SELECT p.name, SUM({quantity}), SUM({revenue})
+                FROM {source}
+                JOIN products p ON s.product_id = p.id
+                {where}
+                GROUP BY p.name
+                ORDER BY SUM({quantity}) DESC
+            """, params)
+            return c.fetchall()
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
 
+@db_pool.timed
+def get_product_popularity(days=30):
+    """Units sold per product_id over the last `days` shop-local days, from the rollup."""
+    first_day = (shop_time.now().date() - datetime.timedelta(days=days)).isoformat()
+    try:
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT product_id, SUM(quantity) FROM sales_daily_rollup WHERE day >= ? GROUP BY product_id",
+                      (first_day,))
+            return dict(c.fetchall())
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
+        return {}
+
+@db_pool.timed
+def rebuild_sales_rollup():
+    """Regenerates sales_daily_rollup from the raw sales table."""
+    try:
+        with get_db_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            database.rebuild_sales_rollup(conn)
+            conn.commit()
+        return True, "销售汇总表重建成功！"
+    except sqlite3.Error as e:
+        return False, f"数据库错误: {e}"
+
+@db_pool.timed
 def get_recent_sales(limit=50):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("""
-            SELECT s.sale_time, p.name, s.quantity_sold, s.total_price
-            FROM sales s
-            JOIN products p ON s.product_id = p.id
-            ORDER BY s.sale_time DESC
-            LIMIT ?
-        """, (limit,))
-        return c.fetchall()
+        with get_db_connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                SELECT s.sale_time, p.name, s.quantity_sold, s.total_price
+                FROM sales s
+                JOIN products p ON s.product_id = p.id
+                ORDER BY s.sale_time DESC
+                LIMIT ?
+            """, (limit,))
+            return c.fetchall()
     except sqlite3.Error as e:
         print(f"Database error: {e}")
         return []
-    finally:
-        if conn:
-            conn.close()
+
+def iter_sale_deductions(start, chunk_size=50_000):
+    """Yields lists of (ingredient_id, minute, quantity_used) for sale deductions since `start`.
+
+    minute is the stored UTC time cut to 'YYYY-MM-DD HH:MM'. The covering
+    movement index answers the query without touching the table, and rows
+    are streamed in chunks of at most chunk_size so years of history never
+    sit in memory at once.
+    """
+    try:
+        with get_db_connection() as conn:
+            c = conn.execute("""
+                SELECT ingredient_id, substr(movement_time, 1, 16), -quantity_change
+                FROM inventory_movements
+                WHERE movement_type = 'sale_deduction' AND movement_time >= ?
+            """, (start,))
+            while True:
+                rows = c.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield rows
+    except sqlite3.Error as e:
+        print(f"Database error: {e}")
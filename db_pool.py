@@ -0,0 +1,195 @@
+import sqlite3
+import threading
+import time
+import queue
+import functools
+from contextlib import contextmanager
+
+# Pragmas applied once to every new connection. WAL lets readers and the
+# writer proceed concurrently, and synchronous=NORMAL is durable enough in WAL
+# mode while avoiding an fsync on every commit.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=268435456",  # 256 MB
+    "PRAGMA cache_size=-16000",    # ~16 MB page cache
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+
+class ConnectionPool:
+    """A bounded pool of long-lived SQLite connections.
+
+    Connections are created lazily up to max_size, configured once with
+    CONNECTION_PRAGMAS and handed out through borrow(). A borrowed connection
+    always goes back to the pool with no open transaction.
+    """
+
+    def __init__(self, db_file, max_size=8, timeout=5.0, on_connect=None):
+        self.db_file = db_file
+        self.max_size = max_size
+        self.timeout = timeout
+        self.on_connect = on_connect
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._all = []
+        self._stats = {
+            "connections_opened": 0,
+            "connect_seconds": 0.0,
+            "borrows": 0,
+            "wait_seconds": 0.0,
+            "hold_seconds": 0.0,
+        }
+
+    def _connect(self):
+        start = time.perf_counter()
+        conn = sqlite3.connect(self.db_file, timeout=self.timeout, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if self.on_connect:
+            self.on_connect(conn)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self._stats["connections_opened"] += 1
+            self._stats["connect_seconds"] += elapsed
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_grow = len(self._all) < self.max_size
+            if can_grow:
+                # Reserve the slot before connecting so concurrent borrowers
+                # cannot overshoot max_size.
+                self._all.append(None)
+        if can_grow:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._all.remove(None)
+                raise
+            with self._lock:
+                # close_all() may have forgotten the reserved slot meanwhile;
+                # the connection is then untracked and closed on release.
+                if None in self._all:
+                    self._all[self._all.index(None)] = conn
+            return conn
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"connection pool exhausted ({self.max_size} connections in use)")
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            # Checked and returned under the lock, so close_all() cannot slip in between.
+            tracked = any(conn is pooled for pooled in self._all)
+            if tracked:
+                self._idle.put(conn)
+        if not tracked:
+            # Borrowed before close_all(); it is closed instead of going back.
+            _close(conn)
+
+    @contextmanager
+    def borrow(self):
+        """Borrows a connection for the duration of a with-block."""
+        start = time.perf_counter()
+        conn = self._acquire()
+        acquired = time.perf_counter()
+        try:
+            yield conn
+        finally:
+            self._release(conn)
+            released = time.perf_counter()
+            with self._lock:
+                self._stats["borrows"] += 1
+                self._stats["wait_seconds"] += acquired - start
+                self._stats["hold_seconds"] += released - acquired
+
+    def stats(self):
+        """Returns a snapshot of the pool counters and timings."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["size"] = len(self._all)
+        snapshot["idle"] = self._idle.qsize()
+        borrows = snapshot["borrows"] or 1
+        snapshot["avg_wait_ms"] = snapshot["wait_seconds"] / borrows * 1000
+        snapshot["avg_hold_ms"] = snapshot["hold_seconds"] / borrows * 1000
+        return snapshot
+
+    def close_all(self):
+        """Closes every idle connection and forgets the pool contents.
+
+        Connections borrowed at the time stay open until their borrower
+        releases them, and are closed then.
+        """
+        with self._lock:
+            self._all = []
+            idle = []
+            while True:
+                try:
+                    idle.append(self._idle.get_nowait())
+                except queue.Empty:
+                    break
+        for conn in idle:
+            _close(conn)
+
+
+def _close(conn):
+    # Let SQLite refresh statistics for tables whose contents changed a lot
+    # during this connection's lifetime.
+    try:
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error:
+        pass
+    conn.close()
+
+
+# --- Per-call timings ---
+
+_call_stats = {}
+_call_stats_lock = threading.Lock()
+
+
+def timed(func):
+    """Records the call count and wall time of func under its name."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with _call_stats_lock:
+                entry = _call_stats.setdefault(func.__name__, [0, 0.0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] = max(entry[2], elapsed)
+    return wrapper
+
+
+def get_call_stats():
+    """Returns {function name: {calls, total_ms, avg_ms, max_ms}}."""
+    with _call_stats_lock:
+        items = list(_call_stats.items())
+    return {
+        name: {
+            "calls": calls,
+            "total_ms": total * 1000,
+            "avg_ms": total / calls * 1000,
+            "max_ms": worst * 1000,
+        }
+        for name, (calls, total, worst) in items
+    }
+
+
+def reset_call_stats():
+    with _call_stats_lock:
+        _call_stats.clear()
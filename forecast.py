@@ -0,0 +1,143 @@
+import datetime
+import math
+from collections import namedtuple
+
+import numpy as np
+
+import db_logic
+import shop_time
+
+# Defaults: the weekday x hour usage profile comes from the last WINDOW_DAYS,
+# its level from the last RECENT_DAYS, and purchases cover COVERAGE_DAYS.
+WINDOW_DAYS = 28
+RECENT_DAYS = 7
+HORIZON_DAYS = 14
+COVERAGE_DAYS = 7
+
+IngredientForecast = namedtuple("IngredientForecast", [
+    "ingredient_id", "name", "unit", "stock", "threshold",
+    "daily_rate", "recent_daily_rate", "hours_to_threshold", "threshold_at", "suggested_purchase",
+])
+
+
+def _local_slots(minutes, now_utc):
+    """(weekday, hour, age in days) arrays for stored UTC minutes, in shop-local time.
+
+    The UTC offset is looked up once per distinct UTC hour (it only moves at
+    daylight-saving transitions) and the shift is applied to the whole array
+    at once.
+    """
+    utc = np.array(minutes, dtype="datetime64[m]")
+    hours, hour_of_row = np.unique(utc.astype("datetime64[h]"), return_inverse=True)
+    tz = shop_time.shop_tz()
+    offsets = np.array([
+        hour.replace(tzinfo=datetime.timezone.utc).astimezone(tz).utcoffset() // datetime.timedelta(minutes=1)
+        for hour in hours.astype(datetime.datetime)
+    ], dtype="timedelta64[m]")
+    local = utc + offsets[hour_of_row]
+    days = local.astype("datetime64[D]")
+    # 1970-01-01 was a Thursday (weekday 3).
+    weekdays = (days.astype(np.int64) + 3) % 7
+    hours_of_day = (local - days).astype("timedelta64[h]").astype(np.int64)
+    ages = (np.datetime64(now_utc.replace(tzinfo=None), "m") - utc) / np.timedelta64(1, "D")
+    return weekdays, hours_of_day, ages
+
+
+def consumption_profile(now=None, window_days=WINDOW_DAYS, recent_days=RECENT_DAYS, chunk_size=50_000):
+    """Aggregates sale deductions into usage by shop-local weekday and hour.
+
+    Returns (totals, recent), both indexed by ingredient id: totals[id,
+    weekday, hour] is the amount used in that slot over the last window_days
+    and recent[id] the amount used over the last recent_days. Ids past the
+    end of the arrays had no usage. Rows are streamed in chunks and folded in
+    with NumPy.
+    """
+    now = now or shop_time.now()
+    now_utc = now.astimezone(datetime.timezone.utc)
+    start = shop_time.to_db_timestamp(now - datetime.timedelta(days=window_days))
+    totals = np.zeros((0, 7, 24), dtype=np.float64)
+    recent = np.zeros(0, dtype=np.float64)
+    for chunk in db_logic.iter_sale_deductions(start, chunk_size):
+        ids = np.fromiter((row[0] for row in chunk), dtype=np.int64, count=len(chunk))
+        quantities = np.fromiter((row[2] for row in chunk), dtype=np.float64, count=len(chunk))
+        weekdays, hours, ages = _local_slots([row[1] for row in chunk], now_utc)
+        grow = int(ids.max()) + 1 - len(recent)
+        if grow > 0:
+            totals = np.concatenate([totals, np.zeros((grow, 7, 24))])
+            recent = np.concatenate([recent, np.zeros(grow)])
+        np.add.at(totals, (ids, weekdays, hours), quantities)
+        is_recent = ages <= recent_days
+        np.add.at(recent, ids[is_recent], quantities[is_recent])
+    return totals, recent
+
+
+def _slot_occurrences(now, days):
+    """How often each (weekday, hour) slot occurred in the `days` days before now."""
+    counts = np.zeros((7, 24), dtype=np.float64)
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    for h in range(days * 24):
+        t = hour - datetime.timedelta(hours=h + 1)
+        counts[t.weekday(), t.hour] += 1
+    return counts
+
+
+def forecast_depletion(now=None, window_days=WINDOW_DAYS, recent_days=RECENT_DAYS,
+                       horizon_days=HORIZON_DAYS, coverage_days=COVERAGE_DAYS):
+    """Projects when each ingredient will fall below its low-stock threshold.
+
+    Hourly usage rates are the slot totals over the window divided by how
+    often each weekday x hour slot occurred, rescaled so their daily level
+    matches the last recent_days. The projection walks those rates forward
+    hour by hour for horizon_days. suggested_purchase tops stock up to the
+    threshold plus expected usage over coverage_days.
+
+    Returns a list of IngredientForecast, soonest to run low first; ingredients
+    not expected to run low within the horizon have hours_to_threshold None.
+    """
+    now = now or shop_time.now()
+    totals, recent = consumption_profile(now, window_days, recent_days)
+    ingredients = db_logic.get_all_ingredients()
+    if not ingredients:
+        return []
+
+    index = np.array([row[0] for row in ingredients], dtype=np.int64)
+    used = index < len(recent)
+    # (ingredients, 7, 24) usage per slot occurrence; unused ingredients stay at zero.
+    rates = np.zeros((len(ingredients), 7, 24), dtype=np.float64)
+    rates[used] = totals[index[used]] / np.maximum(_slot_occurrences(now, window_days), 1)
+    daily_rate = rates.sum(axis=(1, 2)) / 7
+    recent_rate = np.zeros(len(ingredients), dtype=np.float64)
+    recent_rate[used] = recent[index[used]] / recent_days
+    scale = np.divide(recent_rate, daily_rate, out=np.ones_like(daily_rate), where=daily_rate > 0)
+
+    horizon = horizon_days * 24
+    start_hour = now.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+    slots = [start_hour + datetime.timedelta(hours=h) for h in range(horizon)]
+    weekdays = np.array([t.weekday() for t in slots], dtype=np.int64)
+    hours = np.array([t.hour for t in slots], dtype=np.int64)
+    expected = np.cumsum(rates[:, weekdays, hours] * scale[:, None], axis=1)  # (ingredients, horizon)
+
+    stock = np.array([row[2] for row in ingredients], dtype=np.float64)
+    threshold = np.array([row[4] for row in ingredients], dtype=np.float64)
+    below = stock[:, None] - expected < threshold[:, None]
+    crosses = below.any(axis=1)
+    first_hour = below.argmax(axis=1) + 1
+    coverage = expected[:, min(coverage_days * 24, horizon) - 1] if horizon else np.zeros(len(ingredients))
+    suggested = np.maximum(coverage + threshold - stock, 0)
+
+    forecasts = []
+    for i, (ing_id, name, _, unit, _) in enumerate(ingredients):
+        if stock[i] < threshold[i]:
+            hours_left, at = 0, now
+        elif crosses[i]:
+            hours_left = int(first_hour[i])
+            at = start_hour + datetime.timedelta(hours=hours_left - 1)
+        else:
+            hours_left, at = None, None
+        forecasts.append(IngredientForecast(
+            ing_id, name, unit, float(stock[i]), float(threshold[i]),
+            float(daily_rate[i]), float(recent_rate[i]), hours_left, at,
+            math.ceil(suggested[i] * 100) / 100,
+        ))
+    forecasts.sort(key=lambda f: (f.hours_to_threshold is None, f.hours_to_threshold or 0, f.name))
+    return forecasts
@@ -10,6 +10,36 @@ function appendMessage(sender, message) {
     messageElement.textContent = message;
     chatMessages.appendChild(messageElement);
     chatMessages.scrollTop = chatMessages.scrollHeight; // 滚动到底部
+    return messageElement;
+}
+
+function updateMessage(messageElement, message) {
+    messageElement.textContent = message;
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+// 逐个读取 Server-Sent Events 响应中的事件，每个事件调用 onEvent(事件名, 数据)
+async function readEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = 'message';
+            let data = '';
+            for (const line of block.split('\n')) {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            }
+            onEvent(event, JSON.parse(data));
+        }
+    }
 }
 
 sendButton.addEventListener('click', sendMessage);
@@ -49,32 +79,42 @@ async function sendMessage() {
             appendMessage('bot', '下单请求发送失败，请检查后端服务。');
         }
     } else {
-        // 发送推荐请求
-        appendMessage('bot', '正在思考中...');
+        // 发送推荐请求，推荐结果以流的方式逐步显示
+        const botMessage = appendMessage('bot', '正在思考中...');
+        lastRecommendedDrink = null;
         try {
-            const response = await fetch('http://localhost:5000/recommend', {
+            const response = await fetch('http://localhost:5000/recommend/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                 },
                 body: JSON.stringify({ preference: text }),
             });
-            const data = await response.json();
-            if (response.ok) {
-                if (data.recommended_drink) {
-                    lastRecommendedDrink = data; // 保存推荐信息
-                    appendMessage('bot', `根据您的偏好，我们推荐：${data.recommended_drink}。价格：¥${data.price.toFixed(2)}。如果您满意，可以说“下单”来购买。`);
-                } else {
-                    appendMessage('bot', data.message || '抱歉，未能找到符合您偏好的饮品。');
-                    lastRecommendedDrink = null;
-                }
-            } else {
-                appendMessage('bot', `推荐失败: ${data.error || '未知错误'}`);
-                lastRecommendedDrink = null;
+            if (!response.ok) {
+                const data = await response.json();
+                updateMessage(botMessage, `推荐失败: ${data.error || '未知错误'}`);
+                return;
             }
+            let partial = '';
+            await readEvents(response, (event, data) => {
+                if (event === 'token') {
+                    partial += data.text;
+                    updateMessage(botMessage, `正在为您挑选：${partial}`);
+                } else if (event === 'result') {
+                    // 最终结果已由后端校验，覆盖流式显示的中间文本
+                    if (data.recommended_drink) {
+                        lastRecommendedDrink = data; // 保存推荐信息
+                        updateMessage(botMessage, `根据您的偏好，我们推荐：${data.recommended_drink}。价格：¥${data.price.toFixed(2)}。如果您满意，可以说“下单”来购买。`);
+                    } else {
+                        updateMessage(botMessage, data.message || '抱歉，未能找到符合您偏好的饮品。');
+                    }
+                } else if (event === 'error') {
+                    updateMessage(botMessage, `推荐失败: ${data.error || '未知错误'}`);
+                }
+            });
         } catch (error) {
             console.error('Error getting recommendation:', error);
-            appendMessage('bot', '推荐请求发送失败，请检查后端服务。');
+            updateMessage(botMessage, '推荐请求发送失败，请检查后端服务。');
             lastRecommendedDrink = null;
         }
     }
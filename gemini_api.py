@@ -1,33 +1,45 @@
 
 
+import datetime
 import db_logic as db
+import catalog
+import forecast
+import sale_queue
 
-def place_order(product_name: str, quantity: int) -> str:
+def place_order(product_name: str = None, quantity: int = None, items: list = None) -> str:
     """
-    Places an order for a given product and quantity.
+    Places an order for a given product and quantity, or for several products at once.
 
     Args:
         product_name: The name of the product to order.
         quantity: The number of items to order.
+        items: Optional list of {"product_name": ..., "quantity": ...} dicts for a
+            multi-item order. All items are sold in one transaction; if any item
+            fails, nothing is recorded. When given, product_name and quantity are ignored.
 
     Returns:
         A string indicating the result of the operation.
     """
-    if quantity <= 0:
-        return "错误: 销售数量必须为正整数。"
-
-    products = db.get_all_products()
-    target_product = None
-    for pid, name, _ in products:
-        if name == product_name:
-            target_product = (pid, name)
-            break
-    
-    if not target_product:
-        return f"错误: 未找到名为 '{product_name}' 的产品。"
-    
-    product_id = target_product[0]
-    success, message = db.process_sale(product_id, quantity)
+    if items is None:
+        items = [{"product_name": product_name, "quantity": quantity}]
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return "错误: items 必须是 {\"product_name\", \"quantity\"} 对象的列表。"
+    if not items:
+        return "错误: 订单中没有任何商品。"
+
+    catalog_data = catalog.get_catalog()
+    lines = []
+    for item in items:
+        name, qty = item.get("product_name"), item.get("quantity")
+        if not isinstance(qty, int) or qty <= 0:
+            return "错误: 销售数量必须为正整数。"
+        product = catalog_data.resolve_product(name) if isinstance(name, str) else None
+        if product is None:
+            return f"错误: 未找到名为 '{name}' 的产品。"
+        lines.append((product[0], qty))
+
+    # Concurrent callers (e.g. the /order route) share one writer and commit in groups.
+    success, message = sale_queue.process_order(lines)
     return message
 
 def add_stock(ingredient_name: str, quantity: float) -> str:
@@ -44,18 +56,11 @@ def add_stock(ingredient_name: str, quantity: float) -> str:
     if quantity <= 0:
         return "错误: 入库数量必须为正数。"
 
-    ingredients = db.get_all_ingredients()
-    target_ingredient = None
-    for ing_id, name, _, _, _ in ingredients:
-        if name == ingredient_name:
-            target_ingredient = (ing_id, name)
-            break
-
-    if not target_ingredient:
+    ingredient = catalog.get_catalog().resolve_ingredient(ingredient_name)
+    if ingredient is None:
         return f"错误: 未找到名为 '{ingredient_name}' 的原料。"
 
-    ingredient_id = target_ingredient[0]
-    success, message = db.update_ingredient_stock(ingredient_id, quantity)
+    success, message = db.update_ingredient_stock(ingredient[0], quantity)
     return message
 
 def get_inventory_report() -> str:
@@ -103,4 +108,63 @@ def get_daily_summary_report() -> str:
     orders, sales = db.get_today_summary()
     return f"--- 今日销售简报 ---\n今日总订单数: {orders}\n今日总销售额: ¥{sales:.2f}\n---------------------"
 
+def get_sales_summary_report(period: str = "today", start_date: str = None, end_date: str = None) -> str:
+    """
+    Generates a sales summary for today, this week, this month or a custom date range.
+
+    Args:
+        period: One of "today", "week", "month" or "custom".
+        start_date: First day of a custom range, as YYYY-MM-DD (inclusive).
+        end_date: Last day of a custom range, as YYYY-MM-DD (inclusive).
+
+    Returns:
+        A formatted string with the order count and revenue for the period.
+    """
+    titles = {"today": "今日", "week": "本周", "month": "本月"}
+    if period == "custom":
+        try:
+            first = datetime.date.fromisoformat(start_date)
+            last = datetime.date.fromisoformat(end_date)
+        except (TypeError, ValueError):
+            return "错误: 自定义区间需要 YYYY-MM-DD 格式的开始和结束日期。"
+        orders, sales = db.get_sales_summary(first, last + datetime.timedelta(days=1))
+        title = f"{first} 至 {last}"
+    elif period in titles:
+        orders, sales = db.get_period_summary(period)
+        title = titles[period]
+    else:
+        return f"错误: 不支持的统计周期 '{period}'。"
+    return f"--- {title}销售简报 ---\n总订单数: {orders}\n总销售额: ¥{sales:.2f}\n---------------------"
+
+def get_depletion_forecast_report(horizon_days: int = 14, coverage_days: int = 7) -> str:
+    """
+    Forecasts which ingredients will run low, based on recent consumption by weekday and hour.
+
+    Args:
+        horizon_days: How many days ahead to project.
+        coverage_days: How many days of expected usage a suggested purchase should cover.
 
+    Returns:
+        A formatted string listing when each ingredient is expected to fall below
+        its low-stock threshold and how much to buy.
+    """
+    if horizon_days <= 0 or coverage_days <= 0:
+        return "错误: 预测天数必须为正整数。"
+    forecasts = forecast.forecast_depletion(horizon_days=horizon_days, coverage_days=coverage_days)
+    if not forecasts:
+        return "库存中没有任何原料."
+
+    report_lines = [f"--- 原料消耗预测 (未来 {horizon_days} 天) ---"]
+    for f in forecasts:
+        if f.hours_to_threshold == 0:
+            when = "已低于预警线"
+        elif f.hours_to_threshold is not None:
+            when = f"预计 {f.threshold_at:%m-%d %H:00} 低于预警线 (约 {f.hours_to_threshold} 小时后)"
+        else:
+            when = f"{horizon_days} 天内充足"
+        line = f"{f.name}: 库存 {f.stock:.2f} {f.unit}, 近期日均消耗 {f.recent_daily_rate:.2f} {f.unit}, {when}"
+        if f.suggested_purchase > 0:
+            line += f", 建议采购 {f.suggested_purchase:.2f} {f.unit}"
+        report_lines.append(line)
+    report_lines.append("---------------------")
+    return "\n".join(report_lines)
@@ -2,10 +2,25 @@
 
 import customtkinter as ctk
 from tkinter import ttk, messagebox
+import threading
 import db_logic as db
-import os
-
-DB_FILE = 'nainai_tea.db'
+import availability
+import catalog
+import change_feed
+import sale_queue
+import ui_worker
+import virtual_list
+import widget_sync
+
+# How often (ms) the change feed is polled; an idle poll is a single PRAGMA.
+CHANGE_POLL_MS = 500
+
+# POS product grid: buttons are POS_BUTTON_HEIGHT px tall and at least
+# POS_COLUMN_WIDTH px wide; the category filter lists values of this attribute.
+POS_BUTTON_HEIGHT = 56
+POS_COLUMN_WIDTH = 220
+POS_CATEGORY_ATTRIBUTE = "茶底"
+POS_ALL_CATEGORIES = "全部"
 
 class App(ctk.CTk):
     def __init__(self):
@@ -17,10 +32,13 @@ class App(ctk.CTk):
         # Initialize selected product state
         self.selected_product_id = None
         self.selected_product_name = None
+        self.selected_recipe_ingredient_ids = set()
         
-        # For auto-refresh
-        self.db_file_path = DB_FILE
-        self.last_db_mod_time = 0
+        # For auto-refresh: reports what other windows, processes and the web backend changed
+        self.change_feed = change_feed.ChangeFeed(db.DB_FILE)
+        # All database calls run here, off the Tk thread; results come back through after().
+        self.worker = ui_worker.BackgroundWorker(self)
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
 
         ctk.set_appearance_mode("System")
         ctk.set_default_color_theme("blue")
@@ -47,59 +65,105 @@ class App(ctk.CTk):
         self.start_monitoring_db()
 
     def check_for_db_changes(self):
-        """Checks if the database file has been modified."""
-        try:
-            mod_time = os.path.getmtime(self.db_file_path)
-            if mod_time != self.last_db_mod_time:
-                print(f"Database change detected at {mod_time}. Refreshing UI.")
-                self.last_db_mod_time = mod_time
-                self.refresh_all_data()
-        except OSError:
-            # Handle case where file might not exist yet or is inaccessible
-            pass
-        finally:
-            # Schedule the next check
-            self.after(1000, self.check_for_db_changes)
+        """Polls the change feed and refreshes only what the changes touched."""
+        # Keyed, so a poll stuck behind a locked database is not queued up again and again.
+        self.worker.submit(self.change_feed.poll, on_done=self._on_changes,
+                           on_error=lambda e: print(f"Database error: {e}"), key="change_feed")
+        # Schedule the next check
+        self.after(CHANGE_POLL_MS, self.check_for_db_changes)
+
+    def _on_changes(self, changes):
+        if changes:
+            self.apply_changes(changes)
 
     def start_monitoring_db(self):
         """Initiates the database monitoring loop."""
-        # Set the initial modification time
-        try:
-            self.last_db_mod_time = os.path.getmtime(self.db_file_path)
-        except OSError:
-            self.last_db_mod_time = 0
-        
-        # Start the checking loop
-        self.check_for_db_changes()
+        self.after(CHANGE_POLL_MS, self.check_for_db_changes)
+
+    def apply_changes(self, changes):
+        """Refreshes the tabs (and inventory rows) affected by {table: row ids or None}."""
+        print(f"Database change detected: {sorted(changes)}")
+        if "ingredients" in changes:
+            self.refresh_inventory_rows(changes["ingredients"])
+        # The POS grid is drawn from the catalog; reload it now rather than after its next version check.
+        if changes.keys() & {"products", "recipes", "product_attributes"}:
+            catalog.invalidate()
+        # Stock, products, recipes and attributes all change what the POS shows.
+        if changes.keys() & {"ingredients", "products", "recipes", "product_attributes"}:
+            self.refresh_pos_products()
+        if "products" in changes:
+            self.refresh_product_list()
+        if self.selected_product_id is not None and self._recipe_view_changed(changes):
+            self.show_recipe_for_product(self.selected_product_id, self.selected_product_name)
+        if "sales" in changes:
+            self.refresh_reports()
+
+    def _recipe_view_changed(self, changes):
+        recipes, ingredients = changes.get("recipes", set()), changes.get("ingredients", set())
+        products = changes.get("products", set())
+        return (recipes is None or self.selected_product_id in recipes
+                or products is None or self.selected_product_id in products
+                or ingredients is None or bool(ingredients & self.selected_recipe_ingredient_ids))
 
     def refresh_all_data(self):
         """Global function to refresh all data across all tabs."""
         print("Refreshing all application data...")
-        current_selection = self.inv_tree.focus()
-        current_product_selection = self.selected_product_id
-
+        # Loads run in the background; views are synced in place as results arrive,
+        # so selections and scroll positions carry over.
         self.refresh_pos_products()
         self.refresh_inventory_list()
         self.refresh_product_list()
         self.refresh_reports()
-        
-        if current_selection:
-            self.inv_tree.focus(current_selection)
-            self.inv_tree.selection_set(current_selection)
-        
-        if current_product_selection:
+        if self.selected_product_id is not None:
             self.show_recipe_for_product(self.selected_product_id, self.selected_product_name)
 
-        print("All data refreshed.")
+    def on_close(self):
+        self.worker.shutdown()
+        self.change_feed.close()
+        self.destroy()
+
+    def run_write(self, win, func, *args, on_success=None):
+        """Runs a db write returning (success, message) in the background and reports the outcome in win."""
+        def done(result):
+            if not win.winfo_exists():
+                return
+            success, message = result
+            if success:
+                messagebox.showinfo("成功", message, parent=win)
+                if on_success: on_success()
+                win.destroy()
+            else:
+                messagebox.showerror("失败", message, parent=win)
+        self.worker.submit(func, *args, on_done=done)
 
     # ------------------ POS Tab ------------------
     def create_pos_tab(self):
         self.current_order = {}
+        self.pos_makeable = None
         pos_frame = ctk.CTkFrame(self.tab_pos)
         pos_frame.pack(fill="both", expand=True)
 
-        self.pos_product_frame = ctk.CTkScrollableFrame(pos_frame, label_text="选择产品")
-        self.pos_product_frame.pack(side="left", fill="both", expand=True, padx=10, pady=10)
+        picker_frame = ctk.CTkFrame(pos_frame)
+        picker_frame.pack(side="left", fill="both", expand=True, padx=10, pady=10)
+        filter_frame = ctk.CTkFrame(picker_frame)
+        filter_frame.pack(fill="x", padx=5, pady=5)
+        self.pos_search = ctk.StringVar()
+        self.pos_search.trace_add("write", lambda *_: self.apply_pos_filter())
+        ctk.CTkLabel(filter_frame, text="搜索:").pack(side="left", padx=5)
+        ctk.CTkEntry(filter_frame, textvariable=self.pos_search).pack(side="left", fill="x", expand=True, padx=5)
+        self.pos_category = ctk.CTkOptionMenu(filter_frame, values=[POS_ALL_CATEGORIES], command=lambda _: self.apply_pos_filter())
+        self.pos_category.pack(side="right", padx=5)
+        # Only the buttons that fit on screen exist; scrolling re-labels them.
+        self.pos_catalog = None
+        grid_frame = ctk.CTkFrame(picker_frame, fg_color="transparent")
+        grid_frame.pack(fill="both", expand=True)
+        pos_scrollbar = ctk.CTkScrollbar(grid_frame)
+        pos_scrollbar.pack(side="right", fill="y")
+        self.pos_grid = ctk.CTkFrame(grid_frame, fg_color="transparent")
+        self.pos_grid.pack(side="left", fill="both", expand=True)
+        self.pos_list = virtual_list.VirtualList(
+            self.pos_grid, pos_scrollbar, self._create_pos_button, self._show_pos_button,
+            row_height=POS_BUTTON_HEIGHT + 10, column_width=POS_COLUMN_WIDTH)
 
         order_frame = ctk.CTkFrame(pos_frame, width=350)
         order_frame.pack(side="right", fill="y", padx=10, pady=10)
@@ -109,36 +173,79 @@ class App(ctk.CTk):
         self.order_tree.heading("name", text="商品"); self.order_tree.heading("qty", text="数量"); self.order_tree.heading("price", text="小计")
         self.order_tree.column("qty", width=60, anchor="center"); self.order_tree.column("price", width=80, anchor="e")
         self.order_tree.pack(fill="both", expand=True, padx=10)
+        self.order_view = widget_sync.KeyedTreeview(self.order_tree)
         self.total_label = ctk.CTkLabel(order_frame, text="总计: ¥0.00", font=ctk.CTkFont(size=14))
         self.total_label.pack(pady=10)
         order_actions_frame = ctk.CTkFrame(order_frame)
         order_actions_frame.pack(pady=10)
-        submit_btn = ctk.CTkButton(order_actions_frame, text="下单", command=self.submit_order)
-        submit_btn.pack(side="left", padx=10)
+        self.submit_btn = ctk.CTkButton(order_actions_frame, text="下单", command=self.submit_order)
+        self.submit_btn.pack(side="left", padx=10)
         clear_btn = ctk.CTkButton(order_actions_frame, text="清空", command=self.clear_order)
         clear_btn.pack(side="left", padx=10)
 
     def refresh_pos_products(self):
-        for widget in self.pos_product_frame.winfo_children():
-            widget.destroy()
-        products = db.get_all_products()
-        for pid, name, price in products:
-            btn_text = f"{name}\n(¥{price:.2f})"
-            btn = ctk.CTkButton(self.pos_product_frame, text=btn_text, command=lambda p=pid, n=name, pr=price: self.add_to_order(p, n, pr))
-            btn.pack(fill="x", padx=10, pady=5)
+        self.worker.submit(self._load_pos_products, on_done=self._show_pos_products, key="pos")
+
+    @staticmethod
+    def _load_pos_products():
+        snapshot = catalog.get_catalog()
+        snapshot.filter_products()  # builds the search indexes here rather than on the first keystroke
+        # How many of each drink the current stock allows; None if stock could not be read.
+        return snapshot, availability.max_makeable()
+
+    def _show_pos_products(self, loaded):
+        self.pos_catalog, self.pos_makeable = loaded
+        categories = [POS_ALL_CATEGORIES] + self.pos_catalog.attribute_values(POS_CATEGORY_ATTRIBUTE)
+        self.pos_category.configure(values=categories)
+        if self.pos_category.get() not in categories:
+            self.pos_category.set(POS_ALL_CATEGORIES)
+        self.apply_pos_filter()
+
+    def apply_pos_filter(self):
+        """Shows the products matching the search text and category; runs on every keystroke."""
+        if self.pos_catalog is None:
+            return
+        category = self.pos_category.get()
+        products = self.pos_catalog.filter_products(
+            self.pos_search.get(), POS_CATEGORY_ATTRIBUTE, None if category == POS_ALL_CATEGORIES else category)
+        makeable = self.pos_makeable
+        self.pos_list.set_items([(pid, name, price, None if makeable is None else makeable.get(pid, 0))
+                                 for pid, name, price in products])
+
+    def _create_pos_button(self, slot):
+        return ctk.CTkButton(self.pos_grid, height=POS_BUTTON_HEIGHT, command=lambda: self._pos_button_clicked(slot))
+
+    @staticmethod
+    def _show_pos_button(button, item):
+        _, name, price, units = item
+        btn_text = f"{name}\n(¥{price:.2f})"
+        if units == 0:
+            btn_text += " 已售罄"
+        elif units is not None:
+            btn_text += f" 可做 {units} 杯"
+        button.configure(text=btn_text, state="disabled" if units == 0 else "normal")
+
+    def _pos_button_clicked(self, slot):
+        item = self.pos_list.item(slot)
+        if item is not None:
+            pid, name, price, _ = item
+            self.add_to_order(pid, name, price)
 
     def add_to_order(self, product_id, name, price):
+        qty = self.current_order.get(product_id, {}).get("qty", 0)
+        if self.pos_makeable is not None and qty + 1 > self.pos_makeable.get(product_id, 0):
+            messagebox.showwarning("库存不足", f"当前库存最多可做 {self.pos_makeable.get(product_id, 0)} 杯 {name}。"); return
         if product_id in self.current_order: self.current_order[product_id]["qty"] += 1
         else: self.current_order[product_id] = {"name": name, "qty": 1, "price": price}
         self.update_order_display()
 
     def update_order_display(self):
-        for i in self.order_tree.get_children(): self.order_tree.delete(i)
-        total = 0
+        rows, total = [], 0
         for pid, data in self.current_order.items():
             subtotal = data["qty"] * data["price"]
-            self.order_tree.insert("", "end", values=(data["name"], data["qty"], f"{subtotal:.2f}"))
+            rows.append((str(pid), (data["name"], data["qty"], f"{subtotal:.2f}")))
             total += subtotal
+        self.order_view.sync(rows)
         self.total_label.configure(text=f"总计: ¥{total:.2f}")
 
     def clear_order(self):
@@ -147,13 +254,22 @@ class App(ctk.CTk):
     def submit_order(self):
         if not self.current_order:
             messagebox.showwarning("空订单", "订单中没有任何商品。"); return
-        success_all = True
-        for product_id, data in self.current_order.items():
-            success, message = db.process_sale(product_id, data['qty'])
-            if not success:
-                messagebox.showerror("下单失败", f"处理 '{data['name']}' 时出错: {message}"); success_all = False; break
-        if success_all:
-            messagebox.showinfo("成功", "订单已成功处理！"); self.clear_order()
+        lines = [(product_id, data['qty']) for product_id, data in self.current_order.items()]
+        # Disabled until the order is processed, so a slow database cannot turn one click into two sales.
+        self.submit_btn.configure(state="disabled")
+        self.worker.submit(sale_queue.process_order, lines, on_done=self._order_processed, on_error=self._order_failed)
+
+    def _order_processed(self, result):
+        self.submit_btn.configure(state="normal")
+        success, message = result
+        if success:
+            messagebox.showinfo("成功", f"订单已成功处理！{message}"); self.clear_order(); self.refresh_pos_products()
+        else:
+            messagebox.showerror("下单失败", message)
+
+    def _order_failed(self, error):
+        self.submit_btn.configure(state="normal")
+        messagebox.showerror("下单失败", str(error))
 
     # ------------------ Inventory Tab ------------------
     def create_inventory_tab(self):
@@ -163,13 +279,44 @@ class App(ctk.CTk):
         self.inv_tree.heading("id", text="ID"); self.inv_tree.heading("name", text="原料名称"); self.inv_tree.heading("stock", text="当前库存")
         self.inv_tree.heading("unit", text="单位"); self.inv_tree.heading("low_stock", text="低库存阈值"); self.inv_tree.column("id", width=50)
         self.inv_tree.pack(fill="both", expand=True, padx=10, pady=10)
+        self.inv_view = widget_sync.KeyedTreeview(self.inv_tree)
+        # Ingredient ids to reload, or None for the whole list; taken by _load_inventory on a worker thread.
+        self.pending_inventory_ids = set()
+        self.pending_inventory_lock = threading.Lock()
         action_frame = ctk.CTkFrame(inv_frame); action_frame.pack(fill="x", padx=10, pady=5)
         ctk.CTkButton(action_frame, text="添加新原料", command=self.add_ingredient_window).pack(side="left", padx=5)
         ctk.CTkButton(action_frame, text="更新库存", command=self.update_stock_window).pack(side="left", padx=5)
 
     def refresh_inventory_list(self):
-        for i in self.inv_tree.get_children(): self.inv_tree.delete(i)
-        for item in db.get_all_ingredients(): self.inv_tree.insert("", "end", values=item)
+        self.refresh_inventory_rows(None)
+
+    def refresh_inventory_rows(self, ingredient_ids):
+        """Updates only the given ingredient rows; None, new, deleted or renamed rows reload the whole list."""
+        # Requests made while a load is running are merged, so they cost one follow-up load.
+        with self.pending_inventory_lock:
+            if ingredient_ids is None or self.pending_inventory_ids is None:
+                self.pending_inventory_ids = None
+            else:
+                self.pending_inventory_ids |= set(ingredient_ids)
+        self.worker.submit(self._load_inventory, on_done=self._show_inventory, key="inventory")
+
+    def _load_inventory(self):
+        with self.pending_inventory_lock:
+            ingredient_ids, self.pending_inventory_ids = self.pending_inventory_ids, set()
+        if ingredient_ids is None:
+            return None, db.get_all_ingredients()
+        return ingredient_ids, db.get_ingredients_by_ids(ingredient_ids) if ingredient_ids else []
+
+    def _show_inventory(self, loaded):
+        ingredient_ids, rows = loaded
+        # Rows are keyed by ingredient id so single rows can be updated in place.
+        if ingredient_ids is None:
+            self.inv_view.sync(widget_sync.keyed(rows, key=lambda item: item[0])); return
+        shown = self.inv_view.values
+        # A rename can move the row, since the list is sorted by name.
+        if len(rows) != len(ingredient_ids) or any(shown.get(str(row[0]), (None, None))[1] != row[1] for row in rows):
+            self.refresh_inventory_list(); return
+        self.inv_view.update(widget_sync.keyed(rows, key=lambda item: item[0]))
 
     def add_ingredient_window(self):
         win = ctk.CTkToplevel(self); win.title("添加新原料"); win.geometry("400x350")
@@ -181,9 +328,7 @@ class App(ctk.CTk):
             try: stock = float(stock_entry.get()); threshold = float(threshold_entry.get())
             except ValueError: messagebox.showerror("输入错误", "库存和阈值必须是数字。", parent=win); return
             if not all([name_entry.get(), unit_entry.get()]): messagebox.showerror("输入错误", "所有字段都不能为空。", parent=win); return
-            success, message = db.add_ingredient(name_entry.get(), stock, unit_entry.get(), threshold)
-            if success: messagebox.showinfo("成功", message, parent=win); win.destroy()
-            else: messagebox.showerror("失败", message, parent=win)
+            self.run_write(win, db.add_ingredient, name_entry.get(), stock, unit_entry.get(), threshold)
         ctk.CTkButton(win, text="保存", command=save_ingredient).pack(pady=20); win.transient(self); win.grab_set()
 
     def update_stock_window(self):
@@ -197,9 +342,7 @@ class App(ctk.CTk):
                 qty_change = float(qty_entry.get())
                 if qty_change <= 0: raise ValueError
             except ValueError: messagebox.showerror("输入错误", "请输入一个正数。", parent=win); return
-            success, message = db.update_ingredient_stock(ing_id, qty_change)
-            if success: messagebox.showinfo("成功", message, parent=win); win.destroy()
-            else: messagebox.showerror("失败", message, parent=win)
+            self.run_write(win, db.update_ingredient_stock, ing_id, qty_change)
         ctk.CTkButton(win, text="确认入库", command=save_stock_update).pack(pady=20); win.transient(self); win.grab_set()
 
     # ------------------ Products & Recipes Tab ------------------
@@ -214,30 +357,51 @@ class App(ctk.CTk):
         self.recipe_tree = ttk.Treeview(right_panel, columns=("ing_name", "qty", "unit"), show="headings")
         self.recipe_tree.heading("ing_name", text="原料"); self.recipe_tree.heading("qty", text="需要数量"); self.recipe_tree.heading("unit", text="单位")
         self.recipe_tree.pack(fill="both", expand=True, pady=5)
+        self.recipe_view = widget_sync.KeyedTreeview(self.recipe_tree)
+        self.product_buttons = widget_sync.KeyedWidgets(
+            lambda pid: ctk.CTkButton(self.product_list_frame, command=lambda: self.select_product(pid)),
+            fill="x", padx=5, pady=2)
+        self.products_data = []
         self.edit_recipe_btn = ctk.CTkButton(right_panel, text="编辑配方", state="disabled", command=self.edit_recipe_window); self.edit_recipe_btn.pack(pady=10)
 
     def refresh_product_list(self):
-        for widget in self.product_list_frame.winfo_children(): widget.destroy()
-        self.products_data = db.get_all_products()
-        for pid, name, price in self.products_data:
-            btn = ctk.CTkButton(self.product_list_frame, text=f"{name} (¥{price:.2f})", command=lambda p=pid, n=name: self.show_recipe_for_product(p, n))
-            btn.pack(fill="x", padx=5, pady=2)
-        # Clear recipe view as product list has changed
-        self.clear_recipe_view()
+        self.worker.submit(db.get_all_products, on_done=self._show_product_list, key="products")
+
+    def _show_product_list(self, products):
+        self.products_data = products
+        self.product_buttons.sync([(pid, {"text": f"{name} (¥{price:.2f})"}) for pid, name, price in self.products_data])
+        # Keep the selected product if it still exists; clear the recipe view if it was deleted.
+        names = {pid: name for pid, name, _ in self.products_data}
+        if self.selected_product_id in names:
+            self.selected_product_name = names[self.selected_product_id]
+        elif self.selected_product_id is not None:
+            self.clear_recipe_view()
+
+    def select_product(self, product_id):
+        for pid, name, _ in self.products_data:
+            if pid == product_id:
+                self.show_recipe_for_product(pid, name); return
 
     def clear_recipe_view(self):
         self.selected_product_id = None
         self.selected_product_name = None
+        self.selected_recipe_ingredient_ids = set()
         self.recipe_label.configure(text="请先在左侧选择一个产品")
-        for i in self.recipe_tree.get_children(): self.recipe_tree.delete(i)
+        self.recipe_view.clear()
         self.edit_recipe_btn.configure(state="disabled")
 
     def show_recipe_for_product(self, product_id, product_name):
         self.selected_product_id, self.selected_product_name = product_id, product_name
         self.recipe_label.configure(text=f"'{product_name}' 的配方")
-        for i in self.recipe_tree.get_children(): self.recipe_tree.delete(i)
-        recipe_data = db.get_recipe_for_product(product_id)
-        for _, name, qty, unit in recipe_data: self.recipe_tree.insert("", "end", values=(name, qty, unit))
+        # Clicking through products quickly loads only the last one picked.
+        self.worker.submit(db.get_recipe_for_product, product_id, key="recipe",
+                           on_done=lambda recipe_data: self._show_recipe(product_id, recipe_data))
+
+    def _show_recipe(self, product_id, recipe_data):
+        if product_id != self.selected_product_id:
+            return
+        self.selected_recipe_ingredient_ids = {ing_id for ing_id, *_ in recipe_data}
+        self.recipe_view.sync([(str(ing_id), (name, qty, unit)) for ing_id, name, qty, unit in recipe_data])
         self.edit_recipe_btn.configure(state="normal")
 
     def add_product_window(self):
@@ -249,18 +413,27 @@ class App(ctk.CTk):
             if not name or not price_str: messagebox.showerror("输入错误", "名称和价格不能为空。", parent=win); return
             try: price = float(price_str)
             except ValueError: messagebox.showerror("输入错误", "价格必须是数字。", parent=win); return
-            success, message = db.add_product(name, price)
-            if success: messagebox.showinfo("成功", message, parent=win); win.destroy()
-            else: messagebox.showerror("失败", message, parent=win)
+            self.run_write(win, db.add_product, name, price)
         ctk.CTkButton(win, text="保存", command=save_product).pack(pady=20); win.transient(self); win.grab_set()
 
     def edit_recipe_window(self):
+        self.edit_recipe_btn.configure(state="disabled")
+        self.worker.submit(self._load_recipe_editor, self.selected_product_id, on_done=self._open_recipe_editor)
+
+    @staticmethod
+    def _load_recipe_editor(product_id):
+        return product_id, db.get_recipe_for_product(product_id), db.get_all_ingredients()
+
+    def _open_recipe_editor(self, loaded):
+        product_id, recipe_data, all_ingredients = loaded
+        if product_id != self.selected_product_id:
+            return
+        self.edit_recipe_btn.configure(state="normal")
         win = ctk.CTkToplevel(self)
         win.title(f"编辑 '{self.selected_product_name}' 的配方")
         win.geometry("500x600")
 
-        current_recipe = {item[0]: item[2] for item in db.get_recipe_for_product(self.selected_product_id)}
-        all_ingredients = db.get_all_ingredients()
+        current_recipe = {item[0]: item[2] for item in recipe_data}
         
         scrollable_frame = ctk.CTkScrollableFrame(win, label_text="选择原料并输入用量")
         scrollable_frame.pack(fill="both", expand=True, padx=10, pady=10)
@@ -303,13 +476,11 @@ class App(ctk.CTk):
                         messagebox.showerror("输入错误", f"原料 '{ing_name}' 的用量必须是一个正数。", parent=win)
                         return
             
-            success, message = db.save_recipe(self.selected_product_id, new_recipe_list)
-            if success:
-                messagebox.showinfo("成功", message, parent=win)
+            self.run_write(win, db.save_recipe, product_id, new_recipe_list, on_success=reload_recipe)
+
+        def reload_recipe():
+            if product_id == self.selected_product_id:
                 self.show_recipe_for_product(self.selected_product_id, self.selected_product_name)
-                win.destroy()
-            else:
-                messagebox.showerror("失败", message, parent=win)
 
         save_btn = ctk.CTkButton(win, text="保存配方", command=save_recipe_changes)
         save_btn.pack(pady=10)
@@ -334,15 +505,25 @@ class App(ctk.CTk):
         self.recent_sales_tree = ttk.Treeview(recent_frame, columns=("time", "name", "qty", "price"), show="headings")
         self.recent_sales_tree.heading("time", text="时间"); self.recent_sales_tree.heading("name", text="产品"); self.recent_sales_tree.heading("qty", text="数量"); self.recent_sales_tree.heading("price", text="金额")
         self.recent_sales_tree.column("time", width=150); self.recent_sales_tree.pack(fill="both", expand=True, pady=5)
+        self.ranking_view = widget_sync.KeyedTreeview(self.ranking_tree)
+        self.recent_sales_view = widget_sync.KeyedTreeview(self.recent_sales_tree)
 
     def refresh_reports(self):
-        orders, sales = db.get_today_summary()
+        self.worker.submit(self._load_reports, on_done=self._show_reports, key="reports")
+
+    @staticmethod
+    def _load_reports():
+        return db.get_today_summary(), db.get_product_sales_ranking(), db.get_recent_sales()
+
+    def _show_reports(self, loaded):
+        (orders, sales), ranking_rows, recent_rows = loaded
         self.today_sales_label.configure(text=f"今日销售额: ¥{sales:.2f}")
         self.today_orders_label.configure(text=f"今日订单数: {orders}")
-        for i in self.ranking_tree.get_children(): self.ranking_tree.delete(i)
-        for name, qty, total in db.get_product_sales_ranking(): self.ranking_tree.insert("", "end", values=(name, qty, f"{total:.2f}"))
-        for i in self.recent_sales_tree.get_children(): self.recent_sales_tree.delete(i)
-        for time, name, qty, price in db.get_recent_sales(): self.recent_sales_tree.insert("", "end", values=(time, name, qty, f"{price:.2f}"))
+        ranking = [(name, qty, f"{total:.2f}") for name, qty, total in ranking_rows]
+        self.ranking_view.sync(widget_sync.keyed(ranking, key=lambda row: row[0]))
+        # A new sale shifts the recent list down by one row: one insert and one delete, not a rebuild.
+        recent = [(time, name, qty, f"{price:.2f}") for time, name, qty, price in recent_rows]
+        self.recent_sales_view.sync(widget_sync.keyed(recent, key=lambda row: f"{row[0]}|{row[1]}"))
 
 if __name__ == "__main__":
     app = App()
@@ -1,4 +1,5 @@
 import db_logic as db
+import catalog
 
 def add_ingredient():
     """Handles user input for adding a new ingredient."""
@@ -35,17 +36,13 @@ def update_stock():
     """Handles user input for updating stock of an ingredient."""
     ingredient_name = input("请输入要更新库存的原料名称: ")
     
-    all_ingredients = db.get_all_ingredients()
-    target_ingredient = None
     # Find the ingredient by name to get its ID
-    for ing_id, name, _, _, _ in all_ingredients:
-        if name == ingredient_name:
-            target_ingredient = (ing_id, name)
-            break
+    target_ingredient = catalog.get_catalog().resolve_ingredient(ingredient_name)
             
     if not target_ingredient:
         print(f"错误: 未找到原料 '{ingredient_name}'.")
         return
+    ingredient_name = target_ingredient[1]
         
     try:
         quantity_change = float(input(f"请输入为 '{ingredient_name}' 添加入库数量 (正数): "))
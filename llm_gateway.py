@@ -0,0 +1,182 @@
+import asyncio
+import concurrent.futures
+import os
+import queue
+import threading
+
+# At most LLM_MAX_CONCURRENCY upstream completions are in flight at once;
+# further requests queue on the gateway's event loop instead of tying up
+# their own connections to the provider.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+_DONE = object()
+
+
+class LLMGateway:
+    """Runs upstream chat completions on one background asyncio event loop.
+
+    Request threads (Flask workers) call complete() and block only on a
+    future. Upstream calls share an async client and are bounded by a
+    semaphore, each attempt's timeout covers its wait for a slot, and
+    concurrent calls with the same key share a single upstream request,
+    which is cancelled once every caller waiting for it has given up.
+    """
+
+    def __init__(self, client_factory, max_concurrency=LLM_MAX_CONCURRENCY, timeout=8.0):
+        self.client_factory = client_factory
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._loop = None
+        self._client = None
+        self._semaphore = None
+        self._inflight = {}  # key -> [concurrent.futures.Future, number of waiters]
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is not None:
+                return self._loop
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                self._semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._client = self.client_factory()
+                ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=run, name="llm-gateway", daemon=True).start()
+            ready.wait()
+            self._loop = loop
+            return loop
+
+    async def _create(self, params):
+        # The timeout covers waiting for a semaphore slot as well as the call,
+        # so an overloaded gateway fails fast instead of calling upstream late.
+        async def call():
+            async with self._semaphore:
+                self.upstream_calls += 1
+                return await self._client.chat.completions.create(**params)
+        return await asyncio.wait_for(call(), self.timeout)
+
+    def submit(self, key, **params):
+        """Starts (or joins) the completion for key and returns a concurrent future.
+
+        Each call counts as one waiter on the key until the completion
+        finishes or the caller hands the future to give_up().
+        """
+        loop = self._ensure_loop()
+        with self._lock:
+            entry = self._inflight.get(key) if key is not None else None
+            if entry is not None:
+                self.coalesced += 1
+                entry[1] += 1
+                return entry[0]
+            future = asyncio.run_coroutine_threadsafe(self._create(params), loop)
+            if key is None:
+                return future
+            self._inflight[key] = [future, 1]
+        # Registered outside the lock: if the call has already finished, the
+        # callback runs right here and _forget() takes the lock itself.
+        future.add_done_callback(lambda _, key=key: self._forget(key, future))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            entry = self._inflight.get(key)
+            if entry is not None and entry[0] is future:
+                del self._inflight[key]
+
+    def give_up(self, key, future):
+        """Stops waiting for a submitted completion; cancels it once no other waiter is left."""
+        with self._lock:
+            entry = self._inflight.get(key) if key is not None else None
+            if entry is not None and entry[0] is future:
+                entry[1] -= 1
+                if entry[1] > 0:
+                    return
+                # Later callers for the key start a fresh call rather than
+                # joining one that is about to be cancelled.
+                del self._inflight[key]
+        future.cancel()
+
+    def complete(self, key, **params):
+        """Blocking chat completion; identical in-flight keys share one upstream call."""
+        future = self.submit(key, **params)
+        try:
+            # _create() already bounds queueing plus the call; the slack only
+            # covers handing the result back from the loop.
+            return future.result(timeout=self.timeout + 1)
+        except (asyncio.TimeoutError, concurrent.futures.TimeoutError):
+            self.give_up(key, future)
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"LLM request timed out after {self.timeout:.1f}s")
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+
+    def stream(self, **params):
+        """Yields the text deltas of a streamed completion as they arrive.
+
+        Streams are never coalesced, but they count against the same
+        concurrency limit. Each wait for the next delta is bounded by the
+        gateway timeout. Closing the generator early cancels the upstream call.
+        """
+        loop = self._ensure_loop()
+        deltas = queue.Queue()
+
+        async def pump():
+            try:
+                # As in _create(), the timeout covers waiting for a slot too.
+                await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+                try:
+                    self.upstream_calls += 1
+                    stream = await asyncio.wait_for(
+                        self._client.chat.completions.create(stream=True, **params), self.timeout)
+                    async for chunk in stream:
+                        if chunk.choices:
+                            deltas.put(chunk.choices[0].delta.content or "")
+                finally:
+                    self._semaphore.release()
+            except Exception as e:
+                deltas.put(e)
+            finally:
+                deltas.put(_DONE)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), loop)
+        try:
+            while True:
+                try:
+                    item = deltas.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self.timeouts += 1
+                    raise TimeoutError(f"LLM stream stalled for {self.timeout:.1f}s")
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    with self._lock:
+                        self.errors += 1
+                    raise item
+                yield item
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight_keys": len(self._inflight),
+                "upstream_calls": self.upstream_calls,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+            }
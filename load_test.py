@@ -0,0 +1,205 @@
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.stdout.reconfigure(encoding='utf-8')
+
+# Preferences a kiosk sees all day; many requests repeat one of these.
+PREFERENCES = [
+    "清爽 不要咖啡因", "想喝水果茶", "奶香浓郁", "来点Q弹的小料", "芒果",
+    "椰奶", "不要太甜", "提神", "草莓", "热量低一点",
+]
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """A local OpenAI-compatible /chat/completions endpoint with fixed latency.
+
+    It answers with the first product named in the prompt and records how
+    many requests it saw and the peak number handled at once. Streamed
+    answers send the first character after a third of the latency and the
+    rest spread over the remainder.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency):
+        super().__init__(("127.0.0.1", 0), FakeLLMHandler)
+        self.latency = latency
+        self.requests = 0
+        self.active = 0
+        self.peak_active = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.active += 1
+            server.peak_active = max(server.peak_active, server.active)
+        try:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompt = "\n".join(message["content"] for message in body["messages"])
+            match = re.search(r"产品名称: ([^,]+),", prompt)
+            answer = match.group(1) if match else "未知饮品"
+            if body.get("stream"):
+                self.stream_answer(body["model"], answer)
+                return
+            time.sleep(server.latency)
+            payload = json.dumps({
+                "id": "fake", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def stream_answer(self, model, answer):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        time.sleep(self.server.latency / 3)
+        step = self.server.latency * 2 / 3 / max(len(answer), 1)
+        for i, ch in enumerate(answer):
+            if i:
+                time.sleep(step)
+            chunk = {
+                "id": "fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "delta": {"content": ch}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+def start_in_thread(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def post_json(url, payload):
+    request = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        return json.loads(response.read())
+
+
+def time_to_first_token(url, preference):
+    """POSTs to /recommend/stream; returns (seconds to the first token event, seconds to the result event)."""
+    request = urllib.request.Request(url, data=json.dumps({"preference": preference}).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    first = None
+    with urllib.request.urlopen(request, timeout=60) as response:
+        for line in response:
+            if first is None and line.startswith(b"event: token"):
+                first = time.perf_counter() - start
+            elif line.startswith(b"event: result"):
+                return first, time.perf_counter() - start
+    raise RuntimeError("stream ended without a result event")
+
+
+def run_load(url, total, concurrency):
+    """Fires total /recommend requests from concurrency client threads; returns (seconds, latencies)."""
+    def one(i):
+        start = time.perf_counter()
+        post_json(url, {"preference": PREFERENCES[i % len(PREFERENCES)]})
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(one, range(total)))
+    return time.perf_counter() - start, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/recommend 压力测试 (使用本地模拟的LLM服务)")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.3, help="fake upstream latency in seconds")
+    parser.add_argument("--max-upstream", type=int, default=8, help="gateway LLM_MAX_CONCURRENCY")
+    args = parser.parse_args()
+
+    fake = start_in_thread(FakeLLMServer(args.latency))
+    workdir = tempfile.mkdtemp()
+    shutil.copyfile("nainai_tea.db", os.path.join(workdir, "load.db"))
+    os.environ.update({
+        "DEEPSEEK_API_KEY": "fake-key",
+        "DEEPSEEK_BASE_URL": fake.base_url,
+        "RECOMMENDER_MODE": "llm",
+        "RECOMMENDATION_CACHE_SIZE": "0",  # measure the upstream path, not the response cache
+        "RETRIEVAL_TOP_K": "0",
+    })
+
+    import db_logic
+    db_logic.DB_FILE = os.path.join(workdir, "load.db")
+    from openai import AsyncOpenAI, OpenAI
+    from werkzeug.serving import make_server
+    import llm_gateway
+    import recommender_backend
+    import recommenders
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    backend = make_server("127.0.0.1", 0, recommender_backend.app, threaded=True)
+    start_in_thread(backend)
+    url = f"http://127.0.0.1:{backend.server_port}/recommend"
+
+    modes = {
+        "blocking client": recommenders.LLMRecommender(
+            client=OpenAI(api_key="fake-key", base_url=fake.base_url, max_retries=0)),
+        "async gateway": recommenders.LLMRecommender(gateway=llm_gateway.LLMGateway(
+            lambda: AsyncOpenAI(api_key="fake-key", base_url=fake.base_url, max_retries=0),
+            max_concurrency=args.max_upstream)),
+    }
+    print(f"{args.requests} requests, {args.concurrency} concurrent clients, "
+          f"{len(PREFERENCES)} distinct preferences, upstream latency {args.latency * 1000:.0f} ms")
+    print(f"{'mode':<16} {'req/s':>8} {'p50':>9} {'p95':>9} {'upstream calls':>15} {'peak upstream':>14}")
+    for label, recommender in modes.items():
+        recommender_backend.recommender = recommender
+        fake.requests = fake.peak_active = 0
+        seconds, latencies = run_load(url, args.requests, args.concurrency)
+        latencies.sort()
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{label:<16} {args.requests / seconds:>8.1f} {statistics.median(latencies) * 1000:>6.0f} ms "
+              f"{p95 * 1000:>6.0f} ms {fake.requests:>15} {fake.peak_active:>14}")
+
+    # Perceived latency: the streaming endpoint shows the first characters
+    # long before the whole answer has arrived.
+    stream_url = f"http://127.0.0.1:{backend.server_port}/recommend/stream"
+    samples = [time_to_first_token(stream_url, preference) for preference in PREFERENCES]
+    print(f"/recommend/stream: first token {statistics.median(s[0] for s in samples) * 1000:.0f} ms, "
+          f"full answer {statistics.median(s[1] for s in samples) * 1000:.0f} ms (median, sequential)")
+
+    backend.shutdown()
+    fake.shutdown()
+    db_logic.get_pool().close_all()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import unicodedata
+
+import numpy as np
+
+# Fuzzy matches need at least this Dice similarity over character bigrams;
+# anything weaker is reported as not found rather than guessed.
+FUZZY_THRESHOLD = 0.6
+
+
+def normalize(text):
+    """Folds full-width forms and case, and drops whitespace and punctuation.
+
+    '满杯 芒果！' and 'ＭＡＮＧＯ 满杯芒果' fold to '满杯芒果' and 'mango满杯芒果'.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in ("P", "Z", "C"))
+
+
+def bigrams(normalized):
+    """Distinct character bigrams of a normalized name, padded so one-character names still have two."""
+    padded = f"\x02{normalized}\x03"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+class NameIndex:
+    """Resolves free-form names to ids: exact after normalization, else fuzzy over character bigrams.
+
+    Postings are NumPy arrays per bigram, so a lookup costs one bincount over
+    the postings of the query's few bigrams regardless of catalog size.
+    """
+
+    def __init__(self, names_and_ids, threshold=FUZZY_THRESHOLD):
+        self.threshold = threshold
+        self.ids = []
+        self.names = []
+        self.exact = {}  # normalized name -> row
+        postings = {}
+        for item_id, name in names_and_ids:
+            key = normalize(name)
+            if not key:
+                continue
+            row = len(self.ids)
+            self.ids.append(item_id)
+            self.names.append(key)
+            # Two names that normalize alike stay reachable by their exact spelling only.
+            self.exact[key] = None if key in self.exact else row
+            for gram in bigrams(key):
+                postings.setdefault(gram, []).append(row)
+        self.postings = {gram: np.array(rows, dtype=np.int32) for gram, rows in postings.items()}
+        self.gram_counts = np.array([len(bigrams(name)) for name in self.names], dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def resolve(self, text, fuzzy=True):
+        """Returns (id, score) for the best match of text, or None.
+
+        score is 1.0 for a normalized exact match. Otherwise, with fuzzy set,
+        a catalog name that appears whole inside text wins (the longest one),
+        then the closest name by bigram Dice similarity, provided it is
+        clearly better than the runner-up. Those rules suit picking the drink
+        out of an LLM answer, not deciding what to sell: '满杯草莓芒果'
+        contains '满杯草莓'.
+        """
+        key = normalize(text or "")
+        if not key or not self.ids:
+            return None
+        row = self.exact.get(key)
+        if row is not None:
+            return self.ids[row], 1.0
+        if not fuzzy:
+            return None
+        grams = [self.postings[gram] for gram in bigrams(key) if gram in self.postings]
+        if not grams:
+            return None
+        shared = np.bincount(np.concatenate(grams), minlength=len(self.ids)).astype(np.float32)
+        # Answers like '推荐：满杯芒果。' contain the whole name: every bigram
+        # but the two padded ones at its ends is shared.
+        contained = np.flatnonzero((shared > 0) & (shared >= self.gram_counts - 2))
+        contained = [row for row in contained if len(self.names[row]) > 1 and self.names[row] in key]
+        if contained:
+            row = max(contained, key=lambda row: len(self.names[row]))
+            return self.ids[row], len(self.names[row]) / len(key)
+        dice = 2 * shared / (self.gram_counts + len(bigrams(key)))
+        if len(dice) > 1:
+            top = np.argpartition(-dice, 1)[:2]
+            best, runner_up = (top[0], top[1]) if dice[top[0]] >= dice[top[1]] else (top[1], top[0])
+            if dice[best] - dice[runner_up] < 0.05:
+                return None
+        else:
+            best = 0
+        if dice[best] < self.threshold:
+            return None
+        return self.ids[best], float(dice[best])
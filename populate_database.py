@@ -1,10 +1,12 @@
 import sqlite3
 import random
+import database
 
 def clear_existing_data(c):
-    """Clears products, recipes, and ingredients tables."""
+    """Clears products, recipes, ingredients, sales and their rollup tables."""
     print("Clearing existing products, recipes, sales, and inventory movements...")
     c.execute("DELETE FROM sales")
+    c.execute("DELETE FROM sales_daily_rollup")
     c.execute("DELETE FROM inventory_movements")
     c.execute("DELETE FROM recipes")
     c.execute("DELETE FROM products")
@@ -120,6 +122,8 @@ if __name__ == '__main__':
     conn = None
     try:
         conn = sqlite3.connect(db_file)
+        # Bring an older database up to the current schema (sales_daily_rollup etc.) first.
+        database.create_tables(conn)
         c = conn.cursor()
         
         # Run the process
@@ -0,0 +1,5 @@
+import db_logic
+import sys
+sys.stdout.reconfigure(encoding='utf-8')
+success, message = db_logic.rebuild_sales_rollup()
+print(message)
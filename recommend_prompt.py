@@ -0,0 +1,139 @@
+import os
+import threading
+import catalog
+import name_index
+import retrieval
+
+SYSTEM_PROMPT = (
+    "你是一个专业的茶饮店智能推荐师。你的任务是根据用户的偏好，从提供的饮品列表中推荐最适合的一款饮品。\n"
+    "请严格按照以下步骤进行：\n"
+    "1. 仔细阅读用户的偏好。\n"
+    "2. 从提供的饮品列表中，选择最符合用户偏好的一款饮品。\n"
+    "3. 你的回答必须只包含推荐的饮品名称，不要有任何其他文字、解释或标点符号。\n"
+    "例如：\n"
+    "柠檬草莓多多"
+)
+
+# Once the menu has more than RETRIEVAL_MIN_PRODUCTS products, only the
+# RETRIEVAL_TOP_K best local matches for the preference are sent upstream;
+# RETRIEVAL_TOP_K=0 always sends the full catalog. Smaller menus go out whole:
+# local matching only sees names and attributes, and on the real menu its
+# top 20 often missed the drink the model picks from the full list
+# (benchmark.py retrieval measures this).
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "20"))
+RETRIEVAL_MIN_PRODUCTS = int(os.getenv("RETRIEVAL_MIN_PRODUCTS", "500"))
+# At most this many sold-out products are listed in a full-catalog prompt;
+# answers naming any other sold-out product are still rejected afterwards.
+MAX_SOLD_OUT_NAMES = 30
+
+
+def format_product_line(name, price, attributes):
+    attr_str = ", ".join([f"{attr_name}: {attr_value}" for attr_name, attr_value in attributes])
+    return f"产品名称: {name}, 价格: ¥{price:.2f}, 属性: {attr_str}"
+
+
+def normalize_preference(text):
+    """Folds full-width forms and case, and drops whitespace and punctuation (see name_index.normalize)."""
+    return name_index.normalize(text)
+
+
+def estimate_tokens(text):
+    """Rough DeepSeek token estimate: ~0.6 tokens per CJK character, ~0.3 per other character."""
+    cjk = sum(1 for ch in text if '一' <= ch <= '鿿' or '　' <= ch <= '〿' or '＀' <= ch <= '￯')
+    return int(cjk * 0.6 + (len(text) - cjk) * 0.3) + 1
+
+
+class CatalogPrompt:
+    """The serialized catalog for one catalog version.
+
+    The whole catalog lives in the system message and the user's preference is
+    only appended afterwards, so every request for the same catalog version
+    shares a byte-identical prefix that providers with prefix caching can reuse.
+    """
+
+    def __init__(self, version, products_with_attributes):
+        self.version = version
+        self.lines_by_id = {p_id: format_product_line(name, price, attributes)
+                            for p_id, name, price, attributes in products_with_attributes}
+        self.product_lines = list(self.lines_by_id.values())
+        self.product_name_map = {name: {"id": p_id, "price": price}
+                                 for p_id, name, price, _ in products_with_attributes}
+        self.names_by_id = {p_id: name for p_id, name, _, _ in products_with_attributes}
+        self.catalog_block = ";\n".join(self.product_lines)
+        self.system_prompt = f"{SYSTEM_PROMPT}\n\n可供选择的饮品列表:\n{self.catalog_block}"
+        self.token_count = estimate_tokens(self.system_prompt)
+
+    def messages(self, user_preference, candidate_ids=None, unavailable_ids=frozenset()):
+        """Chat messages for a preference, over the full catalog or only candidate_ids.
+
+        Sold-out products (unavailable_ids) are dropped from a candidate list;
+        with the full catalog they are named in the user message instead, so
+        the shared system prefix stays unchanged.
+        """
+        if candidate_ids is None:
+            sold_out = ""
+            if unavailable_ids:
+                names = sorted(self.names_by_id[p_id] for p_id in unavailable_ids if p_id in self.names_by_id)
+                if names:
+                    sold_out = f"\n\n以下饮品暂时售罄，请不要推荐: {', '.join(names[:MAX_SOLD_OUT_NAMES])}"
+            return [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": f"用户偏好: {user_preference}{sold_out}\n\n请推荐一款饮品。"},
+            ]
+        candidate_block = ";\n".join(self.lines_by_id[p_id] for p_id in candidate_ids if p_id not in unavailable_ids)
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": f"用户偏好: {user_preference}\n\n可供选择的饮品列表:\n{candidate_block}\n\n请推荐一款饮品。"},
+        ]
+
+
+_lock = threading.Lock()
+_cached = None
+
+
+def get_catalog_prompt():
+    """Returns the CatalogPrompt for the current catalog, rebuilding it only after a catalog change."""
+    global _cached
+    catalog_data = catalog.get_catalog()
+    cached = _cached
+    if cached is not None and catalog_data.version is not None and cached.version == catalog_data.version:
+        return cached
+    with _lock:
+        if _cached is None or _cached.version != catalog_data.version or catalog_data.version is None:
+            _cached = CatalogPrompt(catalog_data.version, catalog_data.products_with_attributes)
+        return _cached
+
+
+def prefilters(catalog_prompt):
+    """Whether prompts for this catalog list only retrieved candidates."""
+    return bool(RETRIEVAL_TOP_K) and len(catalog_prompt.product_lines) > max(RETRIEVAL_TOP_K, RETRIEVAL_MIN_PRODUCTS)
+
+
+def build_messages(user_preference, unavailable_ids=frozenset()):
+    """Returns (CatalogPrompt, messages) for a preference, pre-filtered by local retrieval on large menus."""
+    catalog_prompt = get_catalog_prompt()
+    if prefilters(catalog_prompt):
+        candidate_ids = _candidates(catalog_prompt, retrieval.retrieve_candidates(
+            user_preference, RETRIEVAL_TOP_K + len(unavailable_ids)), unavailable_ids)
+        if candidate_ids:
+            return catalog_prompt, catalog_prompt.messages(user_preference, candidate_ids)
+    return catalog_prompt, catalog_prompt.messages(user_preference, unavailable_ids=unavailable_ids)
+
+
+def _candidates(catalog_prompt, product_ids, unavailable_ids):
+    return [p_id for p_id in product_ids
+            if p_id in catalog_prompt.lines_by_id and p_id not in unavailable_ids][:RETRIEVAL_TOP_K]
+
+
+def build_messages_many(user_preferences, unavailable_ids=frozenset()):
+    """Returns (CatalogPrompt, [messages]) for a batch of preferences, retrieving candidates for all of them together."""
+    catalog_prompt = get_catalog_prompt()
+    if not prefilters(catalog_prompt):
+        return catalog_prompt, [catalog_prompt.messages(preference, unavailable_ids=unavailable_ids)
+                                for preference in user_preferences]
+    batch = []
+    for preference, candidates in zip(user_preferences, retrieval.retrieve_candidates_many(
+            user_preferences, RETRIEVAL_TOP_K + len(unavailable_ids))):
+        candidate_ids = _candidates(catalog_prompt, candidates, unavailable_ids)
+        batch.append(catalog_prompt.messages(preference, candidate_ids or None, unavailable_ids))
+    return catalog_prompt, batch
@@ -1,41 +1,48 @@
 from flask import Flask, request, jsonify
 import os
-from flask import Flask, request, jsonify
+import json
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import db_logic
-from openai import OpenAI
+import catalog
+import recommenders
+import response_cache
 import gemini_api # 导入 gemini_api
 
 app = Flask(__name__)
 CORS(app) 
 
-# 从环境变量获取DeepSeek API Key
-DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
-if not DEEPSEEK_API_KEY:
-    raise ValueError("DEEPSEEK_API_KEY environment variable not set.")
-
-# 初始化DeepSeek客户端
-client = OpenAI(
-    api_key=DEEPSEEK_API_KEY,
-    base_url="https://api.deepseek.com"
-)
+# 推荐引擎 (由 RECOMMENDER_MODE 配置: llm / local / auto，auto 模式下DeepSeek出错或超时自动改用本地引擎)
+# 相同偏好 (归一化后) 在产品目录未变化时直接返回缓存结果
+recommendation_cache = response_cache.create_cache()
+# /recommend/batch 单次请求最多包含的偏好数量
+RECOMMEND_BATCH_MAX_ITEMS = int(os.getenv("RECOMMEND_BATCH_MAX_ITEMS", "200"))
+recommender = recommenders.create_recommender()
+if recommendation_cache is not None:
+    recommender = response_cache.CachedRecommender(recommender, recommendation_cache)
 
 @app.route('/order', methods=['POST'])
 def create_order():
-    product_name = request.json.get('product_name')
-    quantity = request.json.get('quantity')
-
-    if not product_name or not quantity:
+    # 支持单品下单 {"product_name", "quantity"} 或多品下单 {"items": [{"product_name", "quantity"}, ...]}
+    items = request.json.get('items')
+    if items is None:
+        items = [{"product_name": request.json.get('product_name'), "quantity": request.json.get('quantity')}]
+
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return jsonify({"error": "items 必须是 {\"product_name\", \"quantity\"} 对象的列表"}), 400
+    if not items or any(not item.get('product_name') or not item.get('quantity') for item in items):
         return jsonify({"error": "产品名称或数量未提供"}), 400
+    if any(not isinstance(item['product_name'], str) for item in items):
+        return jsonify({"error": "产品名称必须是字符串"}), 400
 
     # 验证产品是否存在
-    product_data = db_logic.get_product_by_name(product_name)
-    if not product_data:
-        return jsonify({"error": f"产品 '{product_name}' 不存在，请检查产品名称。"}), 404
+    catalog_data = catalog.get_catalog()
+    for item in items:
+        if catalog_data.resolve_product(item['product_name']) is None:
+            return jsonify({"error": f"产品 '{item['product_name']}' 不存在，请检查产品名称。"}), 404
 
     try:
-        # 调用下单API
-        order_result = gemini_api.place_order(product_name=product_name, quantity=quantity)
+        # 调用下单API，整单在一个事务中处理
+        order_result = gemini_api.place_order(items=items)
         
         return jsonify({"message": "订单已成功处理。", "order_details": order_result}), 200
 
@@ -44,74 +51,99 @@ def create_order():
         return jsonify({"error": f"订单服务暂时不可用，请稍后再试。错误信息: {str(e)}"}), 500
 
 
+def recommendation_payload(recommendation):
+    """The JSON body describing a recommendation (or the lack of one)."""
+    if recommendation is None:
+        if not catalog.get_catalog().products:
+            return {"message": "目前没有可推荐的饮品数据。"}
+        return {"message": "抱歉，未能找到符合您偏好的饮品，请尝试更具体的描述。"}
+    return {
+        "recommended_drink": recommendation.name,
+        "price": recommendation.price,
+        "engine": recommendation.engine,
+        "message": f"根据您的偏好，我们推荐：{recommendation.name}。"
+    }
+
 @app.route('/recommend', methods=['POST'])
 def recommend_drink():
     user_preference = request.json.get('preference')
     if not user_preference:
         return jsonify({"error": "Preference not provided"}), 400
 
-    # 1. 获取所有产品及其属性
-    all_products_data = db_logic.get_all_products()
-    products_with_attributes = []
-    product_name_map = {}
-
-    for p_id, name, price in all_products_data:
-        attributes = db_logic.get_product_attributes(p_id)
-        attr_str = ", ".join([f"{attr[0]}: {attr[1]}" for attr in attributes])
-        products_with_attributes.append(f"产品名称: {name}, 价格: ¥{price:.2f}, 属性: {attr_str}")
-        product_name_map[name] = {"id": p_id, "price": price}
-
-    if not products_with_attributes:
-        return jsonify({"message": "目前没有可推荐的饮品数据。"}), 200
-
-    # 2. 构建Prompt
-    system_prompt = (
-        "你是一个专业的茶饮店智能推荐师。你的任务是根据用户的偏好，从提供的饮品列表中推荐最适合的一款饮品。\n"
-        "请严格按照以下步骤进行：\n"
-        "1. 仔细阅读用户的偏好。\n"
-        "2. 从提供的饮品列表中，选择最符合用户偏好的一款饮品。\n"
-        "3. 你的回答必须只包含推荐的饮品名称，不要有任何其他文字、解释或标点符号。\n"
-        "例如：\n"
-        "柠檬草莓多多"
-    )
-
-    user_prompt = (
-        f"用户偏好: {user_preference}\n\n"
-        f"可供选择的饮品列表:\n{';\n'.join(products_with_attributes)}\n\n"
-        "请推荐一款饮品。"
-    )
-
     try:
-        # 3. 调用DeepSeek API
-        chat_completion = client.chat.completions.create(
-            model="deepseek-chat", # 或者其他DeepSeek模型，如 deepseek-coder
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.7, # 控制生成文本的随机性
-            max_tokens=50 # 限制DeepSeek的输出长度，只返回饮品名称
-        )
-
-        recommended_drink_name = chat_completion.choices[0].message.content.strip()
-        
-        # 4. 验证推荐结果并返回
-        if recommended_drink_name in product_name_map:
-            recommended_product_info = product_name_map[recommended_drink_name]
-            return jsonify({
-                "recommended_drink": recommended_drink_name,
-                "price": recommended_product_info["price"],
-                "message": f"根据您的偏好，我们推荐：{recommended_drink_name}。"
-            })
-        else:
-            # 如果DeepSeek推荐了一个不在我们列表中的饮品，或者格式不正确
-            print(f"DeepSeek推荐了未知饮品或格式错误: {recommended_drink_name}")
-            return jsonify({"message": "抱歉，未能找到符合您偏好的饮品，请尝试更具体的描述。"}), 200
+        recommendation = recommender.recommend(user_preference)
+    except Exception as e:
+        print(f"调用推荐引擎时发生错误: {e}")
+        return jsonify({"error": f"推荐服务暂时不可用，请稍后再试。错误信息: {str(e)}"}), 500
+
+    return jsonify(recommendation_payload(recommendation))
+
+@app.route('/recommend/batch', methods=['POST'])
+def recommend_drink_batch():
+    """一次为多个偏好推荐: {"preferences": [...], "parallelism": 可选}，结果按输入顺序返回。"""
+    preferences = request.json.get('preferences')
+    if not isinstance(preferences, list) or not preferences or not all(
+            isinstance(p, str) and p.strip() for p in preferences):
+        return jsonify({"error": "Preferences not provided"}), 400
+    if len(preferences) > RECOMMEND_BATCH_MAX_ITEMS:
+        return jsonify({"error": f"一次最多推荐 {RECOMMEND_BATCH_MAX_ITEMS} 个偏好"}), 400
+    parallelism = request.json.get('parallelism', recommenders.RECOMMEND_BATCH_PARALLELISM)
+    if not isinstance(parallelism, int) or parallelism < 1:
+        return jsonify({"error": "parallelism 必须是正整数"}), 400
+    # 并发上限不超过服务端配置
+    parallelism = min(parallelism, recommenders.RECOMMEND_BATCH_PARALLELISM)
 
+    try:
+        recommendations = recommender.recommend_batch(preferences, parallelism)
     except Exception as e:
-        print(f"调用DeepSeek API时发生错误: {e}")
+        print(f"调用推荐引擎时发生错误: {e}")
         return jsonify({"error": f"推荐服务暂时不可用，请稍后再试。错误信息: {str(e)}"}), 500
 
+    results = []
+    for preference, recommendation in zip(preferences, recommendations):
+        if isinstance(recommendation, Exception):
+            results.append({"preference": preference, "error": f"推荐失败: {recommendation}"})
+        else:
+            results.append({"preference": preference, **recommendation_payload(recommendation)})
+    return jsonify({"results": results})
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/recommend/stream', methods=['POST'])
+def recommend_drink_stream():
+    """以 Server-Sent Events 流式返回推荐: 若干 token 事件，最后是 result (或 error) 事件。"""
+    user_preference = request.json.get('preference')
+    if not user_preference:
+        return jsonify({"error": "Preference not provided"}), 400
+
+    def events():
+        try:
+            for kind, value in recommender.stream(user_preference):
+                if kind == "token":
+                    yield sse_event("token", {"text": value})
+                else:
+                    yield sse_event("result", recommendation_payload(value))
+        except Exception as e:
+            print(f"调用推荐引擎时发生错误: {e}")
+            yield sse_event("error", {"error": f"推荐服务暂时不可用，请稍后再试。错误信息: {str(e)}"})
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/recommend/cache', methods=['GET'])
+def recommendation_cache_stats():
+    if recommendation_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **recommendation_cache.stats()})
+
+@app.route('/recommend/upstream', methods=['GET'])
+def upstream_stats():
+    stats = recommenders.gateway_stats()
+    if stats is None:
+        return jsonify({"async": False})
+    return jsonify({"async": True, **stats})
+
 @app.route('/')
 def index():
     return "AI Drink Recommender Backend is running!"
@@ -0,0 +1,324 @@
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import availability
+import catalog
+import db_logic
+import llm_gateway
+import recommend_prompt
+import retrieval
+
+# RECOMMENDER_MODE selects the engine: 'llm' (DeepSeek only), 'local' (offline
+# only) or 'auto' (DeepSeek with automatic local fallback, or local only when
+# no API key is configured).
+RECOMMENDER_MODE = os.getenv("RECOMMENDER_MODE", "auto")
+DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+DEEPSEEK_MODEL = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "8"))
+# LLM_ASYNC=1 sends upstream calls through the shared asyncio gateway
+# (bounded concurrency, request coalescing); 0 uses a blocking client per call.
+LLM_ASYNC = os.getenv("LLM_ASYNC", "1") == "1"
+# Upper bound on upstream calls one batch request keeps in flight.
+RECOMMEND_BATCH_PARALLELISM = int(os.getenv("RECOMMEND_BATCH_PARALLELISM", "8"))
+
+Recommendation = namedtuple("Recommendation", ["product_id", "name", "price", "engine"])
+
+
+class Recommender:
+    """Picks one product for a free-text preference.
+
+    recommend() returns a Recommendation, or None when nothing suitable was
+    found, and raises when the engine itself fails.
+    """
+
+    name = "base"
+
+    def recommend(self, preference):
+        raise NotImplementedError
+
+    def recommend_batch(self, preferences, parallelism=RECOMMEND_BATCH_PARALLELISM):
+        """Recommendations for many preferences, in input order.
+
+        An item whose engine call raised holds the exception instead of a
+        result, so one failure does not sink the whole batch.
+        """
+        results = []
+        for preference in preferences:
+            try:
+                results.append(self.recommend(preference))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def stream(self, preference):
+        """Yields ('token', text) pieces as they are produced, then ('result', Recommendation or None).
+
+        Engines without incremental output emit the whole answer as one token.
+        """
+        result = self.recommend(preference)
+        if result is not None:
+            yield "token", result.name
+        yield "result", result
+
+    def _result(self, name):
+        product = catalog.get_catalog().product_by_name(name)
+        if product is None:
+            return None
+        return Recommendation(product[0], product[1], product[2], self.name)
+
+
+_gateway = None
+
+
+def get_gateway():
+    """The process-wide LLMGateway for DeepSeek, created on first use."""
+    global _gateway
+    if _gateway is None:
+        if not DEEPSEEK_API_KEY:
+            raise ValueError("DEEPSEEK_API_KEY environment variable not set.")
+
+        def client_factory():
+            from openai import AsyncOpenAI
+            return AsyncOpenAI(api_key=DEEPSEEK_API_KEY, base_url=DEEPSEEK_BASE_URL, max_retries=0)
+
+        _gateway = llm_gateway.LLMGateway(client_factory, timeout=LLM_TIMEOUT)
+    return _gateway
+
+
+def gateway_stats():
+    """Counters of the shared gateway, or None when no async upstream calls have been set up."""
+    return None if _gateway is None else _gateway.stats()
+
+
+class LLMRecommender(Recommender):
+    """Asks an OpenAI-compatible chat endpoint (DeepSeek by default).
+
+    Calls go through gateway when one is given, otherwise through the
+    blocking client.
+    """
+
+    name = "llm"
+
+    def __init__(self, client=None, model=DEEPSEEK_MODEL, timeout=LLM_TIMEOUT, gateway=None):
+        if client is None and gateway is None:
+            from openai import OpenAI
+            if not DEEPSEEK_API_KEY:
+                raise ValueError("DEEPSEEK_API_KEY environment variable not set.")
+            client = OpenAI(api_key=DEEPSEEK_API_KEY, base_url=DEEPSEEK_BASE_URL)
+        self.client = client
+        self.gateway = gateway
+        self.model = model
+        self.timeout = timeout
+
+    def _params(self, messages):
+        return dict(
+            model=self.model,
+            messages=messages,
+            temperature=0.7, # 控制生成文本的随机性
+            max_tokens=50, # 限制输出长度，只返回饮品名称
+        )
+
+    def complete(self, preference, catalog_prompt, messages, unavailable_ids=frozenset()):
+        params = self._params(messages)
+        if self.gateway is not None:
+            key = (catalog_prompt.version, unavailable_ids, recommend_prompt.normalize_preference(preference))
+            return self.gateway.complete(key, **params)
+        return self.client.chat.completions.create(timeout=self.timeout, **params)
+
+    def recommend(self, preference):
+        unavailable_ids = availability.unavailable_product_ids()
+        catalog_prompt, messages = recommend_prompt.build_messages(preference, unavailable_ids)
+        if not catalog_prompt.product_lines:
+            return None
+        chat_completion = self.complete(preference, catalog_prompt, messages, unavailable_ids)
+        return self._validate(catalog_prompt, chat_completion.choices[0].message.content, unavailable_ids)
+
+    def recommend_batch(self, preferences, parallelism=RECOMMEND_BATCH_PARALLELISM):
+        unavailable_ids = availability.unavailable_product_ids()
+        catalog_prompt, batch = recommend_prompt.build_messages_many(preferences, unavailable_ids)
+        if not catalog_prompt.product_lines:
+            return [None] * len(preferences)
+
+        def one(item):
+            preference, messages = item
+            try:
+                chat_completion = self.complete(preference, catalog_prompt, messages, unavailable_ids)
+                return self._validate(catalog_prompt, chat_completion.choices[0].message.content, unavailable_ids)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max(1, min(parallelism, len(preferences)))) as pool:
+            return list(pool.map(one, zip(preferences, batch)))
+
+    def stream(self, preference):
+        unavailable_ids = availability.unavailable_product_ids()
+        catalog_prompt, messages = recommend_prompt.build_messages(preference, unavailable_ids)
+        if not catalog_prompt.product_lines:
+            yield "result", None
+            return
+        params = self._params(messages)
+        if self.gateway is not None:
+            deltas = self.gateway.stream(**params)
+        else:
+            deltas = (chunk.choices[0].delta.content or ""
+                      for chunk in self.client.chat.completions.create(stream=True, timeout=self.timeout, **params)
+                      if chunk.choices)
+        pieces = []
+        for delta in deltas:
+            if delta:
+                pieces.append(delta)
+                yield "token", delta
+        # The product name is only checked once the whole completion has arrived.
+        yield "result", self._validate(catalog_prompt, "".join(pieces), unavailable_ids)
+
+    def _validate(self, catalog_prompt, content, unavailable_ids=frozenset()):
+        recommended_drink_name = content.strip()
+        if recommended_drink_name not in catalog_prompt.product_name_map:
+            # 模型回答可能带有标点、空格或说明文字，按名称索引模糊匹配
+            product = catalog.get_catalog().resolve_product(recommended_drink_name, fuzzy=True)
+            if product is None:
+                # 如果模型推荐了一个不在我们列表中的饮品，或者格式不正确
+                print(f"DeepSeek推荐了未知饮品或格式错误: {recommended_drink_name}")
+                return None
+            recommended_drink_name = product[1]
+        result = self._result(recommended_drink_name)
+        if result is not None and result.product_id in unavailable_ids:
+            print(f"DeepSeek推荐了已售罄的饮品: {recommended_drink_name}")
+            return None
+        return result
+
+
+class LocalRecommender(Recommender):
+    """Offline engine: BM25 relevance from the attribute index plus recent sales popularity."""
+
+    name = "local"
+
+    def __init__(self, popularity_weight=0.2, popularity_days=30, popularity_ttl=60.0):
+        self.popularity_weight = popularity_weight
+        self.popularity_days = popularity_days
+        self.popularity_ttl = popularity_ttl
+        self._popularity = {}
+        self._popularity_at = None
+        self._lock = threading.Lock()
+
+    def popularity(self):
+        """{product_id: units sold} over the last popularity_days, refreshed every popularity_ttl seconds."""
+        now = time.monotonic()
+        with self._lock:
+            if self._popularity_at is None or now - self._popularity_at >= self.popularity_ttl:
+                self._popularity = db_logic.get_product_popularity(self.popularity_days)
+                self._popularity_at = now
+            return self._popularity
+
+    def score(self, product_ids, active, relevance):
+        """Blends normalized relevance with log-scaled popularity for every index row.
+
+        relevance is a vector of row scores, or a (preferences x rows) matrix
+        for a batch; each preference is normalized by its own best match.
+        """
+        popularity = self.popularity()
+        units = np.array([popularity.get(pid, 0) for pid in product_ids], dtype=np.float32)
+        best_relevance = relevance.max(axis=-1, keepdims=True) if relevance.shape[-1] else np.zeros(
+            relevance.shape[:-1] + (1,), dtype=relevance.dtype)
+        matched = best_relevance > 0
+        scores = np.divide(relevance, best_relevance, out=np.zeros_like(relevance), where=matched)
+        if len(units) and units.max() > 0:
+            scores = scores + self.popularity_weight * np.log1p(units) / math.log1p(units.max())
+        # Only products that match the preference at all are eligible, and
+        # never ones with a trait the preference rules out (negative relevance).
+        scores[matched & (relevance <= 0)] = -1
+        scores[relevance < 0] = -1
+        scores[..., ~active] = -1
+        return scores
+
+    def _makeable(self, product_ids, active):
+        """active with products that cannot be made right now switched off."""
+        unavailable_ids = availability.unavailable_product_ids()
+        if not unavailable_ids:
+            return active
+        return active & np.array([pid not in unavailable_ids for pid in product_ids], dtype=bool)
+
+    def recommend(self, preference):
+        product_ids, active, relevance = retrieval.score_products(preference)
+        active = self._makeable(product_ids, active)
+        if not active.any():
+            return None
+        scores = self.score(product_ids, active, relevance)
+        best = int(np.argmax(scores))
+        return self._result_for(product_ids[best]) if scores[best] >= 0 else None
+
+    def recommend_batch(self, preferences, parallelism=RECOMMEND_BATCH_PARALLELISM):
+        product_ids, active, relevance = retrieval.score_products_many(preferences)
+        active = self._makeable(product_ids, active)
+        if not active.any():
+            return [None] * len(preferences)
+        scores = self.score(product_ids, active, relevance)
+        best = np.argmax(scores, axis=1)
+        return [self._result_for(product_ids[row]) if score >= 0 else None
+                for row, score in zip(best, scores[np.arange(len(best)), best])]
+
+    def _result_for(self, product_id):
+        product = catalog.get_catalog().products_by_id.get(product_id)
+        return None if product is None else self._result(product[1])
+
+
+class FallbackRecommender(Recommender):
+    """Uses primary, and falls back to the secondary engine when primary raises or times out."""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = f"{primary.name}+{fallback.name}"
+
+    def recommend(self, preference):
+        try:
+            return self.primary.recommend(preference)
+        except Exception as e:
+            print(f"{self.primary.name} 推荐失败，改用 {self.fallback.name} 推荐: {e}")
+            return self.fallback.recommend(preference)
+
+    def recommend_batch(self, preferences, parallelism=RECOMMEND_BATCH_PARALLELISM):
+        results = self.primary.recommend_batch(preferences, parallelism)
+        failed = [i for i, result in enumerate(results) if isinstance(result, Exception)]
+        if failed:
+            print(f"{self.primary.name} 批量推荐中 {len(failed)} 项失败，改用 {self.fallback.name} 推荐: {results[failed[0]]}")
+            retried = self.fallback.recommend_batch([preferences[i] for i in failed], parallelism)
+            for i, result in zip(failed, retried):
+                results[i] = result
+        return results
+
+    def stream(self, preference):
+        try:
+            yield from self.primary.stream(preference)
+        except Exception as e:
+            # Tokens already sent are superseded by the fallback's final result.
+            print(f"{self.primary.name} 推荐失败，改用 {self.fallback.name} 推荐: {e}")
+            yield from self.fallback.stream(preference)
+
+
+def _llm_recommender(client):
+    if client is None and LLM_ASYNC:
+        return LLMRecommender(gateway=get_gateway())
+    return LLMRecommender(client)
+
+
+def create_recommender(mode=None, client=None):
+    """Builds the recommender for mode (default RECOMMENDER_MODE); client overrides the OpenAI client."""
+    mode = mode or RECOMMENDER_MODE
+    if mode == "local":
+        return LocalRecommender()
+    if mode == "llm":
+        return _llm_recommender(client)
+    if mode == "auto":
+        if client is None and not DEEPSEEK_API_KEY:
+            print("未设置 DEEPSEEK_API_KEY，使用本地推荐引擎。")
+            return LocalRecommender()
+        return FallbackRecommender(_llm_recommender(client), LocalRecommender())
+    raise ValueError(f"Unknown RECOMMENDER_MODE: {mode}")
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import availability
+import catalog
+import recommend_prompt
+import recommenders
+
+# RECOMMENDATION_CACHE_SIZE=0 disables the cache. RECOMMENDATION_CACHE_DB names
+# an optional SQLite file that keeps cached answers across restarts.
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1024"))
+RECOMMENDATION_CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", "600"))
+RECOMMENDATION_CACHE_DB = os.getenv("RECOMMENDATION_CACHE_DB")
+
+
+class ResponseCache:
+    """LRU + TTL cache of recommendations keyed by (catalog version, normalized preference).
+
+    Keys include the catalog version, so any product, recipe or attribute
+    change makes earlier answers unreachable. With disk_path set, entries are
+    also written to a small SQLite file and survive restarts.
+    """
+
+    def __init__(self, max_entries=1024, ttl=600.0, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (stored_at, Recommendation)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.disk_hits = 0
+        self._disk = None
+        self._disk_version = None
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS recommendation_cache (
+                    catalog_version INTEGER NOT NULL,
+                    preference TEXT NOT NULL,
+                    stored_at REAL NOT NULL,
+                    product_id INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    price REAL NOT NULL,
+                    engine TEXT NOT NULL,
+                    PRIMARY KEY (catalog_version, preference)
+                )
+            """)
+            self._disk.commit()
+
+    def _disk_get(self, key, now):
+        row = self._disk.execute(
+            "SELECT stored_at, product_id, name, price, engine FROM recommendation_cache "
+            "WHERE catalog_version = ? AND preference = ?", key).fetchone()
+        if row is None or now - row[0] >= self.ttl:
+            return None
+        return row[0], recommenders.Recommendation(*row[1:])
+
+    def _disk_put(self, key, stored_at, value):
+        if self._disk_version != key[0]:
+            # Entries for older catalog versions can never be hit again.
+            self._disk.execute("DELETE FROM recommendation_cache WHERE catalog_version != ?", (key[0],))
+            self._disk_version = key[0]
+        self._disk.execute("INSERT OR REPLACE INTO recommendation_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           key + (stored_at,) + tuple(value))
+        self._disk.execute("DELETE FROM recommendation_cache WHERE stored_at < ?", (time.time() - self.ttl,))
+        self._disk.commit()
+
+    def key(self, preference):
+        return (catalog.get_catalog().version, recommend_prompt.normalize_preference(preference))
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+            if self._disk is not None and key[0] is not None:
+                entry = self._disk_get(key, now)
+                if entry is not None:
+                    self._store(key, entry)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return entry[1]
+            self.misses += 1
+            return None
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def put(self, key, value):
+        entry = (time.time(), value)
+        with self._lock:
+            self._store(key, entry)
+            if self._disk is not None and key[0] is not None:
+                self._disk_put(key, *entry)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM recommendation_cache")
+                self._disk.commit()
+
+
+class CachedRecommender(recommenders.Recommender):
+    """Serves repeated preferences from a ResponseCache in front of another recommender."""
+
+    def __init__(self, inner, cache):
+        self.inner = inner
+        self.cache = cache
+        self.name = inner.name
+        # Answers from a fallback engine stand in for a failed primary call;
+        # caching them would keep serving them long after the primary recovers.
+        self._stand_in_engine = inner.fallback.name if isinstance(inner, recommenders.FallbackRecommender) else None
+
+    def _cacheable(self, result):
+        # Only real answers are cached; "nothing found" may just be a bad reply.
+        return (result is not None and not isinstance(result, Exception)
+                and result.engine != self._stand_in_engine)
+
+    def _lookup(self, key, unavailable_ids):
+        cached = self.cache.get(key)
+        # Stock changes do not change the key; a drink that has since sold out is a miss.
+        if cached is not None and cached.product_id in unavailable_ids:
+            return None
+        return cached
+
+    def recommend(self, preference):
+        key = self.cache.key(preference)
+        cached = self._lookup(key, availability.unavailable_product_ids())
+        if cached is not None:
+            return cached
+        result = self.inner.recommend(preference)
+        if self._cacheable(result):
+            self.cache.put(key, result)
+        return result
+
+    def recommend_batch(self, preferences, parallelism=recommenders.RECOMMEND_BATCH_PARALLELISM):
+        keys = [self.cache.key(preference) for preference in preferences]
+        unavailable_ids = availability.unavailable_product_ids()
+        results = [self._lookup(key, unavailable_ids) for key in keys]
+        # Each distinct uncached preference is sent to the inner engine once.
+        missing = {}
+        for i, (key, result) in enumerate(zip(keys, results)):
+            if result is None:
+                missing.setdefault(key, []).append(i)
+        if missing:
+            fresh = self.inner.recommend_batch([preferences[rows[0]] for rows in missing.values()], parallelism)
+            for (key, rows), result in zip(missing.items(), fresh):
+                if self._cacheable(result):
+                    self.cache.put(key, result)
+                for i in rows:
+                    results[i] = result
+        return results
+
+    def stream(self, preference):
+        key = self.cache.key(preference)
+        cached = self._lookup(key, availability.unavailable_product_ids())
+        if cached is not None:
+            yield "token", cached.name
+            yield "result", cached
+            return
+        for kind, value in self.inner.stream(preference):
+            if kind == "result" and self._cacheable(value):
+                self.cache.put(key, value)
+            yield kind, value
+
+
+def create_cache():
+    """Builds the ResponseCache described by the RECOMMENDATION_CACHE_* settings, or None when disabled."""
+    if RECOMMENDATION_CACHE_SIZE <= 0:
+        return None
+    return ResponseCache(RECOMMENDATION_CACHE_SIZE, RECOMMENDATION_CACHE_TTL, RECOMMENDATION_CACHE_DB)
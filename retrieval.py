@@ -0,0 +1,305 @@
+import math
+import re
+import threading
+from collections import Counter, namedtuple
+
+import numpy as np
+
+import catalog
+
+# BM25 parameters.
+K1 = 1.2
+B = 0.75
+
+# Separators stripped before n-grams are taken; CJK text has no word
+# boundaries, so the index works on character unigrams and bigrams instead.
+_SEPARATORS = re.compile(r"[\s,，。.、;；:：/()（）!！?？\"'“”‘’\-]+")
+
+
+# Traits a preference can ask to avoid ('不要咖啡因', '不要咖啡', '无糖').
+# A product has a trait when its attribute says so ('咖啡因: 有 ...'), or,
+# without that attribute (or for traits with none), when a recipe ingredient
+# name contains one of the keywords. Strict traits exclude the product
+# outright; the others only scale its relevance by SOFT_PENALTY, since nearly
+# every drink has some sugar. "No coffee" is not "no caffeine": tea is fine.
+Trait = namedtuple("Trait", ["attribute", "ingredient_keywords", "strict"])
+TRAITS = {
+    "咖啡因": Trait("咖啡因", ("茶", "乌龙", "咖啡"), True),
+    "咖啡": Trait(None, ("咖啡",), True),
+    "甜度": Trait("甜度", ("糖", "蜜"), False),
+}
+_TRAIT_WORDS = {"咖啡因": "咖啡因", "咖啡": "咖啡", "甜": "甜度", "糖": "甜度"}
+_NEGATED = re.compile(r"(?:不要|不含|不加|没有|不想|无|不|少|低)(?:太|加|含|放|要)?(咖啡因|咖啡|甜|糖)")
+SOFT_PENALTY = 0.5
+
+
+def parse_preference(text):
+    """Splits a preference into (text to match, names of traits to avoid).
+
+    Negated phrases are removed from the text, so '不要咖啡因' never rewards
+    products whose attributes mention 咖啡因.
+    """
+    avoided = frozenset(_TRAIT_WORDS[word] for word in _NEGATED.findall(text))
+    return _NEGATED.sub(" ", text), avoided
+
+
+def product_traits(attributes, ingredient_names):
+    """Names of the TRAITS a product has, from its attributes and recipe ingredient names."""
+    values = dict(attributes)
+    traits = set()
+    for name, trait in TRAITS.items():
+        value = values.get(trait.attribute) if trait.attribute else None
+        if value is not None:
+            has = not value.startswith(("无", "不含", "否"))
+        else:
+            has = any(keyword in ingredient for ingredient in ingredient_names for keyword in trait.ingredient_keywords)
+        if has:
+            traits.add(name)
+    return frozenset(traits)
+
+
+def ngrams(text):
+    """Character unigrams and bigrams of each separator-delimited chunk of text."""
+    grams = []
+    for chunk in _SEPARATORS.split(text.lower()):
+        grams.extend(chunk)
+        grams.extend(chunk[i:i + 2] for i in range(len(chunk) - 1))
+    return grams
+
+
+def product_document(name, attributes):
+    """The text indexed for a product: its name plus every attribute value."""
+    return " ".join([name] + [value for _, value in attributes])
+
+
+class RetrievalIndex:
+    """A BM25 inverted index over product names and attributes.
+
+    Postings are kept per term as {row: term frequency} and compiled lazily
+    into NumPy arrays, so updating one product only recompiles the terms that
+    product touches. Rows are stable per product; a removed product leaves
+    an inactive row behind that no longer scores.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.row_of = {}          # product_id -> row
+        self.product_ids = []     # row -> product_id
+        self.doc_terms = []       # row -> Counter of n-grams (empty when inactive)
+        self.doc_texts = []       # row -> indexed text
+        self.doc_traits = []      # row -> frozenset of TRAITS names
+        self._trait_masks = {}    # trait name -> bool array over rows
+        self.doc_len = np.zeros(0, dtype=np.float32)
+        self.active = np.zeros(0, dtype=bool)
+        self.postings = {}        # term -> {row: tf}
+        self._compiled = {}       # term -> (rows, tfs)
+        self.total_len = 0
+
+    @property
+    def doc_count(self):
+        return int(self.active.sum())
+
+    def _grow(self, rows):
+        extra = rows - len(self.doc_len)
+        if extra > 0:
+            self.doc_len = np.concatenate([self.doc_len, np.zeros(extra, dtype=np.float32)])
+            self.active = np.concatenate([self.active, np.zeros(extra, dtype=bool)])
+
+    def _remove_row(self, row):
+        for term in self.doc_terms[row]:
+            del self.postings[term][row]
+            if not self.postings[term]:
+                del self.postings[term]
+            self._compiled.pop(term, None)
+        self.total_len -= int(self.doc_len[row])
+        self.doc_terms[row] = Counter()
+        self.doc_texts[row] = None
+        self.doc_traits[row] = frozenset()
+        self.doc_len[row] = 0
+        self.active[row] = False
+
+    def _set_row(self, row, text):
+        terms = Counter(ngrams(text))
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[row] = tf
+            self._compiled.pop(term, None)
+        self.doc_terms[row] = terms
+        self.doc_texts[row] = text
+        length = sum(terms.values())
+        self.doc_len[row] = length
+        self.active[row] = True
+        self.total_len += length
+
+    def update(self, version, products_with_attributes, ingredient_names=None):
+        """Brings the index in line with the catalog, re-indexing only products whose text changed.
+
+        ingredient_names maps product ids to their recipe ingredient names,
+        used for products without the attribute that states a trait.
+        Returns the number of products (re)indexed or removed.
+        """
+        ingredient_names = ingredient_names or {}
+        wanted = {pid: product_document(name, attributes) for pid, name, _, attributes in products_with_attributes}
+        traits = {pid: product_traits(attributes, ingredient_names.get(pid, ()))
+                  for pid, _, _, attributes in products_with_attributes}
+        changed = 0
+        for pid, row in list(self.row_of.items()):
+            if pid not in wanted:
+                self._remove_row(row)
+                del self.row_of[pid]
+                changed += 1
+        new_pids = [pid for pid in wanted if pid not in self.row_of]
+        self._grow(len(self.product_ids) + len(new_pids))
+        for pid in new_pids:
+            self.row_of[pid] = len(self.product_ids)
+            self.product_ids.append(pid)
+            self.doc_terms.append(Counter())
+            self.doc_texts.append(None)
+            self.doc_traits.append(frozenset())
+        for pid, text in wanted.items():
+            row = self.row_of[pid]
+            if self.doc_texts[row] != text:
+                if self.active[row]:
+                    self._remove_row(row)
+                self._set_row(row, text)
+                changed += 1
+            self.doc_traits[row] = traits[pid]
+        self._trait_masks = {}
+        self.version = version
+        return changed
+
+    def _trait_mask(self, name):
+        mask = self._trait_masks.get(name)
+        if mask is None:
+            mask = np.array([name in traits for traits in self.doc_traits], dtype=bool)
+            self._trait_masks[name] = mask
+        return mask
+
+    def _avoid(self, scores, avoided):
+        """Applies avoided traits to one row of scores in place: strict ones score -1."""
+        for name in sorted(avoided, key=lambda name: TRAITS[name].strict):
+            mask = self._trait_mask(name)
+            if TRAITS[name].strict:
+                scores[mask] = -1
+            else:
+                scores[mask] *= SOFT_PENALTY
+        return scores
+
+    def _term_arrays(self, term):
+        compiled = self._compiled.get(term)
+        if compiled is None:
+            posting = self.postings.get(term, {})
+            compiled = (np.fromiter(posting.keys(), dtype=np.int64, count=len(posting)),
+                        np.fromiter(posting.values(), dtype=np.float32, count=len(posting)))
+            self._compiled[term] = compiled
+        return compiled
+
+    def score(self, query):
+        """BM25 scores for every row (inactive rows score 0, rows with a strictly avoided trait -1)."""
+        scores = np.zeros(len(self.product_ids), dtype=np.float32)
+        n = self.doc_count
+        if n == 0:
+            return scores
+        query, avoided = parse_preference(query)
+        avg_len = self.total_len / n
+        norm = K1 * (1 - B + B * self.doc_len / avg_len)
+        for term, query_tf in Counter(ngrams(query)).items():
+            rows, tfs = self._term_arrays(term)
+            if len(rows) == 0:
+                continue
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += query_tf * idf * tfs * (K1 + 1) / (tfs + norm[rows])
+        return self._avoid(scores, avoided)
+
+    def score_many(self, queries):
+        """BM25 scores for many queries at once, as a (queries x rows) matrix.
+
+        Every distinct term across the batch is weighted once into a
+        (terms x rows) matrix, and the query term counts are multiplied
+        against it in one matrix product.
+        """
+        parsed = [parse_preference(query) for query in queries]
+        query_terms = [Counter(ngrams(query)) for query, _ in parsed]
+        n = self.doc_count
+        if n == 0:
+            return np.zeros((len(queries), len(self.product_ids)), dtype=np.float32)
+        terms = sorted({term for counts in query_terms for term in counts if term in self.postings})
+        if not terms:
+            scores = np.zeros((len(queries), len(self.product_ids)), dtype=np.float32)
+            for row, (_, avoided) in zip(scores, parsed):
+                self._avoid(row, avoided)
+            return scores
+        avg_len = self.total_len / n
+        norm = K1 * (1 - B + B * self.doc_len / avg_len)
+        column = {term: i for i, term in enumerate(terms)}
+        weights = np.zeros((len(terms), len(self.product_ids)), dtype=np.float32)
+        for i, term in enumerate(terms):
+            rows, tfs = self._term_arrays(term)
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            weights[i, rows] = idf * tfs * (K1 + 1) / (tfs + norm[rows])
+        counts = np.zeros((len(queries), len(terms)), dtype=np.float32)
+        for q, query_counts in enumerate(query_terms):
+            for term, query_tf in query_counts.items():
+                if term in column:
+                    counts[q, column[term]] = query_tf
+        scores = counts @ weights
+        for row, (_, avoided) in zip(scores, parsed):
+            self._avoid(row, avoided)
+        return scores
+
+    def _best_rows(self, scores, k):
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [self.product_ids[row] for row in candidates if scores[row] > 0]
+
+    def top_k(self, query, k):
+        """Product ids of the k best-matching products with a positive score, best first."""
+        return self._best_rows(self.score(query), k)
+
+    def top_k_many(self, queries, k):
+        """top_k() for every query in a batch, scored together."""
+        return [self._best_rows(scores, k) for scores in self.score_many(queries)]
+
+
+_lock = threading.RLock()
+_index = RetrievalIndex()
+
+
+def get_index():
+    """Returns the shared index, updated incrementally to the current catalog version."""
+    catalog_data = catalog.get_catalog()
+    with _lock:
+        if _index.version != catalog_data.version or catalog_data.version is None:
+            ingredient_names = {pid: [catalog_data.ingredients_by_id[ing_id][1] for ing_id in ids
+                                      if ing_id in catalog_data.ingredients_by_id]
+                                for pid, (ids, _) in catalog_data.recipes.items()}
+            _index.update(catalog_data.version, catalog_data.products_with_attributes, ingredient_names)
+    return _index
+
+
+def retrieve_candidates(preference, k):
+    """Top-k product ids for a preference from the shared index."""
+    with _lock:
+        return get_index().top_k(preference, k)
+
+
+def score_products(preference):
+    """Returns (product_ids, active, scores) for every index row, copied under the index lock."""
+    with _lock:
+        index = get_index()
+        return list(index.product_ids), index.active.copy(), index.score(preference)
+
+
+def retrieve_candidates_many(preferences, k):
+    """Top-k product ids for each preference, scored as one batch."""
+    with _lock:
+        return get_index().top_k_many(preferences, k)
+
+
+def score_products_many(preferences):
+    """Like score_products(), with a (preferences x rows) score matrix for a whole batch."""
+    with _lock:
+        index = get_index()
+        return list(index.product_ids), index.active.copy(), index.score_many(preferences)
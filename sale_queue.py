@@ -0,0 +1,147 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import db_logic
+import db_pool
+
+# A batch takes every order that queued up while the previous one was being
+# written, up to SALE_BATCH_MAX_ORDERS. SALE_BATCH_WAIT_MS > 0 additionally holds
+# a batch open that long for late arrivals; callers wait for their batch to
+# commit, so with few producers a window only adds latency.
+SALE_BATCH_MAX_ORDERS = int(os.getenv("SALE_BATCH_MAX_ORDERS", "200"))
+SALE_BATCH_WAIT_MS = float(os.getenv("SALE_BATCH_WAIT_MS", "0"))
+
+_STOP = object()
+
+
+class SaleQueue:
+    """Single writer for sales: producers enqueue orders, one thread commits them in groups.
+
+    Each batch runs in one BEGIN IMMEDIATE transaction, so the writer takes
+    the write lock once per batch instead of once per order and never has to
+    upgrade a read lock mid-transaction. Every order runs inside its own
+    savepoint and sees the stock left by the orders before it, so one failed
+    order does not affect the others. Results come back through futures as
+    the same (success, message) tuples db_logic.process_order returns, once
+    the batch has committed.
+    """
+
+    def __init__(self, max_batch=SALE_BATCH_MAX_ORDERS, max_wait_ms=SALE_BATCH_WAIT_MS):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.batches = 0
+        self.orders = 0
+        self._thread = threading.Thread(target=self._run, name="sale-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, lines):
+        """Queues an order of (product_id, quantity) lines; returns a Future for its (success, message)."""
+        future = Future()
+        lines, error = db_logic.check_order_lines(lines)
+        if error:
+            future.set_result((False, error))
+            return future
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("sale queue is closed")
+            self._queue.put((lines, future))
+        return future
+
+    def process_order(self, lines, timeout=None):
+        """Like db_logic.process_order, but committed by the writer thread as part of a batch."""
+        return self.submit(lines).result(timeout)
+
+    def _next_batch(self):
+        item = self._queue.get()
+        if item is _STOP:
+            return None
+        batch = [item]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            batch = [(lines, future) for lines, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self._commit(batch)
+            except Exception as e:
+                # Keep the writer alive; the callers see the error.
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    @db_pool.timed
+    def _commit(self, batch):
+        """Writes a batch in one transaction; returns one (success, message) per order."""
+        results = []
+        try:
+            with db_logic.get_db_connection() as conn:
+                c = conn.cursor()
+                c.execute("BEGIN IMMEDIATE")
+                for lines, _ in batch:
+                    c.execute("SAVEPOINT sale")
+                    try:
+                        success, message = db_logic.apply_order(c, lines)
+                    except sqlite3.Error as e:
+                        success, message = False, f"数据库错误: {e}"
+                    if not success:
+                        c.execute("ROLLBACK TO sale")
+                    c.execute("RELEASE sale")
+                    results.append((success, message))
+                conn.commit()
+        except sqlite3.Error as e:
+            # Nothing in the batch was committed.
+            return [(False, f"数据库错误: {e}")] * len(batch)
+        self.batches += 1
+        self.orders += len(batch)
+        return results
+
+    def close(self):
+        """Commits the orders already queued, then stops the writer thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+
+_queue_lock = threading.Lock()
+_sale_queue = None
+
+
+def get_sale_queue():
+    """The process-wide SaleQueue, started on first use."""
+    global _sale_queue
+    with _queue_lock:
+        if _sale_queue is None:
+            _sale_queue = SaleQueue()
+        return _sale_queue
+
+
+def process_order(lines, timeout=None):
+    """Sells an order through the process-wide sale queue; same results as db_logic.process_order."""
+    return get_sale_queue().process_order(lines, timeout)
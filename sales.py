@@ -1,4 +1,5 @@
 import db_logic as db
+import catalog
 
 def add_product():
     """Handles user input for adding a new product."""
@@ -27,15 +28,19 @@ def record_sale():
     for i, (pid, name, price) in enumerate(products):
         print(f"{i + 1}. {name} - ¥{price:.2f}")
 
-    try:
-        product_choice = int(input("请选择产品序号: ")) - 1
+    choice = input("请选择产品序号或输入产品名称: ").strip()
+    if choice.isdigit():
+        product_choice = int(choice) - 1
         if not 0 <= product_choice < len(products):
             print("无效的序号。")
             return
         product_id, product_name, _ = products[product_choice]
-    except (ValueError, IndexError):
-        print("无效输入。")
-        return
+    else:
+        product = catalog.get_catalog().resolve_product(choice)
+        if product is None:
+            print(f"错误: 未找到产品 '{choice}'。")
+            return
+        product_id, product_name, _ = product
 
     try:
         quantity = int(input(f"请输入 '{product_name}' 的销售数量: "))
@@ -0,0 +1,110 @@
+import os
+import datetime
+import functools
+
+# sale_time and movement_time are filled in by SQLite's CURRENT_TIMESTAMP, which
+# is UTC text in the form 'YYYY-MM-DD HH:MM:SS'. Reports are asked for in
+# shop-local days, so local boundaries are converted to that same UTC text and
+# compared against the raw column, which keeps the predicates index-friendly.
+#
+# SHOP_TIMEZONE takes an IANA name such as 'Asia/Shanghai'; when unset the
+# system's local timezone is used.
+SHOP_TIMEZONE = os.getenv("SHOP_TIMEZONE")
+
+DB_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def shop_tz():
+    """Returns the shop's tzinfo, or None for the system local timezone."""
+    if not SHOP_TIMEZONE:
+        return None
+    from zoneinfo import ZoneInfo
+    return ZoneInfo(SHOP_TIMEZONE)
+
+def now():
+    """Current shop-local time as an aware datetime."""
+    return datetime.datetime.now(datetime.timezone.utc).astimezone(shop_tz())
+
+def local_midnight(day):
+    """Aware datetime for 00:00 shop-local time on the given date."""
+    tz = shop_tz()
+    if tz is None:
+        return datetime.datetime.combine(day, datetime.time()).astimezone()
+    return datetime.datetime.combine(day, datetime.time(), tzinfo=tz)
+
+def to_db_timestamp(value):
+    """Converts a datetime (naive values are shop-local) to stored UTC text."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            tz = shop_tz()
+            value = value.astimezone() if tz is None else value.replace(tzinfo=tz)
+    else:
+        value = local_midnight(value)
+    return value.astimezone(datetime.timezone.utc).strftime(DB_TIMESTAMP_FORMAT)
+
+def from_db_timestamp(text):
+    """Converts stored UTC text to an aware shop-local datetime."""
+    utc = datetime.datetime.strptime(text[:19], DB_TIMESTAMP_FORMAT).replace(tzinfo=datetime.timezone.utc)
+    return utc.astimezone(shop_tz())
+
+def now_db_timestamp():
+    """Current time as stored UTC text, for rows written from Python."""
+    return datetime.datetime.now(datetime.timezone.utc).strftime(DB_TIMESTAMP_FORMAT)
+
+def local_day(text):
+    """Shop-local date ('YYYY-MM-DD') of a stored UTC timestamp."""
+    if text is None:
+        return None
+    # Every real UTC offset is a whole number of minutes, so the day only
+    # depends on the minute prefix; caching on it keeps rollup rebuilds cheap.
+    return _local_day_of_minute(text[:16])
+
+@functools.lru_cache(maxsize=65536)
+def _local_day_of_minute(prefix):
+    return from_db_timestamp(prefix + ":00").date().isoformat()
+
+def whole_day(text):
+    """Returns the ISO date when a stored timestamp falls on shop-local midnight, otherwise None."""
+    local = from_db_timestamp(text)
+    return local.date().isoformat() if local.time() == datetime.time() else None
+
+def whole_days(start, end):
+    """Returns (first_day, end_day) ISO dates when both stored timestamps fall on
+    shop-local midnight, otherwise None."""
+    first, last = whole_day(start), whole_day(end)
+    if first is None or last is None:
+        return None
+    return first, last
+
+# --- Half-open [start, end) ranges in stored UTC text ---
+
+def date_range(first_day, end_day):
+    """Range covering shop-local dates first_day <= day < end_day."""
+    return to_db_timestamp(local_midnight(first_day)), to_db_timestamp(local_midnight(end_day))
+
+def today_range():
+    today = now().date()
+    return date_range(today, today + datetime.timedelta(days=1))
+
+def week_range():
+    """The current Monday-to-Sunday week."""
+    today = now().date()
+    monday = today - datetime.timedelta(days=today.weekday())
+    return date_range(monday, monday + datetime.timedelta(days=7))
+
+def month_range():
+    today = now().date()
+    first = today.replace(day=1)
+    next_month = (first + datetime.timedelta(days=32)).replace(day=1)
+    return date_range(first, next_month)
+
+def custom_range(start, end):
+    """Range for arbitrary dates or datetimes; naive values are shop-local."""
+    return to_db_timestamp(start), to_db_timestamp(end)
+
+PERIODS = {
+    "today": today_range,
+    "week": week_range,
+    "month": month_range,
+}
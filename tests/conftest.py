@@ -0,0 +1,41 @@
+import os
+import shutil
+
+import pytest
+
+import catalog
+import db_logic
+import shop_time
+
+SOURCE_DB = os.path.join(os.path.dirname(__file__), os.pardir, "nainai_tea.db")
+
+
+@pytest.fixture
+def shop_db(tmp_path, monkeypatch):
+    """A private copy of the shop database, with db_logic pointed at it and a fixed shop timezone."""
+    path = str(tmp_path / "shop.db")
+    shutil.copyfile(SOURCE_DB, path)
+    monkeypatch.setattr(db_logic, "DB_FILE", path)
+    monkeypatch.setattr(shop_time, "SHOP_TIMEZONE", "Asia/Shanghai")
+    shop_time._local_day_of_minute.cache_clear()
+    catalog.invalidate()
+    db_logic.get_all_products()  # apply migrations on the copy
+    yield path
+    db_logic.get_pool().close_all()
+    catalog.invalidate()
+    shop_time._local_day_of_minute.cache_clear()
+
+
+def stock_for_units(product_id, units):
+    """Sets every ingredient of product_id to enough stock for `units` drinks and a half; returns the recipe."""
+    with db_logic.get_db_connection() as conn:
+        recipe = conn.execute("SELECT ingredient_id, quantity_needed FROM recipes WHERE product_id = ?",
+                              (product_id,)).fetchall()
+        conn.executemany("UPDATE ingredients SET stock_quantity = ? WHERE id = ?",
+                         [(quantity * units + quantity / 2, ingredient_id) for ingredient_id, quantity in recipe])
+        conn.commit()
+    return recipe
+
+
+def product_id(name):
+    return db_logic.get_product_by_name(name)[0]
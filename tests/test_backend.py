@@ -0,0 +1,86 @@
+from types import SimpleNamespace
+
+import pytest
+
+import db_logic
+import recommender_backend
+import recommenders
+
+
+class StubCompletions:
+    """Stands in for client.chat.completions: answers with a fixed text, or raises."""
+
+    def __init__(self, answer=None, error=None):
+        self.answer = answer
+        self.error = error
+        self.calls = []
+
+    def create(self, **params):
+        self.calls.append(params)
+        if self.error is not None:
+            raise self.error
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.answer))])
+
+
+@pytest.fixture
+def backend(shop_db, monkeypatch):
+    """Returns (test client, install), where install(completions) puts a stubbed recommender in place."""
+    with db_logic.get_db_connection() as conn:
+        conn.execute("UPDATE ingredients SET stock_quantity = 1000")
+        conn.commit()
+
+    def install(completions, mode="auto"):
+        client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+        monkeypatch.setattr(recommender_backend, "recommender", recommenders.create_recommender(mode, client=client))
+        return completions
+
+    return recommender_backend.app.test_client(), install
+
+
+def test_recommend_returns_the_llm_pick(backend):
+    client, install = backend
+    completions = install(StubCompletions(answer="满杯芒果"))
+    response = client.post("/recommend", json={"preference": "芒果"})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["recommended_drink"], body["engine"]) == ("满杯芒果", "llm")
+    prompt = "".join(message["content"] for message in completions.calls[0]["messages"])
+    assert "满杯芒果" in prompt and "芒果" in prompt
+
+
+def test_recommend_reads_the_drink_out_of_a_chatty_answer(backend):
+    client, install = backend
+    install(StubCompletions(answer="推荐：满杯芒果。"))
+    assert client.post("/recommend", json={"preference": "芒果"}).get_json()["recommended_drink"] == "满杯芒果"
+
+
+def test_recommend_rejects_unknown_drinks(backend):
+    client, install = backend
+    install(StubCompletions(answer="珍珠咖啡"), mode="llm")
+    body = client.post("/recommend", json={"preference": "咖啡"}).get_json()
+    assert "recommended_drink" not in body
+
+
+def test_recommend_falls_back_to_local_engine_when_upstream_fails(backend):
+    client, install = backend
+    install(StubCompletions(error=TimeoutError("upstream timeout")))
+    body = client.post("/recommend", json={"preference": "草莓"}).get_json()
+    assert (body["recommended_drink"], body["engine"]) == ("满杯草莓", "local")
+
+
+def test_recommend_requires_a_preference(backend):
+    client, _ = backend
+    assert client.post("/recommend", json={}).status_code == 400
+
+
+@pytest.mark.parametrize("body, status", [
+    ({"items": ["满杯芒果"]}, 400),
+    ({"items": "满杯芒果"}, 400),
+    ({"items": [{"product_name": ["满杯芒果"], "quantity": 1}]}, 400),
+    ({"product_name": 58, "quantity": 1}, 400),
+    ({"items": [{"product_name": "满杯草莓芒果", "quantity": 1}]}, 404),
+    ({"product_name": "满杯 芒果！", "quantity": 1}, 200),
+])
+def test_order_validation(backend, body, status):
+    client, _ = backend
+    assert client.post("/order", json=body).status_code == status
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import llm_gateway
+
+
+class StubCompletions:
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.started = 0
+
+    async def create(self, **params):
+        self.started += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return "ok"
+
+
+def gateway(completions, **options):
+    return llm_gateway.LLMGateway(lambda: SimpleNamespace(chat=SimpleNamespace(completions=completions)), **options)
+
+
+def test_immediate_failure_does_not_deadlock():
+    g = gateway(StubCompletions(error=RuntimeError("boom")))
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            g.complete("key", model="m")
+    assert g.stats()["in_flight_keys"] == 0
+
+
+def test_overload_times_out_without_late_upstream_calls():
+    completions = StubCompletions(delay=1.0)
+    g = gateway(completions, max_concurrency=2, timeout=0.2)
+    outcomes = []
+
+    def call(i):
+        try:
+            outcomes.append(g.complete(f"key{i % 8}", model="m"))
+        except TimeoutError:
+            outcomes.append("timeout")
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    time.sleep(0.5)  # anything still queued would have reached upstream by now
+
+    assert outcomes == ["timeout"] * 16
+    assert completions.started < 8
+    assert g.stats()["in_flight_keys"] == 0
+
+
+def test_give_up_cancels_only_after_the_last_waiter():
+    g = gateway(StubCompletions(delay=1.0))
+    first = g.submit("key", model="m")
+    joined = g.submit("key", model="m")
+    assert joined is first
+    g.give_up("key", first)
+    assert not first.cancelled()
+    g.give_up("key", joined)
+    assert first.cancelled()
+    assert g.stats()["in_flight_keys"] == 0
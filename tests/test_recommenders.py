@@ -0,0 +1,44 @@
+import pytest
+
+import db_logic
+import recommenders
+import retrieval
+
+
+@pytest.fixture
+def local(shop_db):
+    with db_logic.get_db_connection() as conn:
+        conn.execute("UPDATE ingredients SET stock_quantity = 1000")
+        conn.commit()
+    return recommenders.LocalRecommender()
+
+
+@pytest.mark.parametrize("preference, text, avoided", [
+    ("清爽 不要咖啡因", "清爽", {"咖啡因"}),
+    ("无咖啡因", "", {"咖啡因"}),
+    ("不要咖啡 想喝奶茶", "想喝奶茶", {"咖啡"}),
+    ("不要太甜", "", {"甜度"}),
+    ("无糖 芒果", "芒果", {"甜度"}),
+    ("奶香浓郁", "奶香浓郁", set()),
+])
+def test_negated_terms_are_parsed_out(preference, text, avoided):
+    remaining, parsed = retrieval.parse_preference(preference)
+    assert " ".join(remaining.split()) == text
+    assert parsed == avoided
+
+
+@pytest.mark.parametrize("preference", ["清爽 不要咖啡因", "无咖啡因"])
+def test_no_caffeine_never_recommends_a_caffeinated_drink(local, preference):
+    # Every drink on the shipped menu is made with tea.
+    assert local.recommend(preference) is None
+
+
+def test_no_coffee_still_allows_tea(local):
+    result = local.recommend("不要咖啡 想喝奶茶")
+    assert result is not None
+    assert result.name == local.recommend("想喝奶茶").name
+
+
+def test_less_sugar_only_demotes(local):
+    assert local.recommend("不要太甜") is not None
+    assert local.recommend("无糖 芒果").name == "满杯芒果"
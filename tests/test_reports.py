@@ -0,0 +1,51 @@
+import datetime
+
+import db_logic
+
+# Shop-local times (Asia/Shanghai, UTC+8, see conftest) and the UTC text SQLite stores.
+SALES = [
+    ("2026-02-28 16:30:00", 10.0),  # 2026-03-01 00:30 local
+    ("2026-03-01 04:00:00", 20.0),  # 2026-03-01 12:00 local
+    ("2026-03-01 15:30:00", 30.0),  # 2026-03-01 23:30 local
+    ("2026-03-02 00:00:00", 40.0),  # 2026-03-02 08:00 local
+]
+
+
+def _load_sales(product_id):
+    with db_logic.get_db_connection() as conn:
+        conn.execute("DELETE FROM sales")
+        conn.executemany("INSERT INTO sales (product_id, quantity_sold, sale_time, total_price) VALUES (?, 1, ?, ?)",
+                         [(product_id, sale_time, price) for sale_time, price in SALES])
+        conn.commit()
+    assert db_logic.rebuild_sales_rollup()[0]
+
+
+def test_whole_days_and_sub_day_ranges_agree(shop_db):
+    product_id, name, _ = db_logic.get_all_products()[0]
+    _load_sales(product_id)
+
+    whole_day = (datetime.date(2026, 3, 1), datetime.date(2026, 3, 2))
+    assert db_logic._range_filter(*whole_day, "sale_time", "day")[0]
+    assert db_logic.get_sales_summary(*whole_day) == (3, 60.0)
+    assert db_logic.get_product_sales_ranking(*whole_day) == [(name, 3, 60.0)]
+
+    # Same day given as local datetimes that are not both midnight: raw rows are read.
+    sub_day = (datetime.datetime(2026, 3, 1, 6), datetime.datetime(2026, 3, 2, 0))
+    assert not db_logic._range_filter(*sub_day, "sale_time", "day")[0]
+    assert db_logic.get_sales_summary(*sub_day) == (2, 50.0)
+    assert db_logic.get_product_sales_ranking(*sub_day) == [(name, 2, 50.0)]
+
+    # Range ends are exclusive on both paths.
+    assert db_logic.get_sales_summary(datetime.date(2026, 3, 1), datetime.date(2026, 3, 3)) == (4, 100.0)
+    assert db_logic.get_sales_summary(datetime.datetime(2026, 3, 1, 0, 30), datetime.datetime(2026, 3, 1, 12)) == (1, 10.0)
+
+
+def test_open_ended_ranges(shop_db):
+    product_id, name, _ = db_logic.get_all_products()[0]
+    _load_sales(product_id)
+
+    assert db_logic.get_product_sales_ranking(datetime.date(2030, 1, 1), None) == []
+    assert db_logic.get_product_sales_ranking(datetime.date(2026, 3, 2), None) == [(name, 1, 40.0)]
+    assert db_logic.get_sales_summary(None, datetime.date(2026, 3, 1)) == (0, 0.0)
+    assert db_logic.get_sales_summary(datetime.datetime(2026, 3, 1, 23), None) == (2, 70.0)
+    assert db_logic.get_sales_summary(None, datetime.datetime(2026, 3, 1, 1)) == (1, 10.0)
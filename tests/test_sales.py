@@ -0,0 +1,102 @@
+import multiprocessing
+
+import db_logic
+import sale_queue
+from conftest import product_id, stock_for_units
+
+
+def _seller(path, pid, attempts, results):
+    db_logic.DB_FILE = path
+    sold = 0
+    for _ in range(attempts):
+        success, message = db_logic.process_order([(pid, 1)])
+        if success:
+            sold += 1
+        else:
+            assert message.startswith("库存不足"), message
+    db_logic.get_pool().close_all()
+    results.put(sold)
+
+
+def _stock(recipe):
+    with db_logic.get_db_connection() as conn:
+        return {ingredient_id: conn.execute("SELECT stock_quantity FROM ingredients WHERE id = ?",
+                                            (ingredient_id,)).fetchone()[0]
+                for ingredient_id, _ in recipe}
+
+
+def _sales_of(pid):
+    with db_logic.get_db_connection() as conn:
+        return conn.execute("SELECT COUNT(*), COALESCE(SUM(quantity_sold), 0) FROM sales WHERE product_id = ?",
+                            (pid,)).fetchone()
+
+
+def test_concurrent_processes_never_oversell(shop_db):
+    pid = product_id("满杯芒果")
+    units = 20
+    recipe = stock_for_units(pid, units)
+    db_logic.get_pool().close_all()
+
+    results = multiprocessing.Queue()
+    sellers = [multiprocessing.Process(target=_seller, args=(shop_db, pid, 15, results)) for _ in range(4)]
+    for seller in sellers:
+        seller.start()
+    sold = sum(results.get(timeout=60) for _ in sellers)
+    for seller in sellers:
+        seller.join(60)
+        assert seller.exitcode == 0
+
+    assert sold == units
+    assert _sales_of(pid) == (units, units)
+    assert all(stock >= 0 for stock in _stock(recipe).values())
+
+
+def test_sale_queue_orders_in_a_batch_are_isolated(shop_db):
+    pid = product_id("满杯芒果")
+    recipe = stock_for_units(pid, 2)
+    before = _sales_of(pid)
+    queue = sale_queue.SaleQueue(max_wait_ms=200)
+    try:
+        # Each order sees the stock the earlier ones left: the 2-unit order no
+        # longer fits, and its failure must not undo the orders around it.
+        futures = [queue.submit([(pid, 1)]), queue.submit([(pid, 2)]), queue.submit([(pid, 1)])]
+        results = [future.result(10) for future in futures]
+    finally:
+        queue.close()
+
+    assert queue.batches == 1
+    assert [success for success, _ in results] == [True, False, True]
+    assert results[1][1].startswith("库存不足")
+    assert _sales_of(pid) == (before[0] + 2, before[1] + 2)
+    for (ingredient_id, quantity), stock in zip(recipe, _stock(recipe).values()):
+        assert abs(stock - quantity / 2) < 1e-9
+
+
+def test_failed_order_leaves_no_partial_deduction(shop_db):
+    mango, strawberry = product_id("满杯芒果"), product_id("满杯草莓")
+    stock_for_units(mango, 1)
+    strawberry_recipe = stock_for_units(strawberry, 5)
+    before, sales_before = _stock(strawberry_recipe), _sales_of(strawberry)
+    queue = sale_queue.SaleQueue()
+    try:
+        success, message = queue.process_order([(strawberry, 1), (mango, 3)], timeout=10)
+    finally:
+        queue.close()
+
+    assert not success
+    assert _stock(strawberry_recipe) == before
+    assert _sales_of(strawberry) == sales_before
+
+
+def test_quantities_must_be_positive_ints(shop_db):
+    pid = product_id("满杯芒果")
+    stock_for_units(pid, 5)
+    before = _sales_of(pid)
+    for quantity in (1.7, "2", True, 0, -1):
+        assert db_logic.process_order([(pid, quantity)]) == (False, "错误: 销售数量必须为正整数。")
+    queue = sale_queue.SaleQueue()
+    try:
+        assert queue.process_order([(pid, 1.5)], timeout=10) == (False, "错误: 销售数量必须为正整数。")
+    finally:
+        queue.close()
+    assert _sales_of(pid) == before
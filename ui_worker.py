@@ -0,0 +1,89 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+# How often (ms) finished tasks are collected while any are outstanding.
+RESULT_POLL_MS = 15
+
+
+class BackgroundWorker:
+    """Runs blocking calls on a thread pool and hands their results back on the Tk thread.
+
+    submit() is called from the Tk thread. The call runs on a pool thread;
+    its result (or exception) goes onto a queue that is drained with
+    root.after(), so on_done/on_error always run on the Tk thread and may
+    touch widgets. Tasks submitted with a key are coalesced: while one is
+    running, further submissions under that key collapse into a single
+    follow-up run of the latest one.
+    """
+
+    def __init__(self, root, max_workers=4):
+        self.root = root
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gui-db")
+        self._results = queue.SimpleQueue()
+        self._running = set()  # keys with a task on the pool
+        self._queued = {}      # key -> latest (func, args, on_done, on_error) waiting for it
+        self._outstanding = 0
+        self._poll_id = None
+        self._closed = False
+
+    def submit(self, func, *args, on_done=None, on_error=None, key=None):
+        if self._closed:
+            return
+        if key is not None and key in self._running:
+            self._queued[key] = (func, args, on_done, on_error)
+            return
+        self._start(key, func, args, on_done, on_error)
+
+    def _start(self, key, func, args, on_done, on_error):
+        if key is not None:
+            self._running.add(key)
+        self._outstanding += 1
+        self._executor.submit(self._run, key, func, args, on_done, on_error)
+        if self._poll_id is None:
+            self._poll_id = self.root.after(RESULT_POLL_MS, self._drain)
+
+    def _run(self, key, func, args, on_done, on_error):
+        try:
+            self._results.put((key, on_done, func(*args), None))
+        except Exception as e:
+            self._results.put((key, on_error, None, e))
+
+    def _drain(self):
+        self._poll_id = None
+        if self._closed:
+            return
+        while True:
+            try:
+                key, callback, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._outstanding -= 1
+            if key is not None:
+                self._running.discard(key)
+                if key in self._queued:
+                    self._start(key, *self._queued.pop(key))
+            try:
+                if error is not None:
+                    (callback or self._report)(error)
+                elif callback is not None:
+                    callback(result)
+            except Exception as e:
+                self._report(e)
+        if self._outstanding and self._poll_id is None:
+            self._poll_id = self.root.after(RESULT_POLL_MS, self._drain)
+
+    @staticmethod
+    def _report(error):
+        print(f"Background task failed: {error!r}")
+
+    def busy(self, key):
+        return key in self._running
+
+    def shutdown(self):
+        """Drops queued work and stops delivering results; running calls finish on their own."""
+        self._closed = True
+        self._queued.clear()
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,113 @@
+import math
+
+
+class VirtualList:
+    """Shows a long list of items in a grid using only the widgets that fit on screen.
+
+    The container holds a fixed pool of widgets laid out with grid(), sized
+    to its visible height and width; scrolling moves the window of items
+    over that pool and re-binds the widgets rather than creating new ones,
+    so widget count depends on the window size, not on len(items).
+
+    create(slot) builds the widget for a pool slot; it can find its current
+    item with item(slot). show(widget, item) configures a widget for an
+    item and is only called when the item in its slot changed.
+    """
+
+    def __init__(self, container, scrollbar, create, show, row_height, column_width, padx=5, pady=5):
+        self.container = container
+        self.scrollbar = scrollbar
+        self.create = create
+        self.show = show
+        self.row_height = row_height
+        self.column_width = column_width
+        self.padx = padx
+        self.pady = pady
+        self.items = []
+        self.first_row = 0
+        self.columns = 1
+        self.visible_rows = 1
+        self.pool = []    # widgets, one per slot
+        self.shown = []   # item currently bound to each slot, or None
+        scrollbar.configure(command=self.yview)
+        # The pool is sized to the container, never the other way round.
+        container.grid_propagate(False)
+        container.bind("<Configure>", self._on_resize, "+")
+        self._bind_wheel(container)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel, "+")
+        widget.bind("<Button-4>", lambda event: self.scroll_rows(-1), "+")
+        widget.bind("<Button-5>", lambda event: self.scroll_rows(1), "+")
+
+    def _on_wheel(self, event):
+        self.scroll_rows(-1 if event.delta > 0 else 1)
+
+    def _on_resize(self, event):
+        columns = max(1, event.width // self.column_width)
+        # Only whole rows are shown, so the last visible item is never cut off.
+        visible_rows = max(1, event.height // self.row_height)
+        if (columns, visible_rows) != (self.columns, self.visible_rows):
+            for column in range(columns, self.columns):
+                self.container.grid_columnconfigure(column, weight=0, uniform="")
+            self.columns, self.visible_rows = columns, visible_rows
+            for slot, widget in enumerate(self.pool):
+                widget.grid_forget()
+                self.shown[slot] = None
+            for column in range(columns):
+                self.container.grid_columnconfigure(column, weight=1, uniform="virtual_list")
+            self.render()
+
+    @property
+    def total_rows(self):
+        return math.ceil(len(self.items) / self.columns)
+
+    def set_items(self, items):
+        """Replaces the items, keeping the scroll position where it still fits."""
+        self.items = list(items)
+        self.render()
+
+    def item(self, slot):
+        return self.shown[slot] if slot < len(self.shown) else None
+
+    def scroll_rows(self, rows):
+        self.first_row += rows
+        self.render()
+
+    def yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units' | 'pages')."""
+        if args[0] == "moveto":
+            self.first_row = round(float(args[1]) * self.total_rows)
+        elif args[0] == "scroll":
+            step = self.visible_rows if args[2] == "pages" else 1
+            self.first_row += int(args[1]) * step
+        self.render()
+
+    def render(self):
+        self.first_row = max(0, min(self.first_row, self.total_rows - self.visible_rows))
+        slots = self.columns * self.visible_rows
+        while len(self.pool) < slots:
+            widget = self.create(len(self.pool))
+            self._bind_wheel(widget)
+            self.pool.append(widget)
+            self.shown.append(None)
+        start = self.first_row * self.columns
+        for slot, widget in enumerate(self.pool):
+            index = start + slot
+            item = self.items[index] if slot < slots and index < len(self.items) else None
+            if item is None:
+                if self.shown[slot] is not None or widget.winfo_manager():
+                    widget.grid_forget()
+                    self.shown[slot] = None
+                continue
+            if not widget.winfo_manager():
+                widget.grid(row=slot // self.columns, column=slot % self.columns, sticky="nsew",
+                            padx=self.padx, pady=self.pady)
+            if self.shown[slot] != item:
+                self.show(widget, item)
+                self.shown[slot] = item
+        total = self.total_rows
+        if total <= self.visible_rows:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set(self.first_row / total, (self.first_row + self.visible_rows) / total)
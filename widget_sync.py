@@ -0,0 +1,119 @@
+def keyed(rows, key):
+    """[(key, values)] for rows, with a running suffix on repeated keys so every key is unique."""
+    seen = {}
+    result = []
+    for row in rows:
+        k = str(key(row))
+        n = seen.get(k, 0)
+        seen[k] = n + 1
+        result.append((k if n == 0 else f"{k}#{n}", tuple(row)))
+    return result
+
+
+class KeyedTreeview:
+    """Keeps a flat ttk.Treeview in line with a list of keyed rows.
+
+    Rows use their key as the item id, and sync() only deletes, inserts,
+    moves and re-values the items that actually differ, so selection, focus
+    and scroll position survive a refresh. The values last written are kept
+    here, so unchanged rows cost a dict lookup rather than a Tcl round trip.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.values = {}  # iid -> values as last written
+        self.order = []   # iids in display order
+
+    def sync(self, rows):
+        """Shows rows, a list of (key, values) in display order; returns the number of items touched."""
+        tree = self.tree
+        wanted = dict(rows)
+        touched = 0
+        stale = [iid for iid in self.order if iid not in wanted]
+        if stale:
+            tree.delete(*stale)
+            for iid in stale:
+                del self.values[iid]
+            stale_set = set(stale)
+            self.order = [iid for iid in self.order if iid not in stale_set]
+            touched += len(stale)
+        order = self.order
+        for index, (iid, values) in enumerate(rows):
+            current = self.values.get(iid)
+            if current is None:
+                tree.insert("", index, iid=iid, values=values)
+                order.insert(index, iid)
+                self.values[iid] = values
+                touched += 1
+                continue
+            if order[index] != iid:
+                tree.move(iid, "", index)
+                order.remove(iid)
+                order.insert(index, iid)
+                touched += 1
+            if current != values:
+                tree.item(iid, values=values)
+                self.values[iid] = values
+                touched += 1
+        return touched
+
+    def update(self, rows):
+        """Re-values existing items in place; returns False, changing nothing, if any key is not shown."""
+        if not all(iid in self.values for iid, _ in rows):
+            return False
+        for iid, values in rows:
+            if self.values[iid] != values:
+                self.tree.item(iid, values=values)
+                self.values[iid] = values
+        return True
+
+    def clear(self):
+        self.sync([])
+
+
+class KeyedWidgets:
+    """Keeps the packed children of a container in line with a list of keyed rows.
+
+    create(key) builds the widget for a new key. Each row's options are
+    passed to configure() only when they differ from what was last applied,
+    and the children are re-packed only if their order changed.
+    """
+
+    def __init__(self, create, **pack_options):
+        self.create = create
+        self.pack_options = pack_options
+        self.widgets = {}  # key -> widget
+        self.options = {}  # key -> options as last applied
+        self.order = []
+
+    def sync(self, rows):
+        """Shows rows, a list of (key, options dict) in display order; returns the number of widgets touched."""
+        wanted = dict(rows)
+        touched = 0
+        for key in [key for key in self.widgets if key not in wanted]:
+            self.widgets.pop(key).destroy()
+            del self.options[key]
+            touched += 1
+        for key, options in rows:
+            if key not in self.widgets:
+                self.widgets[key] = self.create(key)
+                touched += 1
+            if self.options.get(key) != options:
+                self.widgets[key].configure(**options)
+                self.options[key] = options
+                touched += 1
+        order = [key for key, _ in rows]
+        if order != self.order:
+            kept = [key for key in self.order if key in wanted]
+            if order[:len(kept)] == kept:
+                # Existing widgets kept their order; pack new ones after them.
+                for key in order[len(kept):]:
+                    self.widgets[key].pack(**self.pack_options)
+            else:
+                # Something moved: re-pack everything in the new order.
+                for key in order:
+                    self.widgets[key].pack_forget()
+                for key in order:
+                    self.widgets[key].pack(**self.pack_options)
+            self.order = order
+        return touched